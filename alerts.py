@@ -0,0 +1,45 @@
+"""
+Computes the stock-out / overstock alert table (utils.alerts) that the
+Inventario page reads. Run it from cron, a scheduled task or with --watch,
+outside the Streamlit server process:
+
+    python alerts.py               # recompute if sales/inventory changed
+    python alerts.py --force       # recompute unconditionally
+    python alerts.py --watch 900   # check every 15 minutes
+"""
+import argparse
+import time
+
+from utils.alerts import ALERTS_PATH, run_alert_job
+
+
+def run_once(force):
+    start = time.perf_counter()
+    try:
+        meta = run_alert_job(force=force)
+    except Exception as e:
+        print(f"Error calculando alertas: {e}")
+        return False
+    if meta is None:
+        print("Alertas al día, sin cambios en ventas/inventario")
+        return True
+    summary = ", ".join(f"{label}: {n}" for label, n in meta['resumen'].items())
+    print(f"Alertas al corte {meta['fecha_corte']} ({summary}) en {time.perf_counter() - start:.2f}s -> {ALERTS_PATH}")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calcula las alertas de ruptura y sobre-stock por producto y centro.")
+    parser.add_argument("--force", action="store_true", help="Recalcula aunque los datos no hayan cambiado.")
+    parser.add_argument("--watch", type=float, metavar="SEGUNDOS", help="Revisa periódicamente en lugar de una sola vez.")
+    args = parser.parse_args()
+
+    ok = run_once(args.force)
+    while args.watch:
+        time.sleep(args.watch)
+        run_once(False)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,6 +1,6 @@
 import streamlit as st
 import pandas as pd
-from utils.data_loader import load_data, process_data
+from utils.shared_data import get_data, show_load_warnings
 
 st.set_page_config(
     page_title="Comercializadora Andina BI",
@@ -21,12 +21,12 @@ Bienvenido al sistema de información gerencial. Utilice el menú lateral para n
 4.  **Importaciones y Costos**: Seguimiento de compras internacionales y TRM.
 5.  **Inventario y Operación**: Rotación de stock y eficiencia operativa.
 6.  **Riesgo de Crédito**: Estado de la cartera y gestión de cobros.
+7.  **Instrumentación**: Tiempos de carga y cálculo por etapa (administración).
 """)
 
-# Load data once and cache it (Streamlit caching could be added to data_loader)
-with st.spinner('Cargando datos...'):
-    raw_data = load_data()
-    data = process_data(raw_data)
-    st.session_state['data'] = data
+# Shared data model (one copy per server process, reused by every session); each
+# dataset is loaded the first time a page reads it
+data = get_data()
+show_load_warnings(data)
 
 st.success("Datos cargados correctamente. Seleccione una página en el menú lateral.")
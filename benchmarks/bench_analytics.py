@@ -0,0 +1,133 @@
+"""
+Per-rerun cost of the row-wise page code vs. utils.analytics.
+
+Builds a synthetic 1M-document cartera and a 100k-client sales total table
+and times, for each hot spot, the original per-row implementation against
+the vectorized one. The row-wise versions are timed on a sample and scaled
+(linearly for apply, quadratically for the per-client quantile
+segmentation) unless --completo is given.
+
+    python -m benchmarks.bench_analytics
+    python -m benchmarks.bench_analytics --cartera 1000000 --clientes 100000 --completo
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.analytics import classify_aging, segment_by_value, simplify_channel
+from utils.provisioning import evaluate_policies, load_policies
+
+
+# Original implementations from the pages, kept here as the baseline
+def legacy_classify_aging(days):
+    if days <= 0:
+        return 'Al día'
+    elif days <= 30:
+        return '1-30 días'
+    elif days <= 60:
+        return '31-60 días'
+    elif days <= 90:
+        return '61-90 días'
+    else:
+        return '> 90 días'
+
+
+def legacy_calc_provision(row):
+    days = row['dias_mora']
+    saldo = row['saldo_cop']
+    if days > 90: return saldo * 1.0
+    elif days > 60: return saldo * 0.5
+    elif days > 30: return saldo * 0.2
+    elif days > 0: return saldo * 0.05
+    return 0
+
+
+def legacy_segment(client_value):
+    def segment_client(value):
+        if value > client_value['subtotal_cop'].quantile(0.8):
+            return 'Alto Valor'
+        elif value > client_value['subtotal_cop'].quantile(0.5):
+            return 'Valor Medio'
+        else:
+            return 'Bajo Valor'
+    return client_value['subtotal_cop'].apply(segment_client)
+
+
+def _timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def synthetic_cartera(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    dias = np.where(rng.random(rows) < 0.4, 0, rng.integers(1, 240, rows))
+    return pd.DataFrame({
+        'dias_mora': pd.array(dias, dtype='Int32'),
+        'saldo_cop': rng.integers(0, 50_000_000, rows).astype('float64'),
+    })
+
+
+def synthetic_sales(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    tipos = ['Contado', 'Crédito 30 días', 'Crédito 60 días', 'Crédito 90 días']
+    return pd.DataFrame({
+        'tipo_venta': pd.Categorical.from_codes(rng.integers(0, len(tipos), rows), tipos),
+        'subtotal_cop': rng.lognormal(18, 1.2, rows),
+    })
+
+
+def run(cartera_rows, client_rows, sample_rows, full):
+    cartera = synthetic_cartera(cartera_rows)
+    clients = synthetic_sales(client_rows)
+    results = []
+
+    def compare(name, n, legacy, vectorized, scale, sample_size=sample_rows):
+        sample = n if full else min(n, sample_size)
+        legacy_time = _timed(lambda: legacy(sample))
+        if sample < n:
+            legacy_time *= (n / sample) ** scale
+        vector_time = _timed(vectorized)
+        results.append((name, n, legacy_time, vector_time, sample < n))
+
+    compare("aging (cartera)", cartera_rows,
+            lambda n: cartera['dias_mora'].iloc[:n].apply(legacy_classify_aging),
+            lambda: classify_aging(cartera['dias_mora']), 1)
+
+    # The legacy rates are the 'estandar' policy of config/politicas_provision.json
+    # (a fresh cartera frame, so this is a result-cache miss)
+    estandar = {'estandar': load_policies()['estandar']}
+    compare("provision (cartera)", cartera_rows,
+            lambda n: cartera.iloc[:n].apply(legacy_calc_provision, axis=1),
+            lambda: evaluate_policies(cartera, estandar), 1)
+
+    compare("canal (ventas)", client_rows,
+            lambda n: clients['tipo_venta'].iloc[:n].apply(lambda x: 'Contado' if 'Contado' in str(x) else 'Crédito'),
+            lambda: simplify_channel(clients['tipo_venta']), 1)
+
+    # The legacy segmentation recomputes two quantiles per client: O(n^2)
+    compare("segmentación (clientes)", client_rows,
+            lambda n: legacy_segment(clients.iloc[:n]),
+            lambda: segment_by_value(clients['subtotal_cop']), 2, sample_size=max(sample_rows // 20, 1))
+
+    report = pd.DataFrame(results, columns=['calculo', 'filas', 'fila_a_fila_s', 'vectorizado_s', 'extrapolado'])
+    report['aceleracion_x'] = report['fila_a_fila_s'] / report['vectorizado_s']
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de los cálculos fila a fila vs. vectorizados.")
+    parser.add_argument("--cartera", type=int, default=1_000_000, help="Documentos de cartera sintéticos.")
+    parser.add_argument("--clientes", type=int, default=100_000, help="Clientes en la tabla de ventas por cliente.")
+    parser.add_argument("--muestra", type=int, default=50_000, help="Filas sobre las que se mide la versión fila a fila.")
+    parser.add_argument("--completo", action="store_true", help="Mide la versión fila a fila sobre todas las filas.")
+    args = parser.parse_args()
+
+    report = run(args.cartera, args.clientes, args.muestra, args.completo)
+    print(report.to_string(index=False, float_format="{:.4f}".format))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Headless benchmark harness: wall time and peak memory of the load, the
+processing and every dashboard page, on synthetic data at several scales.
+
+Each scale runs in its own Python process pointed at the generated data
+(ANDINA_DATA_DIR) with an empty snapshot cache (ANDINA_CACHE_DIR), so the
+stages do not share caches or memory with each other's runs. Pages are run
+with Streamlit's AppTest (no browser), three times each:
+
+- fría: empty shared data and result cache, i.e. the first visit after a
+  deploy or a data refresh (datasets loaded from the snapshots + computed);
+- cálculo: every dataset already loaded, empty result cache, i.e. a rerun
+  whose filters nobody asked for yet;
+- caché: every page run once before, i.e. a rerun served from the shared
+  result cache (utils.result_cache).
+
+    python -m benchmarks.run_benchmarks --escalas 10 100
+    python -m benchmarks.run_benchmarks --escalas 10 --salida bench.json
+    python -m benchmarks.run_benchmarks --escalas 10 --base bench.json   # exits 1 on regression
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from benchmarks.synthetic import generate
+from utils.data_loader import REPO_DIR
+
+PAGES = sorted(glob.glob(os.path.join(REPO_DIR, "pages", "*.py")))
+
+
+def _measure(results, stage, func):
+    """
+    Runs func and appends (stage, seconds, peak MB allocated while it ran).
+    """
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    value = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    results.append({'etapa': stage, 'segundos': elapsed, 'pico_mb': peak / 1024 ** 2})
+    return value
+
+
+def _run_page(path):
+    from streamlit.testing.v1 import AppTest
+    app = AppTest.from_file(path, default_timeout=600).run()
+    if app.exception:
+        raise RuntimeError(f"{os.path.basename(path)}: {app.exception[0].value}")
+    return app
+
+
+def run_stages():
+    """
+    Stages measured inside a worker process (data dir taken from the environment).
+    """
+    from utils.data_loader import load_data, process_data, warm_cache
+
+    results = []
+    _measure(results, "load_data (sin caché, secuencial)", lambda: load_data(use_cache=False, workers=1))
+    _measure(results, "load_data (sin caché)", lambda: load_data(use_cache=False))
+    _measure(results, "warm_cache", lambda: warm_cache(force=True))
+    raw = _measure(results, "load_data (snapshot)", load_data)
+    _measure(results, "process_data", lambda: process_data(raw))
+
+    import streamlit as st
+    from utils.result_cache import RESULTS
+
+    names = {path: os.path.splitext(os.path.basename(path))[0] for path in PAGES}
+    for path in PAGES:
+        # Drops the shared data model (st.cache_resource) and every cached result
+        st.cache_resource.clear()
+        RESULTS.clear()
+        _measure(results, f"página {names[path]} (fría)", lambda path=path: _run_page(path))
+
+    # Loads every dataset the pages read, then times the computations alone
+    for path in PAGES:
+        _run_page(path)
+    for path in PAGES:
+        RESULTS.clear()
+        _measure(results, f"página {names[path]} (cálculo)", lambda path=path: _run_page(path))
+
+    # Every page has run once with the data loaded: reruns are cache hits
+    for path in PAGES:
+        _run_page(path)
+    for path in PAGES:
+        _measure(results, f"página {names[path]} (caché)", lambda path=path: _run_page(path))
+    return results
+
+
+def _run_worker(data_dir, result_path):
+    env = dict(os.environ)
+    env['ANDINA_DATA_DIR'] = data_dir
+    env['ANDINA_CACHE_DIR'] = os.path.join(data_dir, '.cache')
+    subprocess.run(
+        [sys.executable, "-m", "benchmarks.run_benchmarks", "--worker", result_path],
+        cwd=REPO_DIR, env=env, check=True,
+    )
+    with open(result_path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare(current, baseline, tolerance):
+    """
+    Rows of `current` that are slower or use more memory than `baseline` by
+    more than `tolerance` (0.2 = 20%).
+    """
+    merged = current.merge(baseline, on=['escala', 'etapa'], suffixes=('', '_base'))
+    slower = merged['segundos'] > merged['segundos_base'] * (1 + tolerance)
+    bigger = merged['pico_mb'] > merged['pico_mb_base'] * (1 + tolerance)
+    return merged[slower | bigger]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sin navegador de carga, procesamiento y páginas.")
+    parser.add_argument("--escalas", type=int, nargs="+", default=[10], help="Factores de escala (10, 100, 1000).")
+    parser.add_argument("--datos", help="Directorio donde guardar/reutilizar los datos sintéticos.")
+    parser.add_argument("--salida", help="Guarda los resultados en este JSON.")
+    parser.add_argument("--base", help="JSON de una corrida anterior para detectar regresiones.")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="Regresión permitida (0.2 = 20%%).")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        with open(args.worker, 'w', encoding='utf-8') as f:
+            json.dump(run_stages(), f)
+        return 0
+
+    data_root = args.datos or tempfile.mkdtemp(prefix="andina_bench_")
+    rows = []
+    for scale in args.escalas:
+        data_dir = os.path.join(data_root, f"x{scale}")
+        if not os.path.exists(os.path.join(data_dir, "ventas_andina.csv")):
+            print(f"Generando datos x{scale} en {data_dir} ...")
+            generate(scale, data_dir)
+        print(f"Midiendo x{scale} ...")
+        for row in _run_worker(data_dir, os.path.join(data_root, f"resultado_x{scale}.json")):
+            rows.append({'escala': scale, **row})
+
+    report = pd.DataFrame(rows)
+    print(report.to_string(index=False, float_format="{:.3f}".format))
+
+    if args.salida:
+        report.to_json(args.salida, orient='records', indent=1)
+    if args.base:
+        regressions = compare(report, pd.read_json(args.base), args.tolerancia)
+        if not regressions.empty:
+            print("\nRegresiones:")
+            print(regressions.to_string(index=False, float_format="{:.3f}".format))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
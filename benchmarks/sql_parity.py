@@ -0,0 +1,116 @@
+"""
+Parity check of the DuckDB backend (utils.sql_backend) against the pandas
+code paths: the sales cube, inventory rotation for every year / center /
+category, the rotation trend and the credit-risk aggregates must match.
+
+    python -m benchmarks.sql_parity
+    ANDINA_DATA_DIR=/tmp/sintetico python -m benchmarks.sql_parity
+
+Prints OK / DIFF per check and exits 1 if any check differs.
+"""
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from utils import data_loader, views
+from utils.cube import CUBE_KEYS, CUBE_MEASURES
+
+# Sums are accumulated in a different order in SQL
+RTOL = 1e-9
+
+
+def _frames_differ(expected, actual, keys):
+    """
+    Description of the first difference between two frames (rows matched on
+    `keys`, floats compared with RTOL), or None if they match.
+    """
+    if list(expected.columns) != list(actual.columns):
+        return f"columnas {list(expected.columns)} != {list(actual.columns)}"
+    if len(expected) != len(actual):
+        return f"filas {len(expected)} != {len(actual)}"
+
+    def normalized(frame):
+        frame = frame.copy()
+        for col in frame.columns:
+            if isinstance(frame[col].dtype, pd.CategoricalDtype):
+                frame[col] = frame[col].astype(str)
+        return frame.sort_values(keys, ignore_index=True)
+
+    expected, actual = normalized(expected), normalized(actual)
+    for col in expected.columns:
+        left, right = expected[col], actual[col]
+        if pd.api.types.is_float_dtype(left) or pd.api.types.is_float_dtype(right):
+            same = np.isclose(left.to_numpy(dtype='float64', na_value=np.nan),
+                              right.to_numpy(dtype='float64', na_value=np.nan), rtol=RTOL, atol=1e-6, equal_nan=True)
+        else:
+            same = ((left.astype(str) == right.astype(str)) | (left.isna() & right.isna())).to_numpy()
+        if not same.all():
+            row = int(np.flatnonzero(~same)[0])
+            return f"{col}: {left.iloc[row]!r} != {right.iloc[row]!r} (fila {row})"
+    return None
+
+
+def _dicts_differ(expected, actual):
+    for key in expected:
+        if not np.isclose(expected[key], actual[key], rtol=RTOL):
+            return f"{key}: {expected[key]!r} != {actual[key]!r}"
+    return None
+
+
+def run_checks(max_filters=None):
+    """
+    Yields (check name, difference or None).
+    """
+    from utils.sql_backend import SqlBackend
+
+    # Pandas side: the views' own computations, with the SQL dispatch off
+    data_loader.BACKEND = "pandas"
+    data = data_loader.process_data(data_loader.load_data())
+    backend = SqlBackend()
+    model, inventory, cartera = data['modelo'], data['inventario'], data['cartera']
+
+    cube = backend.cube()
+    yield "cubo", _frames_differ(data['cubo'][CUBE_KEYS + CUBE_MEASURES], cube, CUBE_KEYS)
+    yield "cubo tipos", (None if list(cube.dtypes) == list(data['cubo'][CUBE_KEYS + CUBE_MEASURES].dtypes)
+                         else f"{list(data['cubo'].dtypes)} != {list(cube.dtypes)}")
+
+    options = views.rotation_filters.__wrapped__(model, inventory)
+    yield "rotación filtros", None if options == backend.rotation_filters() else f"{options} != {backend.rotation_filters()}"
+    filters = [(None, None)] + [(c, None) for c in options['centers']] + [(None, c) for c in options['categories']]
+    for year in options['years']:
+        for center, categoria in filters[:max_filters]:
+            label = f"{year} centro={center} categoría={categoria}"
+            expected = views.inventory_rotation.__wrapped__(model, inventory, year, center, categoria)
+            expected = expected.drop(columns=['descripcion'], errors='ignore')
+            actual = backend.inventory_rotation(year, center, categoria)
+            yield f"rotación {label}", _frames_differ(expected, actual, ['producto_id'])
+
+            expected = views.rotation_trend.__wrapped__(model, inventory, year, center, categoria)
+            actual = backend.rotation_trend(year, center, categoria)
+            yield f"tendencia {label}", _frames_differ(expected, actual, ['periodo'])
+
+    yield "cartera kpis", _dicts_differ(views.portfolio_kpis.__wrapped__(cartera), backend.portfolio_kpis())
+    yield "cartera aging", _frames_differ(views.aging_distribution.__wrapped__(cartera), backend.aging_distribution(),
+                                          ['rango_mora'])
+    yield "cartera top mora", _frames_differ(views.top_overdue_clients.__wrapped__(cartera, model),
+                                             backend.top_overdue_clients(), ['nombre_cliente'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara los resultados del backend DuckDB con los de pandas.")
+    parser.add_argument("--max-filtros", type=int, default=None,
+                        help="Combinaciones de centro/categoría a comparar por año (por defecto todas)")
+    args = parser.parse_args()
+
+    failures = 0
+    for name, difference in run_checks(args.max_filtros):
+        print(f"{'OK  ' if difference is None else 'DIFF'} {name}" + (f": {difference}" if difference else ""))
+        failures += difference is not None
+    print(f"{failures} diferencias")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
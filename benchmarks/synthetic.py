@@ -0,0 +1,117 @@
+"""
+Synthetic data generator scaled from the bundled extracts.
+
+Writes a directory with the same six file names as the real data, N times
+larger. Dimensions (clientes, productos) are replicated N times with shifted
+IDs, and fact rows (ventas, cartera, importaciones) are bootstrapped from
+the real rows and pointed at a random replica. Column distributions, the
+client/product attributes of each sale and the inventory grain
+(fecha_corte, centro_logistico, producto_id) are all kept.
+
+    python -m benchmarks.synthetic --escala 10 --destino /tmp/andina_x10
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.data_loader import DATA_DIR, FILES
+
+SCALES = (10, 100, 1000)
+
+
+def _read_bundled():
+    data = {}
+    for key, filename in FILES.items():
+        path = os.path.join(DATA_DIR, filename)
+        data[key] = pd.read_excel(path) if filename.endswith('.xlsx') else pd.read_csv(path, encoding='utf-8-sig')
+    return data
+
+
+def _replicate_dimension(df, id_col, scale):
+    """
+    Stacks `scale` copies of a dimension, shifting the IDs of copy k by
+    k * max(id). Returns (frame, id offset).
+    """
+    offset = int(df[id_col].max())
+    copies = []
+    for k in range(scale):
+        copy = df.copy()
+        copy[id_col] = copy[id_col] + k * offset
+        copies.append(copy)
+    return pd.concat(copies, ignore_index=True), offset
+
+
+def _bootstrap(df, rows, rng):
+    return df.iloc[rng.integers(0, len(df), rows)].reset_index(drop=True)
+
+
+def generate(scale, out_dir, seed=0, excel=True):
+    """
+    Writes the scaled dataset to out_dir and returns {source: rows}.
+    """
+    rng = np.random.default_rng(seed)
+    real = _read_bundled()
+    os.makedirs(out_dir, exist_ok=True)
+    out = {}
+
+    clientes, client_offset = _replicate_dimension(real['clientes'], 'cliente_id', scale)
+    clientes['nit'] = 900_000_000 + clientes['cliente_id']
+    clientes['nombre_cliente'] = ("Cliente " + clientes['cliente_id'].astype(str).str.zfill(6)
+                                  + " " + clientes['ciudad'].astype(str))
+    out['clientes'] = clientes
+
+    productos, product_offset = _replicate_dimension(real['productos'], 'producto_id', scale)
+    productos['sku'] = productos['sku'].str[:4] + productos['producto_id'].astype(str).str.zfill(6)
+    out['productos'] = productos
+
+    ventas = _bootstrap(real['ventas'], len(real['ventas']) * scale, rng)
+    ventas['venta_id'] = np.arange(1, len(ventas) + 1)
+    ventas['cliente_id'] += rng.integers(0, scale, len(ventas)) * client_offset
+    ventas['producto_id'] += rng.integers(0, scale, len(ventas)) * product_offset
+    out['ventas'] = ventas
+
+    cartera = _bootstrap(real['cartera'], len(real['cartera']) * scale, rng)
+    cartera['documento_id'] = np.arange(1, len(cartera) + 1)
+    cartera['cliente_id'] += rng.integers(0, scale, len(cartera)) * client_offset
+    out['cartera'] = cartera
+
+    # One snapshot row per (fecha_corte, centro, product replica), like the real extract
+    inventario, _ = _replicate_dimension(real['inventario'], 'producto_id', scale)
+    out['inventario'] = inventario
+
+    importaciones = _bootstrap(real['importaciones'], len(real['importaciones']) * scale, rng)
+    importaciones['importacion_id'] = np.arange(1, len(importaciones) + 1)
+    out['importaciones'] = importaciones
+
+    for key, df in out.items():
+        path = os.path.join(out_dir, FILES[key])
+        if FILES[key].endswith('.xlsx'):
+            if excel:
+                df.to_excel(path, index=False)
+            else:
+                continue
+        else:
+            # Same format as the bundled files: comma-separated, UTF-8 with BOM
+            df.to_csv(path, index=False, encoding='utf-8-sig')
+    return {key: len(df) for key, df in out.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera datos sintéticos escalados a partir de los archivos incluidos.")
+    parser.add_argument("--escala", type=int, default=10, help="Factor de escala (p. ej. 10, 100, 1000).")
+    parser.add_argument("--destino", required=True, help="Directorio de salida.")
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rows = generate(args.escala, args.destino, seed=args.semilla)
+    for key, n in rows.items():
+        print(f"{key:<15} {n:>12,} filas")
+    print(f"Datos x{args.escala} en {args.destino} ({time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
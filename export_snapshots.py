@@ -0,0 +1,53 @@
+"""
+Exports the dashboard aggregates (utils.exports) for every year as Parquet /
+JSON tables plus the Plotly figures as figure JSON. The pages read the
+snapshots under the default directory instead of recomputing them; other
+consumers can read any directory's manifest.json. Run it from cron, a
+scheduled task or with --watch, outside the Streamlit server process:
+
+    python export_snapshots.py                   # re-export if the data changed
+    python export_snapshots.py --force           # re-export unconditionally
+    python export_snapshots.py --watch 900       # check every 15 minutes
+    python export_snapshots.py --salida /srv/bi  # write somewhere else
+"""
+import argparse
+import os
+import time
+
+from utils.exports import EXPORT_DIR, MANIFEST_NAME, run_export_job
+
+
+def run_once(output_dir, force):
+    start = time.perf_counter()
+    try:
+        manifest = run_export_job(output_dir, force=force)
+    except Exception as e:
+        print(f"Error exportando agregados: {e}")
+        return False
+    if manifest is None:
+        print("Exportaciones al día, sin cambios en los datos")
+        return True
+    exports = manifest['exportaciones']
+    files = sum(1 + len(entry['figuras']) for periods in exports.values() for entry in periods.values())
+    print(f"{len(exports)} exportaciones, {files} archivos en {time.perf_counter() - start:.2f}s "
+          f"-> {os.path.join(output_dir, MANIFEST_NAME)}")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta los agregados y gráficos del tablero por año a archivos estáticos.")
+    parser.add_argument("--salida", default=EXPORT_DIR,
+                        help="Directorio de salida (el tablero solo lee el directorio por defecto).")
+    parser.add_argument("--force", action="store_true", help="Exporta aunque los datos no hayan cambiado.")
+    parser.add_argument("--watch", type=float, metavar="SEGUNDOS", help="Revisa periódicamente en lugar de una sola vez.")
+    args = parser.parse_args()
+
+    ok = run_once(args.salida, args.force)
+    while args.watch:
+        time.sleep(args.watch)
+        run_once(args.salida, False)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
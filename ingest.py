@@ -0,0 +1,39 @@
+"""
+Applies the ERP delta files waiting in the inbox (utils.ingest.INBOX_DIR)
+to the columnar snapshots. Running dashboards pick the new rows up on their
+next rerun without reloading history.
+
+    python ingest.py               # process the inbox once
+    python ingest.py --watch 300   # keep polling the inbox every 5 minutes
+"""
+import argparse
+import time
+
+from utils.ingest import INBOX_DIR, ingest
+
+
+def run_once(inbox_dir):
+    start = time.perf_counter()
+    summary = ingest(inbox_dir)
+    if not summary:
+        return
+    for key, stats in summary.items():
+        print(f"{key:<12} {stats['archivos']} archivo(s), {stats['filas_delta']} filas nuevas/actualizadas, "
+              f"{stats['reemplazadas']} reemplazadas, {stats['filas_total']} en total")
+    print(f"Ingesta completada en {time.perf_counter() - start:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingesta incremental de archivos delta (ventas, cartera, inventario).")
+    parser.add_argument("--inbox", default=INBOX_DIR, help="Directorio donde el ERP deja los archivos delta.")
+    parser.add_argument("--watch", type=float, metavar="SEGUNDOS", help="Revisa el directorio periódicamente en lugar de una sola vez.")
+    args = parser.parse_args()
+
+    run_once(args.inbox)
+    while args.watch:
+        time.sleep(args.watch)
+        run_once(args.inbox)
+
+
+if __name__ == "__main__":
+    main()
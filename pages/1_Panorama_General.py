@@ -1,86 +1,46 @@
 import streamlit as st
-import plotly.express as px
 import pandas as pd
+from utils.exports import export_filters, precomputed
+from utils.filter_state import apply_selection, filter_options, sidebar_selection
+from utils.shared_data import get_data, show_load_warnings
 
 st.set_page_config(page_title="Panorama General", layout="wide")
 
-if 'data' not in st.session_state:
-    st.warning("Por favor vaya a la página principal para cargar los datos.")
-    st.stop()
-
-data = st.session_state['data']
-df = data.get('merged_ventas')
+data = get_data()
+# Filter options come from the exported snapshots when current (export_snapshots.py);
+# otherwise KPIs and trends are answered from the monthly cube, not the raw sales fact
+options = export_filters()
+if options is None:
+    cube = data.get('cubo')
+    options = filter_options(cube) if cube is not None and not cube.empty else None
 
 st.title("Panorama General de Ventas y Margen")
+show_load_warnings(data)
 
-# Filters
-st.sidebar.header("Filtros")
-if df is not None:
-    years = sorted(df['fecha'].dt.year.unique(), reverse=True)
-    options = ["Todos"] + list(years)
-    selected_year = st.sidebar.selectbox("Seleccionar Año", options)
-    
-    if selected_year == "Todos":
-        df_filtered = df.copy()
-        title_suffix = " (Todos los Años)"
-    else:
-        df_filtered = df[df['fecha'].dt.year == selected_year]
-        title_suffix = f" ({selected_year})"
+if options is not None and options[0]:
+    # Year and cross-filters, shared with the other sales pages
+    year_filter, selection = sidebar_selection(*options, all_years=True)
+    title_suffix = " (Todos los Años)" if year_filter is None else f" ({year_filter})"
+    # Unfiltered views come from the snapshots (or the published cube, built on demand)
+    live = any(selection.values())
+    sources = {'cubo': apply_selection(data['cubo'], selection)} if live else data
     
     # KPIs
-    total_ventas = df_filtered['subtotal_cop'].sum()
-    total_margen = df_filtered['margen_total_cop'].sum()
-    margen_pct = (total_margen / total_ventas) * 100 if total_ventas > 0 else 0
+    kpis, _ = precomputed('kpis_ventas', year_filter, sources, live)
+    total_ventas = kpis['subtotal_cop']
+    total_margen = kpis['margen_total_cop']
+    margen_pct = kpis['margen_pct']
     
     col1, col2, col3 = st.columns(3)
     col1.metric("Ventas Totales", f"${total_ventas:,.0f}")
     col2.metric("Margen Bruto", f"${total_margen:,.0f}")
     col3.metric("Margen %", f"{margen_pct:.2f}%")
     
-    # Charts
+    # Charts: one line per year (Spanish month names, no locale) for all
+    # years, the months of the year otherwise (see utils.exports)
     st.subheader(f"Tendencia de Ventas y Margen{title_suffix}")
-    
-    if selected_year == "Todos":
-        # Multi-line chart: X=Month, Y=Value, Color=Year
-        df_filtered['año'] = df_filtered['fecha'].dt.year
-        # Remove locale dependency to avoid errors on cloud
-        # df_filtered['mes'] = df_filtered['fecha'].dt.month_name(locale='es_ES') 
-        
-        # Manual map for Spanish months
-        month_map = {1: 'Ene', 2: 'Feb', 3: 'Mar', 4: 'Abr', 5: 'May', 6: 'Jun', 
-                     7: 'Jul', 8: 'Ago', 9: 'Sep', 10: 'Oct', 11: 'Nov', 12: 'Dic'}
-        df_filtered['mes_num'] = df_filtered['fecha'].dt.month
-        df_filtered['mes_nombre'] = df_filtered['mes_num'].map(month_map)
-        
-        df_monthly = df_filtered.groupby(['año', 'mes_num', 'mes_nombre']).agg({
-            'subtotal_cop': 'sum',
-            'margen_total_cop': 'sum'
-        }).reset_index()
-        
-        df_monthly.sort_values(['año', 'mes_num'], inplace=True)
-        
-        fig_sales = px.line(df_monthly, x='mes_nombre', y='subtotal_cop', color='año', 
-                            title='Comparativo de Ventas Mensuales por Año', markers=True,
-                            category_orders={'mes_nombre': list(month_map.values())})
-        st.plotly_chart(fig_sales, use_container_width=True)
-        
-        fig_margin = px.line(df_monthly, x='mes_nombre', y='margen_total_cop', color='año', 
-                             title='Comparativo de Margen Bruto Mensual por Año', markers=True,
-                             category_orders={'mes_nombre': list(month_map.values())})
-        st.plotly_chart(fig_margin, use_container_width=True)
-        
-    else:
-        # Single year chart (Original logic)
-        df_monthly = df_filtered.groupby(df_filtered['fecha'].dt.to_period('M')).agg({
-            'subtotal_cop': 'sum',
-            'margen_total_cop': 'sum'
-        }).reset_index()
-        df_monthly['fecha'] = df_monthly['fecha'].dt.to_timestamp()
-        
-        fig_sales = px.line(df_monthly, x='fecha', y='subtotal_cop', title='Ventas Mensuales', markers=True)
-        st.plotly_chart(fig_sales, use_container_width=True)
-        
-        fig_margin = px.line(df_monthly, x='fecha', y='margen_total_cop', title='Margen Bruto Mensual', markers=True)
-        st.plotly_chart(fig_margin, use_container_width=True)
+    _, trend_figures = precomputed('tendencia_mensual', year_filter, sources, live)
+    st.plotly_chart(trend_figures['ventas'], use_container_width=True)
+    st.plotly_chart(trend_figures['margen'], use_container_width=True)
 else:
     st.error("No hay datos de ventas disponibles.")
@@ -1,79 +1,113 @@
 import streamlit as st
 import plotly.express as px
 import pandas as pd
+from utils.filter_state import sidebar_filters
+from utils.shared_data import get_data, show_load_warnings
+from utils.views import (client_concentration, customer_analytics, figure, portfolio_kpis, rfm_segments, top_clients,
+                         top_lifetime_value, value_segment_counts)
 
 st.set_page_config(page_title="Gestión de Clientes", layout="wide")
 
-if 'data' not in st.session_state:
-    st.warning("Por favor vaya a la página principal para cargar los datos.")
-    st.stop()
-
-data = st.session_state['data']
-df = data.get('merged_ventas')
+data = get_data()
+model = data.get('modelo')
+# Client totals are answered from the monthly cube, not the raw sales fact
+cube = data.get('cubo')
 cartera = data.get('cartera')
 
 st.title("Gestión de Clientes: Valor, Concentración y Riesgo")
+show_load_warnings(data)
 
-if df is not None:
-    # Filters
-    st.sidebar.header("Filtros")
-    years = df['fecha'].dt.year.unique()
-    selected_year = st.sidebar.selectbox("Seleccionar Año", sorted(years, reverse=True))
-    df_filtered = df[df['fecha'].dt.year == selected_year]
+if cube is not None and not cube.empty:
+    # Year and cross-filters, shared with the other sales pages
+    selected_year, cube = sidebar_filters(cube)
 
     col1, col2 = st.columns(2)
 
     # 1. Top 10 Clients
     with col1:
         st.subheader("Top 10 Clientes (Ventas)")
-        top_clients = df_filtered.groupby('nombre_cliente')['subtotal_cop'].sum().reset_index()
-        top_clients = top_clients.sort_values('subtotal_cop', ascending=False).head(10)
-        st.dataframe(top_clients.style.format({"subtotal_cop": "${:,.0f}"}))
+        st.dataframe(top_clients(cube, model, selected_year).style.format({"subtotal_cop": "${:,.0f}"}))
 
     # 2. Concentration Analysis
     with col2:
         st.subheader("Concentración de Ventas (Top 10)")
-        total_sales = df_filtered['subtotal_cop'].sum()
-        top_10_sales = top_clients['subtotal_cop'].sum()
-        concentration_pct = (top_10_sales / total_sales) * 100
+        concentration = client_concentration(cube, model, selected_year)
         
-        st.metric("Concentración Top 10 Clientes", f"{concentration_pct:.2f}%")
+        st.metric("Concentración Top 10 Clientes", f"{concentration['pct']:.2f}%")
         
-        fig_pie = px.pie(values=[top_10_sales, total_sales - top_10_sales], names=['Top 10', 'Otros'], title="Distribución de Ventas")
+        fig_pie = figure(px.pie, values=[concentration['top_cop'], concentration['total_cop'] - concentration['top_cop']], names=['Top 10', 'Otros'], title="Distribución de Ventas")
         st.plotly_chart(fig_pie, use_container_width=True)
 
     # 3. Customer Segmentation
     st.subheader("Segmentación de Clientes por Valor")
-    client_value = df_filtered.groupby('nombre_cliente')['subtotal_cop'].sum().reset_index()
-    
-    # Simple segmentation logic
-    def segment_client(value):
-        if value > client_value['subtotal_cop'].quantile(0.8):
-            return 'Alto Valor'
-        elif value > client_value['subtotal_cop'].quantile(0.5):
-            return 'Valor Medio'
-        else:
-            return 'Bajo Valor'
-            
-    client_value['segmento_valor'] = client_value['subtotal_cop'].apply(segment_client)
-    
-    fig_segment = px.bar(
-        client_value['segmento_valor'].value_counts().reset_index(), 
+    # Simple segmentation logic: 80th / 50th percentile cut, computed once
+    fig_segment = figure(px.bar,
+        value_segment_counts(cube, selected_year), 
         x='segmento_valor', 
         y='count',
         title="Distribución de Clientes por Segmento de Valor"
     )
     st.plotly_chart(fig_segment, use_container_width=True)
 
-    # 4. Link to Risk
+    # 4. RFM, cohorts, concentration and lifetime value: every year of the
+    # filtered sales, computed once per data version (see utils.customers)
+    analytics = customer_analytics(cube, model)
+    st.subheader("Segmentación RFM (Todos los Años)")
+    st.caption("Recencia en meses desde la última compra, frecuencia en número de ventas y valor monetario en COP; "
+               "puntajes por quintiles de 1 a 5.")
+    segments = rfm_segments(cube, model)
+    col_rfm1, col_rfm2 = st.columns(2)
+    with col_rfm1:
+        fig_rfm = figure(px.bar, segments, x='segmento_rfm', y='clientes', title="Clientes por Segmento RFM")
+        st.plotly_chart(fig_rfm, use_container_width=True)
+    with col_rfm2:
+        st.dataframe(segments.style.format({
+            'recencia_meses': '{:.1f}',
+            'frecuencia': '{:.1f}',
+            'monetario_cop': '${:,.0f}',
+            'ltv_cop': '${:,.0f}',
+        }))
+
+    st.subheader("Retención por Cohorte de Alta")
+    cohorts = analytics.cohorts
+    if not cohorts.empty:
+        retention = cohorts.drop(columns='clientes')
+        fig_cohort = figure(px.imshow, retention, text_auto='.0%', aspect='auto', color_continuous_scale='Blues',
+                            labels={'x': 'Trimestres desde el alta', 'y': 'Cohorte', 'color': 'Retención'},
+                            title="Clientes con compras por trimestre desde su alta")
+        st.plotly_chart(fig_cohort, use_container_width=True)
+    else:
+        st.info("No hay fechas de alta de clientes para construir cohortes.")
+
+    st.subheader("Concentración de Ventas por Año")
+    concentration_year = analytics.concentration_by_year
+    c_hhi, c_gini, c_eq = st.columns(3)
+    current = concentration_year[(concentration_year['anio'] == str(selected_year)).to_numpy()]
+    if not current.empty:
+        c_hhi.metric(f"Índice Herfindahl ({selected_year})", f"{current['hhi'].iloc[0]:,.0f}")
+        c_gini.metric(f"Coeficiente de Gini ({selected_year})", f"{current['gini'].iloc[0]:.3f}")
+        c_eq.metric("Clientes Equivalentes", f"{current['clientes_equivalentes'].iloc[0]:,.0f}")
+    st.dataframe(concentration_year.style.format({
+        'hhi': '{:,.0f}',
+        'clientes_equivalentes': '{:,.1f}',
+        'gini': '{:.3f}',
+        'top10_pct': '{:.2f}%',
+    }))
+
+    st.subheader("Top 10 Clientes por Valor de Vida (Margen Acumulado)")
+    st.dataframe(top_lifetime_value(cube, model).style.format({
+        'ltv_cop': '${:,.0f}',
+        'monetario_cop': '${:,.0f}',
+    }))
+
+    # 5. Link to Risk
     st.subheader("Resumen de Riesgo de Crédito")
     if cartera is not None:
-        total_cartera = cartera['saldo_cop'].sum()
-        mora_cartera = cartera[cartera['dias_mora'] > 0]['saldo_cop'].sum()
+        portfolio = portfolio_kpis(cartera)
         
         c1, c2 = st.columns(2)
-        c1.metric("Cartera Total Pendiente", f"${total_cartera:,.0f}")
-        c2.metric("Cartera en Mora", f"${mora_cartera:,.0f}")
+        c1.metric("Cartera Total Pendiente", f"${portfolio['total_cop']:,.0f}")
+        c2.metric("Cartera en Mora", f"${portfolio['mora_cop']:,.0f}")
         
         st.info("Para un análisis detallado de la cartera, vaya a la página 'Riesgo de Crédito'.")
 
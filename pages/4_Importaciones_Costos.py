@@ -1,21 +1,23 @@
 import streamlit as st
 import plotly.express as px
 import pandas as pd
+from utils.filter_state import sidebar_filters
+from utils.downsample import points_for_width
+from utils.shared_data import get_data, show_load_warnings
+from utils.views import (downsampled, figure, import_totals, imports_by_country, landed_margin_by_category,
+                         landed_margin_kpis, landed_margin_trend, trm_trend)
 
 st.set_page_config(page_title="Importaciones y Costos", layout="wide")
 
-if 'data' not in st.session_state:
-    st.warning("Por favor vaya a la página principal para cargar los datos.")
-    st.stop()
-
-data = st.session_state['data']
+data = get_data()
 imports = data.get('importaciones')
 
 st.title("Importaciones, TRM y Costos")
+show_load_warnings(data)
 
 if imports is not None:
     # KPI
-    total_imports_usd = imports['costo_mercancia_usd'].sum()
+    total_imports_usd = import_totals(imports)['costo_mercancia_usd']
     st.metric("Total Compras en USD", f"${total_imports_usd:,.2f}")
     
     col1, col2 = st.columns(2)
@@ -24,10 +26,17 @@ if imports is not None:
     with col1:
         st.subheader("Evolución de la TRM")
         if 'trm' in imports.columns and 'fecha_orden' in imports.columns:
-            imports['fecha_orden'] = pd.to_datetime(imports['fecha_orden'])
-            imports_sorted = imports.sort_values('fecha_orden')
-            
-            fig_trm = px.line(imports_sorted, x='fecha_orden', y='trm', title="Tendencia Histórica de la TRM")
+            trm = trm_trend(imports)
+            # Zoom range; the series is downsampled to the chart width within it
+            dates = trm['fecha_orden'].dropna()
+            zoom_start = zoom_end = None
+            if dates.nunique() > 1:
+                first, last = dates.min().date(), dates.max().date()
+                selected_start, selected_end = st.slider("Rango de fechas", first, last, (first, last), format="YYYY-MM-DD")
+                zoom_start = pd.Timestamp(selected_start) if selected_start != first else None
+                zoom_end = pd.Timestamp(selected_end) if selected_end != last else None
+            trm_points = downsampled(trm, 'fecha_orden', 'trm', points_for_width(), zoom_start, zoom_end)
+            fig_trm = figure(px.line, trm_points, x='fecha_orden', y='trm', title="Tendencia Histórica de la TRM")
             st.plotly_chart(fig_trm, use_container_width=True)
         else:
             st.info("Datos de TRM o Fecha no disponibles.")
@@ -36,10 +45,8 @@ if imports is not None:
     with col2:
         st.subheader("Distribución de Importaciones por País")
         if 'pais_origen' in imports.columns:
-            country_dist = imports.groupby('pais_origen')['costo_mercancia_usd'].sum().reset_index()
-            
-            fig_country = px.pie(
-                country_dist, 
+            fig_country = figure(px.pie,
+                imports_by_country(imports), 
                 values='costo_mercancia_usd', 
                 names='pais_origen', 
                 title="Importaciones por País (USD)"
@@ -48,5 +55,33 @@ if imports is not None:
             
     st.dataframe(imports)
 
+    # 3. Margin at the landed cost of the supplying import (actual TRM) vs. the ERP estimate
+    st.subheader("Margen a Costo Importado (TRM Real) vs. Costo Estimado")
+    # Needs the sales fact: only loaded once the import charts are on screen
+    cube = data.get('cubo')
+    if cube is not None and not cube.empty:
+        # Year and cross-filters, shared with the other sales pages
+        year_filter, cube = sidebar_filters(cube, all_years=True)
+        
+        landed = landed_margin_kpis(cube, year_filter)
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Margen con Costo Estimado", f"${landed['margen_estimado_cop']:,.0f}", f"{landed['margen_estimado_pct']:.2f}%", delta_color="off")
+        c2.metric("Margen a TRM Real", f"${landed['margen_real_cop']:,.0f}", f"{landed['margen_real_pct']:.2f}%", delta_color="off")
+        c3.metric("Diferencia", f"${landed['margen_real_cop'] - landed['margen_estimado_cop']:,.0f}")
+        
+        fig_landed = figure(px.line, landed_margin_trend(cube, year_filter), x='fecha', y='margen_pct', color='tipo',
+                            markers=True, title="Margen % Mensual: Costo Estimado vs. TRM Real")
+        st.plotly_chart(fig_landed, use_container_width=True)
+        
+        st.dataframe(landed_margin_by_category(cube, year_filter).style.format({
+            'margen_total_cop': '${:,.0f}',
+            'margen_real_cop': '${:,.0f}',
+            'diferencia_cop': '${:,.0f}',
+            'margen_estimado_pct': '{:.2f}%',
+            'margen_real_pct': '{:.2f}%',
+        }))
+    else:
+        st.info("No hay datos de ventas para calcular el margen a costo importado.")
+
 else:
     st.error("No hay datos de importaciones disponibles.")
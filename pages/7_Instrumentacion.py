@@ -0,0 +1,100 @@
+import streamlit as st
+import plotly.express as px
+import pandas as pd
+from utils.instrumentation import METRICS, rss_bytes
+from utils.result_cache import RESULTS
+from utils.shared_data import get_data, show_load_warnings
+
+st.set_page_config(page_title="Instrumentación", layout="wide")
+
+# Only reads what is already loaded: opening this page never loads a dataset
+data = get_data()
+
+st.title("Instrumentación: Tiempos de Carga y Cálculo")
+st.caption(f"Contadores del proceso del servidor desde {METRICS.started}, compartidos por todas las sesiones.")
+
+cache_stats = RESULTS.stats()
+rss = rss_bytes()
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("Memoria del Proceso (RSS)", f"{rss / 1024 ** 2:,.0f} MB" if rss is not None else "-")
+col2.metric("Datasets Cargados", f"{len(data.loaded())} de {len(data)}")
+col3.metric("Aciertos Caché de Resultados", f"{cache_stats['hit_rate']:.1%}")
+col4.metric("Caché de Resultados", f"{cache_stats['bytes'] / 1024 ** 2:,.1f} / {cache_stats['budget_bytes'] / 1024 ** 2:,.0f} MB")
+
+# 1. Per-source load of the published data version
+st.subheader("Carga por Fuente")
+if data.report:
+    loads = pd.DataFrame([
+        {
+            'fuente': key,
+            'archivo': entry['archivo'],
+            'estado': entry['estado'],
+            'filas': entry['filas'],
+            'segundos': entry['segundos'],
+            'formato': f"{entry['formato']['encoding']} sep={entry['formato']['sep']!r}" if entry['formato'] else '',
+            'error': entry['error'] or '',
+            'avisos': "; ".join(entry.get('avisos', [])),
+        }
+        for key, entry in data.report.items()
+    ])
+    st.dataframe(loads.style.format({'filas': '{:,}', 'segundos': '{:.3f}'}))
+    show_load_warnings(data)
+else:
+    st.info("Ninguna fuente cargada aún en esta versión de los datos. Abra una página del tablero.")
+
+# 2. Every timed stage: loaders, processing steps, page computations
+st.subheader("Tiempos por Etapa")
+stages = METRICS.frame()
+if not stages.empty:
+    groups = sorted(stages['grupo'].unique())
+    selected_groups = st.multiselect("Grupos de etapas", groups, default=groups)
+    shown = stages[stages['grupo'].isin(selected_groups).to_numpy()]
+
+    fig_stages = px.bar(
+        shown.head(25).iloc[::-1],
+        x='total_s',
+        y='etapa',
+        color='grupo',
+        orientation='h',
+        title="Tiempo Total por Etapa (25 más costosas)"
+    )
+    st.plotly_chart(fig_stages, use_container_width=True)
+
+    st.dataframe(shown.style.format({
+        'total_s': '{:.3f}',
+        'media_ms': '{:.1f}',
+        'max_ms': '{:.1f}',
+        'ultima_ms': '{:.1f}',
+        'memoria_delta_mb': '{:+.1f}',
+    }, na_rep='-'))
+else:
+    st.info("Todavía no se ha registrado ninguna etapa.")
+
+# 3. Result cache per view
+st.subheader("Caché de Resultados por Vista")
+namespaces = pd.DataFrame([
+    {'vista': ns, 'aciertos': c['hits'], 'fallos': c['misses']}
+    for ns, c in cache_stats['namespaces'].items()
+], columns=['vista', 'aciertos', 'fallos'])
+if not namespaces.empty:
+    namespaces['tasa_aciertos'] = namespaces['aciertos'] / (namespaces['aciertos'] + namespaces['fallos'])
+    st.dataframe(namespaces.sort_values('fallos', ascending=False).style.format({'tasa_aciertos': '{:.1%}'}))
+st.caption(f"{cache_stats['entries']} resultados en caché · {cache_stats['evictions']} desalojos")
+
+# 4. Exports
+st.subheader("Exportar")
+extra = {'cache_resultados': cache_stats, 'carga_fuentes': data.report}
+gauges = {
+    'andina_cache_resultados_bytes': cache_stats['bytes'],
+    'andina_cache_resultados_aciertos_total': cache_stats['hits'],
+    'andina_cache_resultados_fallos_total': cache_stats['misses'],
+    'andina_datasets_cargados': len(data.loaded()),
+}
+col_json, col_prom, col_reset = st.columns(3)
+col_json.download_button("Descargar JSON", METRICS.to_json(extra), file_name="metricas_andina.json",
+                         mime="application/json")
+col_prom.download_button("Descargar Prometheus", METRICS.to_prometheus(gauges), file_name="metricas_andina.prom",
+                         mime="text/plain")
+if col_reset.button("Reiniciar contadores"):
+    METRICS.reset()
+    st.rerun()
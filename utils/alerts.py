@@ -0,0 +1,163 @@
+"""
+Stock-out and overstock alerts per product and logistics center.
+
+A batch job (alerts.py at the repo root) computes, from the latest inventory
+snapshot and the recent sales velocity, the days of cover of every
+(producto_id, centro_logistico) and flags stock-outs, stock-out risk and
+overstock. The result is persisted as a small Parquet table next to the
+snapshot cache, so the Inventario page only reads it and never computes it
+on a server thread.
+"""
+import json
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from utils.data_loader import CACHE_DIR, DATA_DIR, FILES, _dump_json, _write_atomic, load_source
+from utils.ingest import ingest_version
+from utils.rotation import sales_centers
+
+ALERTS_PATH = os.path.join(CACHE_DIR, "alertas_inventario.parquet")
+ALERTS_META_PATH = os.path.join(CACHE_DIR, "alertas_inventario.json")
+
+# Sales velocity is measured over the last VELOCITY_DAYS before the cut-off
+VELOCITY_DAYS = 90
+# Below LOW_COVER_DAYS of cover is a stock-out risk, above OVERSTOCK_DAYS overstock
+LOW_COVER_DAYS = 15
+OVERSTOCK_DAYS = 180
+
+ALERT_LABELS = ['Ruptura', 'Riesgo de ruptura', 'Sobre-stock', 'Normal']
+
+_read_cache = {}
+_read_lock = threading.Lock()
+
+
+def data_stamp():
+    """
+    Version of the inputs of the job: (file, mtime_ns, size) of the sales
+    and inventory extracts plus the ingest log version.
+    """
+    stamp = []
+    for key in ('ventas', 'inventario'):
+        try:
+            stat = os.stat(os.path.join(DATA_DIR, FILES[key]))
+            stamp.append([FILES[key], stat.st_mtime_ns, stat.st_size])
+        except OSError:
+            stamp.append([FILES[key], None, None])
+    return {'fuentes': stamp, 'ingesta': ingest_version()}
+
+
+def compute_alerts(inventory, ventas, velocity_days=VELOCITY_DAYS,
+                   low_cover_days=LOW_COVER_DAYS, overstock_days=OVERSTOCK_DAYS):
+    """
+    Alert table of the latest inventory snapshot: stock, average daily units
+    sold over the last `velocity_days`, days of cover and the alert of every
+    (producto_id, centro_logistico). Products with stock and no recent sales
+    have infinite cover and count as overstock.
+    """
+    latest = inventory['fecha_corte'].max()
+    current = inventory[(inventory['fecha_corte'] == latest).to_numpy()]
+
+    recent = ventas[((ventas['fecha'] > latest - pd.Timedelta(days=velocity_days))
+                     & (ventas['fecha'] <= latest)).fillna(False).to_numpy()]
+    units = pd.Series(recent['cantidad'].to_numpy(dtype='float64'), name='unidades').groupby([
+        recent['producto_id'].to_numpy(),
+        sales_centers(recent['region']),
+    ]).sum()
+    units.index.names = ['producto_id', 'centro_logistico']
+
+    keys = pd.MultiIndex.from_arrays(
+        [current['producto_id'].to_numpy(), current['centro_logistico'].astype(str).to_numpy()],
+        names=['producto_id', 'centro_logistico'],
+    )
+    sold = units.reindex(keys, fill_value=0.0).to_numpy()
+    stock = current['stock_unidades'].to_numpy(dtype='float64', na_value=0)
+    velocity = sold / velocity_days
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cover = np.where(stock <= 0, 0.0, np.where(velocity > 0, stock / velocity, np.inf))
+
+    # 0 Ruptura, 1 Riesgo de ruptura, 2 Sobre-stock, 3 Normal
+    codes = np.select([stock <= 0, cover < low_cover_days, cover > overstock_days], [0, 1, 2], default=3)
+    return pd.DataFrame({
+        'producto_id': current['producto_id'].to_numpy(),
+        'centro_logistico': current['centro_logistico'].array,
+        'categoria': current['categoria'].array,
+        'stock_unidades': stock.astype('int32'),
+        'valor_inventario_cop': current['valor_inventario_cop'].to_numpy(),
+        'venta_diaria': velocity.astype('float32'),
+        'dias_cobertura': cover.astype('float32'),
+        'alerta': pd.Categorical.from_codes(codes, ALERT_LABELS),
+    })
+
+
+def run_alert_job(force=False):
+    """
+    Recomputes the alert table if the sales/inventory data changed since the
+    last run (or force) and persists it. Returns the metadata written, or
+    None when the table was already up to date.
+    """
+    stamp = data_stamp()
+    meta = read_alert_meta()
+    if not force and meta is not None and meta.get('datos') == stamp:
+        return None
+
+    inventory, _ = load_source('inventario')
+    ventas, _ = load_source('ventas')
+    alerts = compute_alerts(inventory, ventas)
+
+    meta = {
+        'calculado': datetime.now().isoformat(timespec='seconds'),
+        'fecha_corte': str(inventory['fecha_corte'].max().date()),
+        'datos': stamp,
+        'parametros': {
+            'dias_velocidad': VELOCITY_DAYS,
+            'dias_riesgo': LOW_COVER_DAYS,
+            'dias_sobre_stock': OVERSTOCK_DAYS,
+        },
+        'resumen': {label: int(n) for label, n in alerts['alerta'].value_counts(sort=False).items()},
+    }
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    _write_atomic(ALERTS_PATH, lambda p: alerts.to_parquet(p, index=False))
+    _write_atomic(ALERTS_META_PATH, lambda p: _dump_json(meta, p))
+    return meta
+
+
+def read_alert_meta():
+    try:
+        with open(ALERTS_META_PATH, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def read_alerts():
+    """
+    Returns (alert table, metadata) as last written by the job, or
+    (None, None) if it has never run. The table is read once per file
+    version and shared by every session: treat it as read-only.
+    """
+    try:
+        stat = os.stat(ALERTS_PATH)
+    except OSError:
+        return None, None
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _read_lock:
+        cached = _read_cache.get(ALERTS_PATH)
+        if cached is not None and cached[0] == version:
+            return cached[1], cached[2]
+    try:
+        alerts = pd.read_parquet(ALERTS_PATH)
+    except Exception as e:
+        print(f"Could not read {ALERTS_PATH}: {e}")
+        return None, None
+    meta = read_alert_meta()
+    with _read_lock:
+        _read_cache[ALERTS_PATH] = (version, alerts, meta)
+    return alerts, meta
+
+
+def alerts_are_current(meta):
+    return meta is not None and meta.get('datos') == data_stamp()
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+# Aging buckets of cartera by days past due (right-closed: 30 -> '1-30 días')
+AGING_BINS = [-np.inf, 0, 30, 60, 90, np.inf]
+AGING_LABELS = ['Al día', '1-30 días', '31-60 días', '61-90 días', '> 90 días']
+OVERDUE_LABELS = AGING_LABELS[1:]
+
+CHANNELS = ['Contado', 'Crédito']
+
+VALUE_SEGMENTS = ['Bajo Valor', 'Valor Medio', 'Alto Valor']
+
+
+def classify_aging(dias_mora, bins=None, labels=None):
+    """
+    Aging bucket of every document as a categorical, in one binned pass.
+    """
+    bins = AGING_BINS if bins is None else bins
+    labels = AGING_LABELS if labels is None else labels
+    days = pd.to_numeric(dias_mora, errors='coerce').astype('float64')
+    return pd.cut(days, bins=bins, labels=labels, right=True)
+
+
+def simplify_channel(tipo_venta):
+    """
+    Maps tipo_venta to 'Contado' / 'Crédito'. The mapping is computed once per
+    category and applied to the codes.
+    """
+    tipo_venta = pd.Series(tipo_venta)
+    if not isinstance(tipo_venta.dtype, pd.CategoricalDtype):
+        tipo_venta = tipo_venta.astype('category')
+    categories = tipo_venta.cat.categories.astype(str)
+    code_map = np.append(np.where(categories.str.contains('Contado'), 0, 1), 1)
+    codes = code_map[tipo_venta.cat.codes.to_numpy()]
+    return pd.Series(pd.Categorical.from_codes(codes, CHANNELS), index=tipo_venta.index)
+
+
+def segment_by_value(values, low=0.5, high=0.8):
+    """
+    Value segment of every client: above the `high` quantile is 'Alto Valor',
+    above the `low` quantile 'Valor Medio', the rest 'Bajo Valor'. Both
+    quantiles are computed once for the whole set.
+    """
+    values = pd.Series(values)
+    q_low, q_high = values.quantile([low, high]).to_numpy()
+    codes = (values.to_numpy() > q_low).astype('int8') + (values.to_numpy() > q_high).astype('int8')
+    return pd.Series(pd.Categorical.from_codes(codes, VALUE_SEGMENTS), index=values.index)
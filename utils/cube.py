@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+
+from utils.schemas import concat_typed
+
+# Grain of the cube. categoria is functionally dependent on producto_id and
+# segmento on cliente_id, so they add no rows but let category and segment
+# roll-ups and filters skip the dimensions.
+CUBE_KEYS = ['anio', 'mes', 'cliente_id', 'producto_id', 'categoria', 'region', 'segmento', 'tipo_venta',
+             'ejecutivo']
+
+# Additive measures. suma_margen_pct / num_ventas gives the row-level mean
+# margin % that the Rentabilidad pivot shows. costo_real_cop / margen_real_cop
+# are at the TRM of the supplying import (utils.landed_cost); 0 when unknown.
+CUBE_MEASURES = ['subtotal_cop', 'margen_total_cop', 'costo_cop', 'cantidad', 'num_ventas', 'suma_margen_pct',
+                 'costo_real_cop', 'margen_real_cop']
+
+
+def _aggregate(ventas):
+    """
+    Aggregates sales rows to the cube grain. Sales without a date belong to
+    no month and are left out.
+    """
+    ventas = ventas[ventas['fecha'].notna().to_numpy()]
+    fecha = ventas['fecha']
+    rows = pd.DataFrame({
+        'anio': fecha.dt.year.astype('int16'),
+        'mes': fecha.dt.month.astype('int8'),
+        'cliente_id': ventas['cliente_id'],
+        'producto_id': ventas['producto_id'],
+        'categoria': ventas['categoria'],
+        'region': ventas['region'],
+        'segmento': ventas['segmento'],
+        'tipo_venta': ventas['tipo_venta'],
+        'ejecutivo': ventas['ejecutivo'],
+        'subtotal_cop': ventas['subtotal_cop'],
+        'margen_total_cop': ventas['margen_total_cop'],
+        'costo_cop': ventas['subtotal_cop'] - ventas['margen_total_cop'],
+        'cantidad': ventas['cantidad'].fillna(0).astype('int64'),
+        'num_ventas': 1,
+        'suma_margen_pct': ventas['margen_pct'],
+        'costo_real_cop': ventas['costo_real_cop'] if 'costo_real_cop' in ventas.columns else float('nan'),
+        'margen_real_cop': ventas['margen_real_cop'] if 'margen_real_cop' in ventas.columns else float('nan'),
+    })
+    return _regroup(rows)
+
+
+def _regroup(rows):
+    # dropna=False: a sale with a missing region, category, etc. still counts in every total
+    return rows.groupby(CUBE_KEYS, observed=True, dropna=False, sort=False)[CUBE_MEASURES].sum().reset_index()
+
+
+def _period_ids(years, months):
+    return years.astype('int32') * 100 + months.astype('int32')
+
+
+def _sort_periods(cube):
+    """
+    Returns the cube sorted by (anio, mes), or the cube itself if it already
+    is. Kept sorted so a period is a contiguous block (see period_slice).
+    """
+    if _period_ids(cube['anio'], cube['mes']).is_monotonic_increasing:
+        return cube
+    return cube.sort_values(['anio', 'mes'], kind='stable', ignore_index=True)
+
+
+def build_cube(ventas):
+    """
+    Builds the monthly sales cube from the clean sales fact. One row per
+    (anio, mes, cliente, producto, region, tipo_venta, ejecutivo) with the
+    sums of CUBE_MEASURES.
+    """
+    if ventas is None or ventas.empty:
+        return pd.DataFrame(columns=CUBE_KEYS + CUBE_MEASURES)
+    # Already in period order when the fact is sorted by date
+    return _sort_periods(_aggregate(ventas))
+
+
+def refresh_periods(cube, ventas, periods, index=None):
+    """
+    Re-aggregates the given (anio, mes) periods from the sales fact and swaps
+    them into the cube, so the cost follows the size of the delta. Correct
+    also when delta rows replaced existing sales (corrections): the touched
+    periods are recomputed from the fact, not added to. With the DateIndex
+    of the (date-sorted) fact, the periods' rows are sliced, not masked.
+    """
+    periods = pd.DataFrame(periods, columns=['anio', 'mes']).drop_duplicates()
+    if periods.empty:
+        return cube
+    ids = _period_ids(periods['anio'], periods['mes'])
+    if index is not None:
+        rows = concat_typed([ventas.iloc[index.period(anio, mes)]
+                             for anio, mes in periods.itertuples(index=False)])
+    else:
+        fact_ids = _period_ids(ventas['fecha'].dt.year, ventas['fecha'].dt.month)
+        rows = ventas[fact_ids.isin(ids).to_numpy()]
+    rebuilt = build_cube(rows)
+    if cube is None or cube.empty:
+        return rebuilt
+    kept = cube[~_period_ids(cube['anio'], cube['mes']).isin(ids).to_numpy()]
+    return _sort_periods(concat_typed([kept, rebuilt]).reset_index(drop=True))
+
+
+def period_slice(cube, year=None, month=None):
+    """
+    Slice of the cube rows of a year (and optionally a month of it). The cube
+    is sorted by period, so this is a binary search per key, not a mask.
+    """
+    if year is None:
+        return slice(None)
+    years = cube['anio'].to_numpy()
+    start, stop = np.searchsorted(years, year, 'left'), np.searchsorted(years, year, 'right')
+    if month is not None:
+        months = cube['mes'].to_numpy()[start:stop]
+        start, stop = start + np.searchsorted(months, month, 'left'), start + np.searchsorted(months, month, 'right')
+    return slice(int(start), int(stop))
+
+
+def filter_cube(cube, year=None, month=None):
+    """
+    Returns the cube rows of a year (and optionally a month). None means all.
+    A year (and month) is a slice of the cube, i.e. a view.
+    """
+    if year is None and month is not None:
+        # The same month across years is not contiguous
+        return cube[(cube['mes'] == month).to_numpy()]
+    return cube.iloc[period_slice(cube, year, month)]
+
+
+def rollup(cube, by, year=None, month=None, measures=None):
+    """
+    Sums the measures of the cube grouped by the given cube keys, optionally
+    for a single year/month.
+    """
+    measures = measures or CUBE_MEASURES
+    rows = filter_cube(cube, year, month)
+    return rows.groupby(by, observed=True)[measures].sum().reset_index()
+
+
+def totals(cube, year=None, month=None):
+    """
+    Returns the grand totals of every measure as a dict, plus margen_pct.
+    """
+    rows = filter_cube(cube, year, month)
+    result = {m: rows[m].sum() for m in CUBE_MEASURES}
+    ventas = result['subtotal_cop']
+    result['margen_pct'] = (result['margen_total_cop'] / ventas) * 100 if ventas > 0 else 0
+    return result
+
+
+def years(cube):
+    return sorted(cube['anio'].unique().tolist(), reverse=True)
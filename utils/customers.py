@@ -0,0 +1,231 @@
+"""
+Customer analytics: RFM scores, cohort retention by registration date
+(fecha_alta), sales concentration (Herfindahl and Gini) and lifetime value.
+
+Everything is computed from the monthly cube in one pass keyed by the
+integer cliente_id: the cube rows are factorized once into client codes and
+every per-client measure is a bincount / ufunc.at over those codes, so the
+cost grows with the cube, not with a groupby per measure, and a base of
+hundreds of thousands of clients takes one pass. The result is built once
+per data version (see utils.views.customer_analytics) and the page only
+reads its frames.
+
+The cube's grain is the month, so recency is measured in months: the number
+of months between a client's last purchase and the last month with sales.
+"""
+import numpy as np
+import pandas as pd
+
+# Scores are quintiles: 1 (worst) to 5 (best)
+RFM_BINS = 5
+
+# RFM segments, checked in order: (label, condition on the R and F scores)
+RFM_SEGMENTS = [
+    ('Campeones', lambda r, f: (r >= 4) & (f >= 4)),
+    ('Leales', lambda r, f: (r >= 3) & (f >= 4)),
+    ('Nuevos', lambda r, f: (r >= 4) & (f <= 2)),
+    ('En Riesgo', lambda r, f: (r <= 2) & (f >= 3)),
+    ('Perdidos', lambda r, f: (r <= 2) & (f <= 2)),
+]
+RFM_DEFAULT_SEGMENT = 'Potenciales'
+RFM_LABELS = [label for label, _ in RFM_SEGMENTS] + [RFM_DEFAULT_SEGMENT]
+
+# Months per cohort and per retention period (3: quarters)
+COHORT_MONTHS = 3
+
+
+def _month_ordinal(years, months):
+    return years.astype('int64') * 12 + months.astype('int64') - 1
+
+
+def _period_label(ordinal, months):
+    """
+    Label of a period of `months` months starting at a month ordinal:
+    '2023' for years, '2023-T2' for quarters, '2023-05' otherwise.
+    """
+    year, month = ordinal // 12, ordinal % 12 + 1
+    if months == 12:
+        return f"{year}"
+    if months == 3:
+        return f"{year}-T{(month - 1) // 3 + 1}"
+    return f"{year}-{month:02d}"
+
+
+def score(values, bins=RFM_BINS, higher_is_better=True):
+    """
+    Quantile score of every value, 1 to `bins` (ties share the best score of the tie).
+    """
+    pct = pd.Series(values).rank(pct=True, method='max', ascending=higher_is_better).to_numpy()
+    return np.clip(np.ceil(pct * bins), 1, bins).astype('int8')
+
+
+def rfm_segment(r, f):
+    """
+    RFM segment of every client from its recency and frequency scores.
+    """
+    conditions = [condition(r, f) for _, condition in RFM_SEGMENTS]
+    codes = np.select(conditions, range(len(RFM_SEGMENTS)), default=len(RFM_SEGMENTS))
+    return pd.Categorical.from_codes(codes, RFM_LABELS)
+
+
+def concentration(values):
+    """
+    Herfindahl-Hirschman index (0-10,000), equivalent number of clients
+    (1 / HHI on shares) and Gini coefficient of a set of positive sales.
+    """
+    values = np.sort(np.asarray(values, dtype='float64'))
+    values = values[values > 0]
+    n, total = len(values), values.sum()
+    if n == 0 or total <= 0:
+        return {'hhi': 0.0, 'clientes_equivalentes': 0.0, 'gini': 0.0}
+    shares = values / total
+    hhi = float((shares ** 2).sum())
+    # Sorted ascending: G = 2 * sum(i * x_i) / (n * sum(x)) - (n + 1) / n
+    gini = float(2 * (np.arange(1, n + 1) * values).sum() / (n * total) - (n + 1) / n)
+    return {'hhi': hhi * 10_000, 'clientes_equivalentes': 1 / hhi, 'gini': gini}
+
+
+class CustomerAnalytics:
+    """
+    Per-client measures and the RFM, cohort and concentration tables of a cube.
+
+    clients: one row per cliente_id with purchases: first/last month,
+        active months, frequency (sales), monetary (sales COP), margin
+        (lifetime value, COP), margin per active month, R/F/M scores, RFM
+        code and segment.
+    cohorts: share of the clients registered in each period (fecha_alta)
+        that bought in each period since, one row per cohort.
+    concentration_by_year: clients, HHI, equivalent clients, Gini and
+        top-10 share of the sales of every year, plus 'Todos' for all years.
+    """
+
+    def __init__(self, cube, clientes=None, cohort_months=COHORT_MONTHS):
+        # Sales without a client count in the cube totals but belong to no client
+        cube = cube[cube['cliente_id'].notna().to_numpy()]
+        codes, ids = pd.factorize(cube['cliente_id'], sort=True)
+        ids = np.asarray(ids)
+        n_clients = len(ids)
+        month = _month_ordinal(cube['anio'].to_numpy(), cube['mes'].to_numpy())
+        first_month = int(month.min()) if len(month) else 0
+        last_month = int(month.max()) if len(month) else 0
+        n_months = last_month - first_month + 1
+
+        sales = cube['subtotal_cop'].to_numpy(dtype='float64')
+        margin = cube['margen_total_cop'].to_numpy(dtype='float64')
+        frequency = np.bincount(codes, weights=cube['num_ventas'].to_numpy(dtype='float64'), minlength=n_clients)
+        monetary = np.bincount(codes, weights=sales, minlength=n_clients)
+        lifetime_margin = np.bincount(codes, weights=margin, minlength=n_clients)
+        first = np.full(n_clients, last_month, dtype='int64')
+        last = np.full(n_clients, first_month, dtype='int64')
+        np.minimum.at(first, codes, month)
+        np.maximum.at(last, codes, month)
+
+        # Distinct (client, month) pairs: the months each client was active
+        active = pd.unique(codes.astype('int64') * n_months + (month - first_month))
+        active_client, active_month = active // n_months, active % n_months + first_month
+        active_months = np.bincount(active_client, minlength=n_clients)
+
+        recency = last_month - last
+        r = score(recency, higher_is_better=False)
+        f = score(frequency)
+        m = score(monetary)
+        self.clients = pd.DataFrame({
+            'cliente_id': ids,
+            'primer_mes': pd.PeriodIndex.from_ordinals(first - 1970 * 12, freq='M').to_timestamp(),
+            'ultimo_mes': pd.PeriodIndex.from_ordinals(last - 1970 * 12, freq='M').to_timestamp(),
+            'recencia_meses': recency,
+            'meses_activos': active_months,
+            'frecuencia': frequency.astype('int64'),
+            'monetario_cop': monetary,
+            'ltv_cop': lifetime_margin,
+            'margen_mensual_cop': np.divide(lifetime_margin, active_months, out=np.zeros(n_clients),
+                                            where=active_months > 0),
+            'r': r,
+            'f': f,
+            'm': m,
+            'rfm': r.astype('int16') * 100 + f.astype('int16') * 10 + m,
+            'segmento_rfm': rfm_segment(r, f),
+        })
+
+        self.cohorts = self._cohorts(ids, active_client, active_month, clientes, cohort_months)
+        self.concentration_by_year = self._concentration(codes, n_clients, cube['anio'].to_numpy(), sales)
+
+    @staticmethod
+    def _cohorts(ids, active_client, active_month, clientes, months):
+        """
+        Retention matrix: cohort (period of fecha_alta) x periods since
+        registration, as the share of the cohort's clients active then.
+        """
+        if clientes is None or clientes.empty or 'fecha_alta' not in clientes.columns:
+            return pd.DataFrame()
+        clientes = clientes[clientes['fecha_alta'].notna().to_numpy()].drop_duplicates('cliente_id')
+        alta = clientes['fecha_alta']
+        alta_period = _month_ordinal(alta.dt.year.to_numpy(), alta.dt.month.to_numpy()) // months
+        cohort_ids, cohort = np.unique(alta_period, return_inverse=True)
+        cohort_size = np.bincount(cohort, minlength=len(cohort_ids))
+
+        # Cohort of every client with purchases (-1 without fecha_alta)
+        position = pd.Index(clientes['cliente_id']).get_indexer(ids)
+        client_cohort = np.where(position >= 0, cohort[position], -1)
+        pair_cohort = client_cohort[active_client]
+        known = pair_cohort >= 0
+        offset = active_month[known] // months - cohort_ids[pair_cohort[known]]
+        client = active_client[known][offset >= 0]
+        offset = offset[offset >= 0]
+        # A client counts once per period even if active in several of its months
+        n_offsets = int(offset.max()) + 1 if len(offset) else 1
+        pairs = pd.unique(client * n_offsets + offset)
+        counts = np.bincount(client_cohort[pairs // n_offsets] * n_offsets + pairs % n_offsets,
+                             minlength=len(cohort_ids) * n_offsets)
+        retention = counts.reshape(len(cohort_ids), n_offsets) / cohort_size[:, None]
+
+        # Periods not reached yet by a cohort are missing, not 0%
+        last_period = active_month.max() // months if len(active_month) else 0
+        reached = np.arange(n_offsets)[None, :] <= (last_period - cohort_ids)[:, None]
+        frame = pd.DataFrame(np.where(reached, retention, np.nan), columns=range(n_offsets))
+        frame.insert(0, 'clientes', cohort_size)
+        frame.index = [_period_label(p * months, months) for p in cohort_ids]
+        frame.index.name = 'cohorte'
+        return frame
+
+    @staticmethod
+    def _concentration(codes, n_clients, years, sales, top=10):
+        """
+        Concentration of the sales among clients, per year and overall.
+        """
+        year_ids, year = np.unique(years, return_inverse=True)
+        per_year = np.bincount(year * n_clients + codes, weights=sales,
+                               minlength=len(year_ids) * n_clients).reshape(len(year_ids), n_clients)
+        rows = []
+        for label, values in [(str(y), per_year[i]) for i, y in enumerate(year_ids)] + [('Todos', per_year.sum(axis=0))]:
+            active = values[values > 0]
+            top_sales = np.sort(active)[-top:].sum()
+            rows.append({
+                'anio': label,
+                'clientes': len(active),
+                **concentration(active),
+                'top10_pct': top_sales / active.sum() * 100 if active.sum() > 0 else 0.0,
+            })
+        return pd.DataFrame(rows)
+
+    @property
+    def nbytes(self):
+        return int(sum(frame.memory_usage(deep=True).sum()
+                       for frame in (self.clients, self.cohorts, self.concentration_by_year)))
+
+    def segments(self):
+        """
+        Clients and averages of every RFM segment.
+        """
+        summary = self.clients.groupby('segmento_rfm', observed=True).agg(
+            clientes=('cliente_id', 'size'),
+            recencia_meses=('recencia_meses', 'mean'),
+            frecuencia=('frecuencia', 'mean'),
+            monetario_cop=('monetario_cop', 'mean'),
+            ltv_cop=('ltv_cop', 'mean'),
+        )
+        return summary.reset_index()
+
+
+def build_customer_analytics(cube, clientes=None, cohort_months=COHORT_MONTHS):
+    return CustomerAnalytics(cube, clientes, cohort_months)
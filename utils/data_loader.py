@@ -1,75 +1,473 @@
 import pandas as pd
 import os
+import json
+import hashlib
+import codecs
+import csv
+import tempfile
+import threading
+import time
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from utils.cube import build_cube
+from utils.instrumentation import timed
+from utils.landed_cost import add_landed_cost
+from utils.model import SORTED_FACTS, StarModel, build_star_model, sort_by_date
+from utils.schemas import apply_schema, frame_memory_mb, read_dtypes, schema_version, validate_schema
 
 # Define data directory
-# Use relative path for deployment compatibility
-DATA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Use relative path for deployment compatibility (ANDINA_DATA_DIR points it elsewhere,
+# e.g. at a synthetic dataset for benchmarks)
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.environ.get("ANDINA_DATA_DIR", REPO_DIR)
+
+# Columnar snapshots of the parsed sources live here (one Parquet file + one
+# JSON fingerprint per source). Can be moved with ANDINA_CACHE_DIR.
+CACHE_DIR = os.environ.get("ANDINA_CACHE_DIR", os.path.join(DATA_DIR, ".cache"))
+
+# Sources are parsed concurrently in threads (the CSV/Parquet readers release
+# the GIL), one per source unless ANDINA_LOAD_WORKERS says otherwise.
+LOAD_WORKERS = int(os.environ.get("ANDINA_LOAD_WORKERS", 6))
+
+# CSVs of at least this size (MB) are parsed with pyarrow's multithreaded
+# reader when it is installed. Set ANDINA_PYARROW_CSV_MB=0 to always use it.
+PYARROW_CSV_MB = float(os.environ.get("ANDINA_PYARROW_CSV_MB", 8))
+
+# Query backend: 'pandas' keeps every fact in memory; 'duckdb' builds the sales
+# cube and the rotation and portfolio aggregates in SQL over the snapshots
+# (utils.sql_backend), so the sales fact is never loaded. Needs duckdb;
+# without it the dashboard stays on pandas.
+BACKEND = os.environ.get("ANDINA_BACKEND", "pandas").strip().lower()
+
+# Bytes sampled from the head of a CSV to detect its encoding and delimiter
+SNIFF_BYTES = 64 * 1024
+CSV_DELIMITERS = ',;\t|'
+
+FILES = {
+    "ventas": "ventas_andina.csv",
+    "clientes": "clientes_andina.csv",
+    "productos": "productos_andina.csv",
+    "cartera": "cartera_andina.csv",
+    "inventario": "inventario_andina.csv",
+    "importaciones": "importaciones_andina (1).xlsx"
+}
+
+
+# (path, mtime_ns, size) -> format detected by sniff_csv
+_csv_formats = {}
+
+
+def _csv_engine(path):
+    """
+    'pyarrow' for CSVs of at least PYARROW_CSV_MB when pyarrow is available,
+    otherwise pandas' default C parser (None).
+    """
+    if os.path.getsize(path) < PYARROW_CSV_MB * 1024 ** 2:
+        return None
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return None
+    return 'pyarrow'
+
+
+def _read_csv(path, dtype, engine, **kwargs):
+    df = pd.read_csv(path, dtype=dtype, engine=engine, **kwargs)
+    if engine == 'pyarrow':
+        # pyarrow infers dates itself (as datetime.date objects or seconds);
+        # match the C parser + schema so snapshots, deltas and chunks
+        # concatenate with one dtype
+        for col in df.columns:
+            if (pd.api.types.is_datetime64_any_dtype(df[col])
+                    or pd.api.types.infer_dtype(df[col], skipna=True) in ('date', 'datetime')):
+                df[col] = pd.to_datetime(df[col], errors='coerce').astype('datetime64[us]')
+    return df
+
+
+def sniff_csv(path, sample_bytes=SNIFF_BYTES):
+    """
+    Detects the encoding and delimiter of a CSV from its first sample_bytes:
+    a UTF-8 BOM means 'utf-8-sig', otherwise UTF-8 if the sample decodes and
+    latin1 if not; the delimiter is the candidate that splits the header and
+    the sampled rows into the same number of fields. Returns a dict with
+    'encoding', 'sep' and 'bom', remembered per file version so the file is
+    only sampled again when it changes.
+    """
+    stat = os.stat(path)
+    stamp = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    fmt = _csv_formats.get(stamp)
+    if fmt is not None:
+        return fmt
+
+    with open(path, 'rb') as f:
+        sample = f.read(sample_bytes)
+    bom = sample.startswith(codecs.BOM_UTF8)
+    if len(sample) == sample_bytes and b'\n' in sample:
+        # Only whole lines, so a multi-byte character is never cut in two
+        sample = sample[:sample.rindex(b'\n')]
+    try:
+        text = sample.decode('utf-8-sig')
+        encoding = 'utf-8-sig' if bom else 'utf-8'
+    except UnicodeDecodeError:
+        text = sample.decode('latin1')
+        encoding = 'latin1'
+
+    lines = [line for line in text.splitlines() if line.strip()][:50]
+    sep = ','
+    if lines:
+        try:
+            sep = csv.Sniffer().sniff('\n'.join(lines), delimiters=CSV_DELIMITERS).delimiter
+        except csv.Error:
+            # Quoted or irregular rows: fall back to the header alone
+            sep = max(CSV_DELIMITERS, key=lines[0].count)
+    fmt = {'encoding': encoding, 'sep': sep, 'bom': bom}
+    _csv_formats[stamp] = fmt
+    return fmt
+
+
+def _read_source(path, dtype=None):
+    """
+    Parses a raw source file (CSV or Excel) into a DataFrame. CSVs are parsed
+    exactly once, with the encoding and delimiter found by sniff_csv.
+    """
+    if path.endswith('.xlsx'):
+        return pd.read_excel(path, dtype=dtype)
+
+    fmt = sniff_csv(path)
+    return _read_csv(path, dtype, _csv_engine(path), encoding=fmt['encoding'], sep=fmt['sep'])
+
+
+def _warn(avisos, message):
+    """
+    Records a load warning in `avisos` (the load report) or, without one,
+    prints it.
+    """
+    if avisos is None:
+        print(message)
+    else:
+        avisos.append(message)
+
 
-def load_data():
+def read_typed_source(key, path, avisos=None):
     """
-    Loads all data files and returns a dictionary of DataFrames.
+    Parses a source with its schema applied at read time: the parser builds the
+    categoricals and narrow numeric columns directly, then dates and currency
+    columns are converted. If the file does not fit the declared dtypes (e.g.
+    text in an ID column) it is parsed untyped and coerced instead. The
+    fallback and any schema problem are appended to `avisos` (see _warn).
     """
-    files = {
-        "ventas": "ventas_andina.csv",
-        "clientes": "clientes_andina.csv",
-        "productos": "productos_andina.csv",
-        "cartera": "cartera_andina.csv",
-        "inventario": "inventario_andina.csv",
-        "importaciones": "importaciones_andina (1).xlsx"
+    try:
+        df = _read_source(path, dtype=read_dtypes(key))
+    except (ValueError, TypeError) as e:
+        _warn(avisos, f"{FILES[key]} no coincide con su esquema al leerlo ({e}); se convirtió después del parseo")
+        df = _read_source(path)
+    df = apply_schema(df, key)
+    for problem in validate_schema(df, key):
+        _warn(avisos, f"Esquema: {problem}")
+    return df
+
+
+def _content_hash(path, chunk_size=1 << 20):
+    """
+    Returns the blake2b digest of a file, read in 1 MB chunks.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _snapshot_paths(key):
+    """
+    Returns (parquet_path, fingerprint_path) of the snapshot for a source.
+    """
+    return (os.path.join(CACHE_DIR, f"{key}.parquet"),
+            os.path.join(CACHE_DIR, f"{key}.json"))
+
+
+def _read_fingerprint(fingerprint_path):
+    try:
+        with open(fingerprint_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _dump_json(obj, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(obj, f)
+
+
+def _write_atomic(path, write):
+    """
+    Writes through a temporary file and renames it, so readers never see a
+    half-written snapshot. The temporary name is unique, so concurrent
+    writers (dashboard, warm_cache, ingest) never write into each other's file.
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile(dir=directory, prefix=f".{name}.", suffix=".tmp", delete=False) as tmp:
+        tmp_path = tmp.name
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _snapshot_is_valid(path, snapshot_path, fingerprint_path):
+    """
+    Checks the stored fingerprint (path + mtime + size + content hash, plus the
+    schema version) against the source file. The hash is only recomputed when mtime or size changed,
+    so an untouched source costs two stat calls.
+    """
+    fingerprint = _read_fingerprint(fingerprint_path)
+    if fingerprint is None or not os.path.exists(snapshot_path):
+        return False
+    if fingerprint.get('path') != os.path.abspath(path):
+        return False
+    if fingerprint.get('schema') != schema_version():
+        return False
+
+    stat = os.stat(path)
+    if fingerprint.get('mtime_ns') == stat.st_mtime_ns and fingerprint.get('size') == stat.st_size:
+        return True
+    if fingerprint.get('size') != stat.st_size:
+        return False
+
+    # Same size but touched: the snapshot is still good if the content is.
+    if fingerprint.get('sha') != _content_hash(path):
+        return False
+    fingerprint['mtime_ns'] = stat.st_mtime_ns
+    _write_atomic(fingerprint_path, lambda p: _dump_json(fingerprint, p))
+    return True
+
+
+def store_snapshot(key, df, applied_deltas):
+    """
+    Replaces the snapshot of a source with df (its base extract plus appended
+    delta files) and records the applied delta files in the fingerprint. The
+    base fingerprint is kept, so the snapshot stays valid until a new full
+    extract replaces the source file; that extract supersedes the deltas.
+    """
+    snapshot_path, fingerprint_path = _snapshot_paths(key)
+    fingerprint = _read_fingerprint(fingerprint_path) or {}
+    fingerprint['deltas'] = fingerprint.get('deltas', []) + list(applied_deltas)
+    _write_atomic(snapshot_path, lambda p: df.to_parquet(p, index=False))
+    _write_atomic(fingerprint_path, lambda p: _dump_json(fingerprint, p))
+
+
+def _source_fingerprint(path):
+    """
+    Fingerprint of a source file as it is now. Taken before the file is
+    parsed: if it is replaced mid-parse, the snapshot keeps the old file's
+    fingerprint and is rebuilt on the next load instead of passing as current.
+    """
+    stat = os.stat(path)
+    return {
+        'path': os.path.abspath(path),
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'sha': _content_hash(path),
+        'schema': schema_version(),
     }
-    
-    data = {}
-    
-    for key, filename in files.items():
-        path = os.path.join(DATA_DIR, filename)
+
+
+def _write_snapshot(key, fingerprint, df):
+    """
+    Stores df as the Parquet snapshot of a source together with the
+    fingerprint of the file it was parsed from (_source_fingerprint).
+    """
+    snapshot_path, fingerprint_path = _snapshot_paths(key)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    _write_atomic(snapshot_path, lambda p: df.to_parquet(p, index=False))
+    _write_atomic(fingerprint_path, lambda p: _dump_json(fingerprint, p))
+
+
+def _parse_timed(key, path, avisos=None):
+    with timed(f"parseo.{key}", mb=round(os.path.getsize(path) / 1024 ** 2, 2)) as details:
+        df = read_typed_source(key, path, avisos)
+        details['filas'] = len(df)
+    return df
+
+
+def load_source(key, use_cache=True, force=False, avisos=None):
+    """
+    Loads one source by key, preferring its columnar snapshot when the source
+    file has not changed. Returns (DataFrame, status) where status is 'cache'
+    when the snapshot was used, 'rebuilt' when the snapshot was (re)written and
+    'raw' when caching was skipped or unavailable. A rebuilt snapshot gets the
+    ingested deltas of its extract replayed on top (utils.ingest.replay_deltas).
+    Parse warnings are kept in the fingerprint, so a snapshot read reports the
+    same `avisos` as the parse that built it.
+    """
+    path = os.path.join(DATA_DIR, FILES[key])
+    if not use_cache:
+        return _parse_timed(key, path, avisos), 'raw'
+
+    snapshot_path, fingerprint_path = _snapshot_paths(key)
+    if not force and _snapshot_is_valid(path, snapshot_path, fingerprint_path):
+        try:
+            with timed(f"snapshot_lectura.{key}") as details:
+                df = pd.read_parquet(snapshot_path)
+                details['filas'] = len(df)
+            for message in (_read_fingerprint(fingerprint_path) or {}).get('avisos', []):
+                _warn(avisos, message)
+            return df, 'cache'
+        except Exception as e:
+            _warn(avisos, f"Snapshot ilegible descartado ({snapshot_path}): {e}")
+
+    # Imported here: utils.ingest builds on this module
+    from utils.ingest import replay_deltas
+
+    fingerprint = _source_fingerprint(path)
+    parse_warnings = []
+    df = _parse_timed(key, path, parse_warnings)
+    for message in parse_warnings:
+        _warn(avisos, message)
+    fingerprint['avisos'] = parse_warnings
+    df, fingerprint['deltas'] = replay_deltas(key, df, fingerprint['sha'])
+    try:
+        with timed(f"snapshot_escritura.{key}"):
+            _write_snapshot(key, fingerprint, df)
+    except Exception as e:
+        # No pyarrow, read-only filesystem, etc.: serve the raw parse.
+        _warn(avisos, f"No se pudo escribir el snapshot: {e}")
+        return df, 'raw'
+    return df, 'rebuilt'
+
+
+def _timed_load(key, use_cache=True, force=False):
+    """
+    Loads one source and reports how it went. Returns (DataFrame, report)
+    where report holds the file, status (see load_source, or 'error'),
+    seconds, rows, the CSV format (sniff_csv), the error message if any and
+    the load warnings (avisos: schema problems, parse fallbacks, snapshot
+    failures). A failed source yields an empty DataFrame so the rest of the
+    dashboard keeps working.
+    """
+    start = time.perf_counter()
+    error = None
+    avisos = []
+    with timed(f"carga.{key}") as details:
         try:
-            if filename.endswith('.xlsx'):
-                df = pd.read_excel(path)
-            else:
-                # Try reading with different encodings/separators
-                try:
-                    df = pd.read_csv(path, encoding='latin1', sep=';')
-                    if len(df.columns) <= 1:
-                         df = pd.read_csv(path, encoding='utf-8', sep=',')
-                except:
-                     df = pd.read_csv(path, encoding='utf-8', sep=',')
-            
-            data[key] = df
+            df, status = load_source(key, use_cache=use_cache, force=force, avisos=avisos)
         except Exception as e:
-            print(f"Error loading {filename}: {e}")
-            data[key] = pd.DataFrame() # Return empty DF on error
-            
+            df, status, error = pd.DataFrame(), 'error', f"{type(e).__name__}: {e}"
+        details.update(estado=status, filas=len(df), error=error, avisos=len(avisos))
+    seconds = time.perf_counter() - start
+    fmt = None
+    if FILES[key].endswith('.csv') and error is None:
+        fmt = sniff_csv(os.path.join(DATA_DIR, FILES[key]))
+    report = {
+        'archivo': FILES[key],
+        'estado': status,
+        'segundos': seconds,
+        'filas': len(df),
+        'formato': fmt,
+        'error': error,
+        'avisos': avisos,
+    }
+    return df, report
+
+
+def load_sources(keys=None, use_cache=True, force=False, workers=LOAD_WORKERS):
+    """
+    Loads the given sources (all of FILES by default) concurrently, so a cold
+    load costs about as much as the slowest file. Returns (data, report):
+    source key -> DataFrame and source key -> per-file report (_timed_load).
+    """
+    keys = list(FILES) if keys is None else list(keys)
+    workers = max(1, min(workers, len(keys)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="andina-load") as pool:
+        results = list(pool.map(lambda key: _timed_load(key, use_cache, force), keys))
+    data = {key: df for key, (df, _) in zip(keys, results)}
+    report = {key: entry for key, (_, entry) in zip(keys, results)}
+    return data, report
+
+
+def load_data(use_cache=True, workers=LOAD_WORKERS):
+    """
+    Loads all data files and returns a dictionary of DataFrames typed
+    according to utils.schemas.SCHEMAS.
+    Unchanged sources are read from their Parquet snapshot in CACHE_DIR;
+    only the sources whose file changed are parsed again, in parallel.
+    Use load_sources for the per-file timing report.
+    """
+    data, _ = load_sources(use_cache=use_cache, workers=workers)
     return data
 
-def process_data(data):
+
+def warm_cache(force=False, workers=LOAD_WORKERS):
     """
-    Processes and merges data to create a central data model.
+    Builds or refreshes the snapshot of every source. Returns a dict of
+    source key -> status ('cache', 'rebuilt', 'raw' or 'error: ...').
+    """
+    _, report = load_sources(force=force, workers=workers)
+    return {key: entry['estado'] if entry['error'] is None else f"error: {entry['error']}"
+            for key, entry in report.items()}
+
+
+def format_load_report(report):
+    """
+    One line per source: status, rows, seconds and CSV format, slowest first,
+    followed by its load warnings.
+    """
+    lines = []
+    for key, entry in sorted(report.items(), key=lambda item: -item[1]['segundos']):
+        line = f"{key:<15} {entry['estado']:<8} {entry['filas']:>9,} filas {entry['segundos']:7.2f}s"
+        if entry.get('formato'):
+            line += f"  {entry['formato']['encoding']} sep={entry['formato']['sep']!r}"
+        if entry['error']:
+            line += f"  {entry['error']}"
+        lines.append(line)
+        lines.extend(f"    aviso: {message}" for message in entry.get('avisos', []))
+    return "\n".join(lines)
+
+
+def memory_report():
+    """
+    Compares the memory of every frame parsed with pandas' inferred dtypes
+    against the schema-typed frames, plus the old denormalized sales merge
+    against the star model.
+    Returns a DataFrame with one row per frame (sizes in MB).
+    """
+    inferred = {key: _read_source(os.path.join(DATA_DIR, filename)) for key, filename in FILES.items()}
+    typed = load_data(use_cache=False)
+
+    rows = []
+    for key in FILES:
+        rows.append((key, len(typed[key]), frame_memory_mb(inferred[key]), frame_memory_mb(typed[key])))
+
+    # Sales as the pages see them: the old denormalized merge with inferred
+    # dtypes vs. the typed star model (facts + dimensions, not merged)
+    legacy = inferred['ventas'].merge(inferred['clientes'], on='cliente_id', how='left')
+    legacy = legacy.merge(inferred['productos'], on='producto_id', how='left')
+    model = process_data(typed)['modelo']
+    rows.append(('ventas_modelo', len(legacy), frame_memory_mb(legacy), model.memory_mb()))
+
+    report = pd.DataFrame(rows, columns=['frame', 'filas', 'mb_inferido', 'mb_esquema'])
+    report['reduccion_x'] = report['mb_inferido'] / report['mb_esquema']
+    return report
+
+
+def clean_ventas(ventas):
+    """
+    Cleans a frame of sales rows in place (dates, currency columns, margen_pct)
+    and returns it. Works on the full table as well as on delta files or chunks.
     """
-    ventas = data.get("ventas")
-    clientes = data.get("clientes")
-    productos = data.get("productos")
-    
-    if ventas is None or ventas.empty:
-        return data
-        
     # Convert dates
     date_cols = ['fecha']
     for col in date_cols:
         if col in ventas.columns:
             ventas[col] = pd.to_datetime(ventas[col], errors='coerce')
-            
-    # Merge Ventas with Clientes and Productos
-    # Ensure IDs are same type
-    if clientes is not None and not clientes.empty:
-        ventas['cliente_id'] = ventas['cliente_id'].astype(str)
-        clientes['cliente_id'] = clientes['cliente_id'].astype(str)
-        ventas = ventas.merge(clientes, on='cliente_id', how='left')
-        
-    if productos is not None and not productos.empty:
-        ventas['producto_id'] = ventas['producto_id'].astype(str)
-        productos['producto_id'] = productos['producto_id'].astype(str)
-        ventas = ventas.merge(productos, on='producto_id', how='left')
-        
+
     # Calculate Margins if not present (though inspect showed 'margen_total_cop')
     # Ensure numeric columns are numeric
     numeric_cols = ['subtotal_cop', 'margen_total_cop', 'costo_unitario_est_cop']
@@ -78,17 +476,225 @@ def process_data(data):
              # Remove currency symbols if string
             if ventas[col].dtype == 'object':
                  ventas[col] = pd.to_numeric(ventas[col].astype(str).str.replace(r'[$,]', '', regex=True), errors='coerce')
-    
+
     # Calculate Margin %
     if 'subtotal_cop' in ventas.columns and 'margen_total_cop' in ventas.columns:
         ventas['margen_pct'] = (ventas['margen_total_cop'] / ventas['subtotal_cop']) * 100
-        
-    data['merged_ventas'] = ventas
-    
-    # Process Cartera dates
-    cartera = data.get("cartera")
-    if cartera is not None and not cartera.empty:
-        cartera['fecha_factura'] = pd.to_datetime(cartera['fecha_factura'], errors='coerce')
-        cartera['fecha_vencimiento'] = pd.to_datetime(cartera['fecha_vencimiento'], errors='coerce')
-        
+
+    return ventas
+
+
+def _parse_dates(df, columns):
+    """
+    Parses the given date columns of a frame in place and returns it.
+    """
+    if df is not None and not df.empty:
+        with timed("proceso.fechas", filas=len(df), columnas=len(columns)):
+            for col in columns:
+                if col in df.columns:
+                    df[col] = pd.to_datetime(df[col], errors='coerce')
+    return df
+
+
+def prepare_ventas(ventas, productos, importaciones):
+    """
+    Cleans the sales fact, adds the real cost/margin of every sale at the
+    TRM of the import that supplied it and sorts it by date, so a month of
+    sales is a slice of rows (utils.model.DateIndex).
+    """
+    if ventas is None or ventas.empty:
+        return ventas
+    with timed("proceso.limpieza_ventas", filas=len(ventas)):
+        ventas = clean_ventas(ventas)
+    with timed("proceso.costo_importado", filas=len(ventas)):
+        ventas = add_landed_cost(ventas, productos, importaciones)
+    with timed("proceso.orden_fecha", filas=len(ventas)):
+        return sort_by_date(ventas, SORTED_FACTS["ventas"])
+
+
+# Date columns parsed once at load time so pages never mutate shared frames
+DATE_COLUMNS = {
+    "cartera": ['fecha_factura', 'fecha_vencimiento'],
+    "inventario": ['fecha_corte'],
+    "importaciones": ['fecha_orden', 'fecha_llegada'],
+}
+
+
+def process_data(data):
+    """
+    Cleans the sources and builds the central star model (data['modelo']):
+    ventas, cartera and inventario as facts referencing the clientes and
+    productos dimensions. See utils.model.StarModel for the query API.
+    Eager counterpart of LazyData, for scripts that need everything.
+    """
+    for key, columns in DATE_COLUMNS.items():
+        _parse_dates(data.get(key), columns)
+
+    ventas = data.get("ventas")
+    if ventas is not None and not ventas.empty:
+        data['ventas'] = prepare_ventas(ventas, data.get('productos'), data.get('importaciones'))
+
+    # No merge: dimension attributes are resolved on demand through the model
+    with timed("proceso.modelo"):
+        data['modelo'] = build_star_model(data)
+
+    # Monthly aggregates that the KPI/trend pages read instead of the raw fact
+    with timed("proceso.cubo"):
+        data['cubo'] = build_cube(data['modelo'].fact('ventas'))
+
     return data
+
+
+_sql_backend = None
+_sql_backend_lock = threading.Lock()
+
+
+def sql_backend():
+    """
+    The shared SqlBackend when BACKEND is 'duckdb' and duckdb is installed,
+    otherwise None (the pandas code paths are used).
+    """
+    global _sql_backend, BACKEND
+    if BACKEND != "duckdb":
+        return None
+    with _sql_backend_lock:
+        if _sql_backend is None:
+            try:
+                from utils.sql_backend import SqlBackend
+                with timed("proceso.sql_registro"):
+                    _sql_backend = SqlBackend()
+            except ImportError as e:
+                print(f"DuckDB backend not available ({e}), using pandas")
+                BACKEND = "pandas"
+                return None
+        return _sql_backend
+
+
+def _build_cube(data):
+    """
+    The monthly cube from the cheapest source at hand: SQL over the snapshots
+    (duckdb backend), the sales fact when it is already in memory, or else
+    the year/month partitions of warm_cache.py --particionar when they are
+    current, a year at a time, so the fact is never loaded whole.
+    """
+    # Imported here: utils.streaming builds on this module
+    from utils.streaming import cube_from_partitions, partitions_are_current
+
+    backend = sql_backend()
+    if backend is not None:
+        return backend.cube()
+    if not data.is_loaded("ventas") and partitions_are_current():
+        with timed("proceso.cubo_particiones"):
+            return cube_from_partitions(data["productos"], data["importaciones"])
+    return build_cube(data["modelo"].fact("ventas"))
+
+
+# Datasets of the data model: name -> (datasets it depends on, builder).
+# Builders receive the LazyData they belong to; the dependencies are
+# materialized before the builder runs. The model itself is lazy: its facts
+# and dimensions are pulled from the mapping on first use, so it depends on
+# nothing up front.
+DATASETS = {
+    "clientes": ((), lambda data: data.load_source("clientes")),
+    "productos": ((), lambda data: data.load_source("productos")),
+    "cartera": ((), lambda data: _parse_dates(data.load_source("cartera"), DATE_COLUMNS["cartera"])),
+    "inventario": ((), lambda data: _parse_dates(data.load_source("inventario"), DATE_COLUMNS["inventario"])),
+    "importaciones": ((), lambda data: _parse_dates(data.load_source("importaciones"), DATE_COLUMNS["importaciones"])),
+    "ventas": (("productos", "importaciones"),
+               lambda data: prepare_ventas(data.load_source("ventas"), data["productos"], data["importaciones"])),
+    "modelo": ((), lambda data: StarModel({}, {}, source=data.get)),
+    # The builder picks its inputs (SQL backend, sales fact or partitions)
+    "cubo": ((), _build_cube),
+}
+
+
+def dependencies(name):
+    """
+    All datasets `name` needs, transitively, in materialization order.
+    """
+    order = []
+    for dep in DATASETS[name][0]:
+        for item in dependencies(dep) + [dep]:
+            if item not in order:
+                order.append(item)
+    return order
+
+
+class LazyData(Mapping):
+    """
+    Read-only mapping over DATASETS that materializes each dataset (and its
+    dependencies) on first access, so a page only pays for the sources it
+    touches: the credit page reads cartera and clientes, never the sales
+    extract or the imports workbook. Materialized datasets are kept for the
+    lifetime of the mapping and shared by every session.
+    """
+
+    def __init__(self, use_cache=True, loading=None):
+        self.use_cache = use_cache
+        # Optional callable(name) -> context manager wrapped around each build
+        # (e.g. a spinner), so the caller sees what is being loaded
+        self._loading = loading
+        self._values = {}
+        self._lock = threading.RLock()
+        self.timings = {}  # dataset -> seconds spent building it
+        self.report = {}  # source key -> per-file load report (see _timed_load)
+
+    def load_source(self, key):
+        """
+        Reads one source for a builder, recording its load report.
+        """
+        df, self.report[key] = _timed_load(key, self.use_cache)
+        return df
+
+    def __getitem__(self, name):
+        try:
+            return self._values[name]
+        except KeyError:
+            if name not in DATASETS:
+                raise
+        with self._lock:
+            if name not in self._values:
+                deps, build = DATASETS[name]
+                for dep in deps:
+                    self[dep]
+                start = time.perf_counter()
+                with self._loading(name) if self._loading else nullcontext(), timed(f"dataset.{name}"):
+                    value = build(self)
+                self.timings[name] = time.perf_counter() - start
+                self._values[name] = value
+        return self._values[name]
+
+    def __iter__(self):
+        return iter(DATASETS)
+
+    def __len__(self):
+        return len(DATASETS)
+
+    def __contains__(self, name):
+        return name in DATASETS
+
+    def is_loaded(self, name):
+        return name in self._values
+
+    def loaded(self):
+        """
+        Names of the datasets materialized so far.
+        """
+        return list(self._values)
+
+    def derive(self, updates, drop=()):
+        """
+        Returns a new LazyData with the datasets materialized so far, replaced
+        by `updates` where given. Datasets not materialized yet, and those in
+        `drop`, are left to load from the (already updated) snapshots. This
+        mapping is untouched.
+        """
+        derived = LazyData(self.use_cache, self._loading)
+        derived._values = {name: value for name, value in {**self._values, **updates}.items() if name not in drop}
+        derived.timings = dict(self.timings)
+        derived.report = dict(self.report)
+        model = derived._values.get('modelo')
+        if model is not None:
+            # Unresolved facts/dimensions must come from the new mapping
+            derived._values['modelo'] = model.rebind(derived.get)
+        return derived
@@ -0,0 +1,117 @@
+"""
+Downsampling of long time series before they are sent to the browser.
+
+A line chart cannot show more points than it has pixels, so a series is
+reduced to a target count derived from the chart width before it is plotted.
+Two methods are available:
+
+- 'lttb' (Largest-Triangle-Three-Buckets): keeps, from each bucket, the point
+  that forms the largest triangle with the previously kept point and the
+  average of the next bucket. Preserves the visual shape of the line.
+- 'minmax': keeps the minimum and maximum of each bucket, so every peak and
+  trough is drawn (e.g. TRM spikes) at twice the points per bucket.
+
+The first and last points are always kept, and series already below the
+target are returned untouched.
+"""
+import numpy as np
+import pandas as pd
+
+# Points per horizontal pixel: one point per pixel is as much as a line can show
+POINTS_PER_PIXEL = 1.0
+# Width of a half-width chart in the wide layout, used when nothing better is known
+DEFAULT_CHART_WIDTH_PX = 700
+MIN_POINTS = 50
+
+
+def points_for_width(width_px=DEFAULT_CHART_WIDTH_PX, points_per_pixel=POINTS_PER_PIXEL):
+    """
+    Target number of points for a chart `width_px` pixels wide.
+    """
+    return max(MIN_POINTS, int(width_px * points_per_pixel))
+
+
+def _numeric(values):
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.to_numpy(dtype='datetime64[ns]').astype('int64').astype('float64')
+    return values.to_numpy(dtype='float64', na_value=np.nan)
+
+
+def lttb_indices(x, y, points):
+    """
+    Positions of the points LTTB keeps out of (x, y), x sorted ascending.
+    """
+    length = len(x)
+    if points >= length or points < 3:
+        return np.arange(length)
+    every = (length - 2) / (points - 2)
+    kept = np.empty(points, dtype='int64')
+    kept[0], kept[-1] = 0, length - 1
+    a = 0
+    for i in range(points - 2):
+        # Average of the next bucket (the last point for the last bucket)
+        next_start = int(np.floor((i + 1) * every)) + 1
+        next_end = min(int(np.floor((i + 2) * every)) + 1, length)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        start = int(np.floor(i * every)) + 1
+        end = int(np.floor((i + 1) * every)) + 1
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        kept[i + 1] = a
+    return kept
+
+
+def minmax_indices(x, y, points):
+    """
+    Positions of the minimum and maximum of each of points // 2 buckets of
+    equal size, plus the first and last points, in order.
+    """
+    length = len(x)
+    if points >= length or points < 4:
+        return np.arange(length)
+    buckets = (points - 2) // 2
+    bucket = (np.arange(length) * buckets) // length
+    # Sorted by bucket then value: each bucket's first row is its min, its last its max
+    order = np.lexsort((y, bucket))
+    starts = np.flatnonzero(np.r_[True, np.diff(bucket[order]) != 0])
+    ends = np.r_[starts[1:], length] - 1
+    kept = np.concatenate([[0, length - 1], order[starts], order[ends]])
+    return np.unique(kept)
+
+
+METHODS = {
+    'lttb': lttb_indices,
+    'minmax': minmax_indices,
+}
+
+
+def downsample(frame, x, y, points, start=None, end=None, by=None, method='lttb'):
+    """
+    Rows of `frame` that draw the (x, y) line with at most `points` points,
+    within [start, end] of x when given (the zoom range). With `by`, every
+    series (e.g. the color of a multi-line chart) gets `points` of its own.
+    Rows with a missing x or y are dropped; the result is sorted by x.
+    """
+    mask = (frame[x].notna() & frame[y].notna()).to_numpy()
+    if start is not None:
+        mask = mask & (frame[x] >= start).to_numpy()
+    if end is not None:
+        mask = mask & (frame[x] <= end).to_numpy()
+    frame = frame[mask]
+    select = METHODS[method]
+
+    if by is None:
+        groups = [frame]
+    else:
+        groups = [group for _, group in frame.groupby(by, observed=True, sort=False)]
+    parts = []
+    for group in groups:
+        group = group.sort_values(x, kind='stable')
+        kept = select(_numeric(group[x]), _numeric(group[y]), points)
+        parts.append(group.iloc[kept])
+    if not parts:
+        return frame.iloc[0:0]
+    return pd.concat(parts) if len(parts) > 1 else parts[0]
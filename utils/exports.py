@@ -0,0 +1,320 @@
+"""
+Precomputed snapshots of the dashboard aggregates.
+
+A batch job (export_snapshots.py at the repo root) runs the canned page
+computations in EXPORTS for every year and for all years together, and
+writes each result as a compact Parquet table (frames) or JSON (KPI dicts),
+plus the Plotly figures the page draws from it as figure JSON:
+
+    <dir>/manifest.json                                   data stamp, filter options and index of the files
+    <dir>/<generacion>/<export>/<periodo>.parquet|.json   result
+    <dir>/<generacion>/<export>/<periodo>.<figura>.json   figure (plotly.io.read_json)
+
+<periodo> is the year or 'todos'. Each run writes a new <generacion>
+directory and then replaces the manifest, so readers see either the old
+exports or the new ones, never a half-written or deleted set. External
+consumers read the files listed in the manifest directly. The pages go
+through precomputed(), which serves the results and figures under
+EXPORT_DIR while their data stamp matches the current sources and computes
+them live otherwise (or when cross-filters are active); the sales pages
+also take their filter options from the manifest (export_filters), so an
+unfiltered view never builds the cube.
+"""
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import datetime
+
+import pandas as pd
+import plotly.express as px
+import plotly.io as pio
+
+from utils.analytics import OVERDUE_LABELS
+from utils.cube import years as cube_years
+from utils.data_loader import CACHE_DIR, DATA_DIR, FILES, LazyData, _dump_json, _write_atomic
+from utils.ingest import ingest_version
+from utils.views import (MONTH_NAMES, filter_index, aging_distribution, category_pareto, figure, margin_by_channel, margin_matrix,
+                         monthly_comparison, monthly_trend, portfolio_kpis, sales_kpis, top_overdue_clients)
+
+EXPORT_DIR = os.environ.get("ANDINA_EXPORT_DIR", os.path.join(CACHE_DIR, "exportes"))
+MANIFEST_NAME = "manifest.json"
+# Prefix of the per-run directories under the export directory
+GENERATION_PREFIX = "generacion-"
+# Bumped when the layout or the content of the exports changes
+EXPORT_FORMAT = 2
+
+ALL_PERIODS = "todos"
+
+_read_cache = {}
+_read_lock = threading.Lock()
+
+
+def _trend_figure(measure, title, comparison_title):
+    def build(monthly, year):
+        if year is None:
+            return figure(px.line, monthly, x='mes_nombre', y=measure, color='año', title=comparison_title,
+                          markers=True, category_orders={'mes_nombre': MONTH_NAMES})
+        return figure(px.line, monthly, x='fecha', y=measure, title=title, markers=True)
+    return build
+
+
+# Export name -> (datasets read, periods, compute(sources, period), {figure: build(result, period)}).
+# Periods: 'anios' every year plus None (all years), 'anio' every year, None only None.
+EXPORTS = {
+    "kpis_ventas": (("cubo",), "anios", lambda s, year: sales_kpis(s["cubo"], year), {}),
+    "tendencia_mensual": (
+        ("cubo",), "anios",
+        lambda s, year: monthly_comparison(s["cubo"]) if year is None else monthly_trend(s["cubo"], year),
+        {
+            "ventas": _trend_figure('subtotal_cop', 'Ventas Mensuales', 'Comparativo de Ventas Mensuales por Año'),
+            "margen": _trend_figure('margen_total_cop', 'Margen Bruto Mensual',
+                                    'Comparativo de Margen Bruto Mensual por Año'),
+        },
+    ),
+    "margen_categoria_region": (("cubo",), "anio", lambda s, year: margin_matrix(s["cubo"], year), {}),
+    "margen_canal": (
+        ("cubo",), "anio", lambda s, year: margin_by_channel(s["cubo"], year),
+        {"canal": lambda df, _: figure(px.bar, df, x='canal_simplificado', y='margen_total_cop',
+                                       title="Margen por Canal (Contado vs Crédito)")},
+    ),
+    "pareto_categorias": (
+        ("cubo",), "anio", lambda s, year: category_pareto(s["cubo"], year),
+        {"pareto": lambda df, _: figure(px.bar, df, x='categoria', y='margen_total_cop', color='top_80',
+                                        title="Pareto de Margen por Categoría (80/20)")},
+    ),
+    "kpis_cartera": (("cartera",), None, lambda s, _: portfolio_kpis(s["cartera"]), {}),
+    "antiguedad_cartera": (
+        ("cartera",), None, lambda s, _: aging_distribution(s["cartera"]),
+        {"antiguedad": lambda df, _: figure(px.bar, df, x='rango_mora', y='saldo_cop',
+                                            category_orders={'rango_mora': OVERDUE_LABELS},
+                                            title="Distribución de Cartera Vencida por Edades", color='rango_mora')},
+    ),
+    "top_mora": (
+        ("cartera", "modelo"), None, lambda s, _: top_overdue_clients(s["cartera"], s["modelo"]),
+        {"top_mora": lambda df, _: figure(px.bar, df, x='saldo_cop', y='nombre_cliente', orientation='h',
+                                          title="Top 5 Clientes con Mayor Mora")},
+    ),
+}
+
+
+def period_label(period):
+    return ALL_PERIODS if period is None else str(period)
+
+
+def data_stamp():
+    """
+    Version of the inputs of the exports: (file, mtime_ns, size) of every
+    source extract plus the ingest log version.
+    """
+    stamp = []
+    for filename in FILES.values():
+        try:
+            stat = os.stat(os.path.join(DATA_DIR, filename))
+            stamp.append([filename, stat.st_mtime_ns, stat.st_size])
+        except OSError:
+            stamp.append([filename, None, None])
+    return {'fuentes': stamp, 'ingesta': ingest_version(), 'formato': EXPORT_FORMAT}
+
+
+def _periods(kind, data):
+    if kind is None:
+        return [None]
+    cube = data["cubo"]
+    years = cube_years(cube) if cube is not None else []
+    return years + [None] if kind == "anios" else years
+
+
+def _compute(name, sources, period):
+    _, _, compute, figures = EXPORTS[name]
+    result = compute(sources, period)
+    return result, {fig: build(result, period) for fig, build in figures.items()}
+
+
+def _write_result(result, path):
+    if isinstance(result, pd.DataFrame):
+        frame = result
+        if isinstance(frame.columns, pd.CategoricalIndex):
+            # Parquet cannot store a categorical column index (pivots)
+            frame = frame.copy()
+            frame.columns = pd.Index(frame.columns.astype(str), name=frame.columns.name)
+        frame.to_parquet(path)
+    else:
+        _dump_json({key: value.item() if hasattr(value, 'item') else value for key, value in result.items()}, path)
+
+
+def _remove_old_generations(output_dir, current):
+    """
+    Deletes the export directories no longer listed in the manifest: older
+    generations, those of interrupted runs and the per-export directories of
+    the previous layout.
+    """
+    for entry in os.listdir(output_dir):
+        path = os.path.join(output_dir, entry)
+        if entry != current and os.path.isdir(path) and (entry.startswith(GENERATION_PREFIX) or entry in EXPORTS):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def run_export_job(output_dir=None, force=False):
+    """
+    Recomputes every export if the data changed since the last run (or
+    force) and writes it under output_dir (default EXPORT_DIR). Returns the
+    manifest written, or None when the snapshots were already up to date.
+    The current exports stay in place, and listed in the manifest, until
+    the new ones are complete.
+    """
+    output_dir = output_dir or EXPORT_DIR
+    stamp = data_stamp()
+    manifest = read_manifest(output_dir)
+    if not force and manifest is not None and manifest.get('datos') == stamp:
+        return None
+
+    data = LazyData()
+    index = {}
+    os.makedirs(output_dir, exist_ok=True)
+    generation_dir = tempfile.mkdtemp(dir=output_dir, prefix=GENERATION_PREFIX)
+    generation = os.path.basename(generation_dir)
+    try:
+        for name, (deps, kind, _, _) in EXPORTS.items():
+            if any(data.get(dep) is None for dep in deps):
+                continue
+            os.makedirs(os.path.join(generation_dir, name))
+            index[name] = {}
+            for period in _periods(kind, data):
+                result, figures = _compute(name, data, period)
+                label = period_label(period)
+                extension = 'parquet' if isinstance(result, pd.DataFrame) else 'json'
+                entry = {'resultado': f"{generation}/{name}/{label}.{extension}", 'figuras': {}}
+                _write_result(result, os.path.join(output_dir, entry['resultado']))
+                for fig_name, fig in figures.items():
+                    entry['figuras'][fig_name] = f"{generation}/{name}/{label}.{fig_name}.json"
+                    pio.write_json(fig, os.path.join(output_dir, entry['figuras'][fig_name]), validate=False)
+                index[name][label] = entry
+
+        cube = data.get("cubo")
+        has_sales = cube is not None and not cube.empty
+        manifest = {
+            'calculado': datetime.now().isoformat(timespec='seconds'),
+            'datos': stamp,
+            # Filter options of the sales pages (utils.filter_state.sidebar_selection)
+            'anios': cube_years(cube) if has_sales else [],
+            'filtros': filter_index(cube).values if has_sales else {},
+            'exportaciones': index,
+        }
+        # The swap: readers follow the new generation from here on
+        _write_atomic(os.path.join(output_dir, MANIFEST_NAME), lambda p: _dump_json(manifest, p))
+    except BaseException:
+        shutil.rmtree(generation_dir, ignore_errors=True)
+        raise
+    _remove_old_generations(output_dir, generation)
+    return manifest
+
+
+def _read_versioned(path, read):
+    """
+    read(path), once per file version, shared by every session; None if the
+    file is missing or unreadable.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _read_lock:
+        cached = _read_cache.get(path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+    try:
+        value = read(path)
+    except Exception as e:
+        print(f"Could not read {path}: {e}")
+        return None
+    with _read_lock:
+        _read_cache[path] = (version, value)
+    return value
+
+
+def _read_json(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def read_manifest(output_dir=None):
+    return _read_versioned(os.path.join(output_dir or EXPORT_DIR, MANIFEST_NAME), _read_json)
+
+
+def exports_are_current(manifest):
+    return manifest is not None and manifest.get('datos') == data_stamp()
+
+
+def export_filters():
+    """
+    (years, dimension -> values) for the sales page filters from the current
+    manifest, or None when the exports are stale, so an unfiltered page
+    view never builds the cube.
+    """
+    manifest = read_manifest()
+    if not exports_are_current(manifest) or 'anios' not in manifest:
+        return None
+    return manifest['anios'], manifest['filtros']
+
+
+def _entry(name, period, output_dir):
+    manifest = read_manifest(output_dir)
+    return (manifest or {}).get('exportaciones', {}).get(name, {}).get(period_label(period))
+
+
+def read_export(name, period=None, output_dir=None):
+    """
+    Result of an export for a period (None = all years) as last written by
+    the job, or None if it was not exported. Read once per file version and
+    shared by every session: treat it as read-only.
+    """
+    output_dir = output_dir or EXPORT_DIR
+    entry = _entry(name, period, output_dir)
+    if entry is None:
+        return None
+    path = os.path.join(output_dir, entry['resultado'])
+    return _read_versioned(path, pd.read_parquet if path.endswith('.parquet') else _read_json)
+
+
+def _read_figure_json(path):
+    fig = pio.read_json(path)
+    # Drawn with the reading process's theme (Streamlit's inside the server),
+    # like a figure built live, not the one baked in by the job
+    fig.layout.template = pio.templates.default
+    return fig
+
+
+def read_figure(name, figure_name, period=None, output_dir=None):
+    """
+    Exported Plotly figure of an export for a period, or None. Read once per
+    file version and shared by every session: treat it as read-only.
+    """
+    output_dir = output_dir or EXPORT_DIR
+    entry = _entry(name, period, output_dir)
+    if entry is None or figure_name not in entry['figuras']:
+        return None
+    return _read_versioned(os.path.join(output_dir, entry['figuras'][figure_name]), _read_figure_json)
+
+
+def precomputed(name, period, sources, live=False):
+    """
+    (result, {figure: figure}) of an export for a period: the result and
+    figures come from the snapshot when it is current and are computed from
+    `sources` (mapping dataset -> frame, as in EXPORTS) otherwise. Pass the
+    LazyData itself for the published datasets, so they are only built when
+    an export is missing, and live=True when the sources are not the
+    published datasets (e.g. a cross-filtered cube): snapshots only hold the
+    unfiltered views.
+    """
+    if not live and exports_are_current(read_manifest()):
+        result = read_export(name, period)
+        if result is not None:
+            figures = EXPORTS[name][3]
+            exported = {fig: read_figure(name, fig, period) for fig in figures}
+            # A figure that cannot be read is rebuilt from the result
+            return result, {fig: exported[fig] if exported[fig] is not None else build(result, period)
+                            for fig, build in figures.items()}
+    return _compute(name, sources, period)
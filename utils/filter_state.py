@@ -0,0 +1,86 @@
+"""
+Sidebar filters shared by the sales pages: the year and the cross-filters
+(utils.filters). The selection is kept in the session state under keys of
+its own, not the widgets', so it follows the user from page to page:
+Streamlit drops the state of widgets the current page does not draw.
+"""
+import streamlit as st
+
+from utils.cube import years as cube_years
+from utils.filters import FILTER_DIMENSIONS
+from utils.views import filter_index, filtered_cube
+
+ALL_YEARS = "Todos"
+YEAR_KEY = "filtro_anio"
+
+
+def _state_key(dim):
+    return f"filtro_{dim}"
+
+
+def _widget_key(key):
+    return f"_widget_{key}"
+
+
+def _clear_filters():
+    for dim in FILTER_DIMENSIONS:
+        st.session_state[_state_key(dim)] = []
+        # Redrawn from the (now empty) stored selection
+        st.session_state.pop(_widget_key(_state_key(dim)), None)
+
+
+def filter_options(cube):
+    """
+    (years, dimension -> values) offered by the filters of a cube.
+    """
+    return cube_years(cube), filter_index(cube).values
+
+
+def sidebar_selection(years, values, all_years=False):
+    """
+    Draws the year and cross-filter widgets in the sidebar from the given
+    options (see filter_options) and returns (year, selection). With
+    all_years the year can be ALL_YEARS, returned as None.
+    """
+    st.sidebar.header("Filtros")
+    options = ([ALL_YEARS] if all_years else []) + years
+    stored = st.session_state.get(YEAR_KEY)
+    selected_year = st.sidebar.selectbox("Seleccionar Año", options,
+                                         index=options.index(stored) if stored in options else 0,
+                                         key=_widget_key(YEAR_KEY))
+    st.session_state[YEAR_KEY] = selected_year
+
+    selection = {}
+    for dim, label in FILTER_DIMENSIONS.items():
+        if dim not in values:
+            continue
+        key = _state_key(dim)
+        default = [value for value in st.session_state.get(key, []) if value in values[dim]]
+        selection[dim] = st.sidebar.multiselect(label, values[dim], default=default, key=_widget_key(key))
+        st.session_state[key] = selection[dim]
+    if any(selection.values()):
+        st.sidebar.button("Limpiar filtros", on_click=_clear_filters)
+
+    year = None if selected_year == ALL_YEARS else selected_year
+    return year, selection
+
+
+def apply_selection(cube, selection):
+    """
+    The cube rows matching a selection (the cube itself when nothing is
+    filtered), with a notice when none do.
+    """
+    filtered = filtered_cube(cube, selection)
+    if filtered.empty:
+        st.info("Ninguna venta coincide con los filtros seleccionados.")
+    return filtered
+
+
+def sidebar_filters(cube, all_years=False):
+    """
+    Draws the year and cross-filter widgets for a cube and returns (year,
+    filtered cube). The filtered cube is the cube itself when nothing is
+    filtered.
+    """
+    year, selection = sidebar_selection(*filter_options(cube), all_years=all_years)
+    return year, apply_selection(cube, selection)
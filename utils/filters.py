@@ -0,0 +1,91 @@
+"""
+Cross-filters of the sales pages: region, categoria, segmento, ejecutivo and
+tipo_venta, applied to the monthly cube.
+
+A FilterIndex is built once per cube version with one boolean array over the
+cube rows per value of every filter dimension. The mask of a dimension is the
+OR of its selected values and is kept per (dimension, values), so a compound
+selection is a few bitwise ANDs of cached arrays, and changing one filter
+only recomputes that dimension's mask. Selections are plain dicts
+{dimension: [values]}; a dimension left out or empty is not filtered.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Filter dimensions (cube keys) -> sidebar label
+FILTER_DIMENSIONS = {
+    'region': 'Región',
+    'categoria': 'Categoría',
+    'segmento': 'Segmento',
+    'ejecutivo': 'Ejecutivo',
+    'tipo_venta': 'Tipo de Venta',
+}
+
+# Dimension masks kept per index before the oldest are dropped
+MAX_CACHED_MASKS = 64
+
+
+def normalize_selection(selection):
+    """
+    Canonical form of a selection: only filtered dimensions, in
+    FILTER_DIMENSIONS order, values sorted. Equal selections compare equal.
+    """
+    selection = selection or {}
+    return {dim: sorted(str(v) for v in selection[dim]) for dim in FILTER_DIMENSIONS if selection.get(dim)}
+
+
+class FilterIndex:
+    """
+    Boolean index arrays of the filter dimensions over the rows of a cube.
+    """
+
+    def __init__(self, cube):
+        self.size = len(cube)
+        self.values = {}
+        self._bitmaps = {}
+        for dim in FILTER_DIMENSIONS:
+            if dim not in cube.columns:
+                continue
+            column = cube[dim]
+            if not isinstance(column.dtype, pd.CategoricalDtype):
+                column = column.astype('category')
+            codes = column.cat.codes.to_numpy()
+            used = np.bincount(codes[codes >= 0], minlength=len(column.cat.categories)) > 0
+            categories = column.cat.categories.astype(str)[used]
+            # Row k of the (values, rows) array: the cube rows with the k-th value
+            self.values[dim] = list(categories)
+            self._bitmaps[dim] = codes[None, :] == np.flatnonzero(used)[:, None]
+        self._masks = {}
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        return sum(bitmap.nbytes for bitmap in self._bitmaps.values()) + len(self._masks) * self.size
+
+    def dimension_mask(self, dim, values):
+        """
+        Rows with any of the given values of one dimension.
+        """
+        key = (dim, tuple(values))
+        mask = self._masks.get(key)
+        if mask is None:
+            positions = [self.values[dim].index(v) for v in values if v in self.values[dim]]
+            mask = self._bitmaps[dim][positions].any(axis=0)
+            with self._lock:
+                if len(self._masks) >= MAX_CACHED_MASKS:
+                    self._masks.pop(next(iter(self._masks)))
+                self._masks[key] = mask
+        return mask
+
+    def mask(self, selection):
+        """
+        Rows matching every filtered dimension of the selection, or None
+        when nothing is filtered.
+        """
+        selection = normalize_selection(selection)
+        masks = [self.dimension_mask(dim, values) for dim, values in selection.items() if dim in self.values]
+        if not masks:
+            return None
+        return np.logical_and.reduce(masks) if len(masks) > 1 else masks[0]
@@ -0,0 +1,251 @@
+import datetime
+import glob
+import json
+import os
+import shutil
+
+import pandas as pd
+
+from utils.cube import refresh_periods
+from utils.data_loader import (CACHE_DIR, DATA_DIR, LazyData, _read_fingerprint, _snapshot_paths, _write_atomic,
+                               clean_ventas, load_source, read_typed_source, store_snapshot)
+from utils.landed_cost import add_landed_cost
+from utils.model import SORTED_FACTS, sort_by_date
+from utils.schemas import concat_typed
+from utils.streaming import merge_into_partitions, partitions_are_current, stamp_partitions
+
+# The ERP drops daily delta files here, named '<source>_<anything>.csv'
+# (e.g. ventas_2024-06-01.csv). Processed files are moved to procesados/.
+INBOX_DIR = os.environ.get("ANDINA_INBOX_DIR", os.path.join(DATA_DIR, "inbox"))
+PROCESSED_DIR = os.path.join(INBOX_DIR, "procesados")
+
+# Each applied batch keeps its delta rows here so running dashboards can
+# apply them in memory instead of reloading everything.
+DELTA_DIR = os.path.join(CACHE_DIR, "deltas")
+LOG_PATH = os.path.join(CACHE_DIR, "ingest_log.json")
+
+# Natural keys used to dedupe: a delta row replaces the stored row with the same key
+DEDUP_KEYS = {
+    "ventas": ["venta_id"],
+    "cartera": ["documento_id"],
+    "inventario": ["fecha_corte", "centro_logistico", "producto_id"],
+}
+
+DELTA_EXTENSIONS = ('.csv', '.xlsx')
+
+
+def read_log():
+    try:
+        with open(LOG_PATH, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"version": 0, "batches": []}
+
+
+def ingest_version():
+    """
+    Number of delta batches applied so far (0 when nothing was ingested).
+    """
+    return read_log()["version"]
+
+
+def _write_log(log):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+    def write(path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(log, f, indent=1)
+    _write_atomic(LOG_PATH, write)
+
+
+def pending_deltas(inbox_dir=None):
+    """
+    Returns {source key: [delta file paths sorted by name]} for the files
+    waiting in the inbox.
+    """
+    inbox_dir = inbox_dir or INBOX_DIR
+    pending = {}
+    for key in DEDUP_KEYS:
+        paths = [p for p in glob.glob(os.path.join(inbox_dir, f"{key}_*")) if p.endswith(DELTA_EXTENSIONS)]
+        if paths:
+            pending[key] = sorted(paths)
+    return pending
+
+
+def _key_mask(key, base, delta):
+    """
+    Boolean mask of the base rows whose natural key appears in delta.
+    """
+    cols = DEDUP_KEYS[key]
+    if len(cols) == 1:
+        return base[cols[0]].isin(delta[cols[0]]).to_numpy()
+    base_keys = pd.MultiIndex.from_frame(base[cols].astype(object))
+    delta_keys = pd.MultiIndex.from_frame(delta[cols].astype(object))
+    return base_keys.isin(delta_keys)
+
+
+def merge_delta(key, base, delta):
+    """
+    Appends delta to base, replacing base rows with the same natural key.
+    Returns (merged, replaced_rows).
+    """
+    delta = delta.drop_duplicates(subset=DEDUP_KEYS[key], keep='last')
+    if base is None or base.empty:
+        return delta.reset_index(drop=True), delta.iloc[0:0]
+    replaced = _key_mask(key, base, delta)
+    merged = concat_typed([base[~replaced], delta]).reset_index(drop=True)
+    return merged, base[replaced]
+
+
+def ingest(inbox_dir=None):
+    """
+    Applies every pending delta file: merges it into the source's Parquet
+    snapshot (deduped on DEDUP_KEYS) and, for ventas, into its current
+    year/month partitions, stores the batch's delta rows for running
+    dashboards and moves the files to procesados/. Only the delta
+    files are parsed; history is read back from the columnar snapshot.
+    Returns {source key: summary dict}, empty when the inbox is empty.
+    """
+    inbox_dir = inbox_dir or INBOX_DIR
+    pending = pending_deltas(inbox_dir)
+    if not pending:
+        return {}
+
+    log = read_log()
+    version = log["version"] + 1
+    batch = {"version": version, "fecha": datetime.datetime.now().isoformat(timespec='seconds'),
+             "archivos": [], "deltas": {}, "bases": {}}
+    summary = {}
+    os.makedirs(DELTA_DIR, exist_ok=True)
+
+    for key, paths in pending.items():
+        delta = concat_typed([read_typed_source(key, path) for path in paths])
+        delta = delta.drop_duplicates(subset=DEDUP_KEYS[key], keep='last')
+
+        # Checked before the snapshot changes: current partitions get the same delta
+        partitioned = key == 'ventas' and partitions_are_current()
+        base, _ = load_source(key)
+        merged, replaced = merge_delta(key, base, delta)
+        names = [os.path.basename(path) for path in paths]
+        store_snapshot(key, merged, names)
+        if partitioned:
+            merge_into_partitions(delta)
+            stamp_partitions()
+
+        delta_name = f"{version:06d}_{key}.parquet"
+        delta.to_parquet(os.path.join(DELTA_DIR, delta_name), index=False)
+        batch["deltas"][key] = delta_name
+        # Extract the delta was applied on top of: rebuilding its snapshot replays it
+        batch["bases"][key] = (_read_fingerprint(_snapshot_paths(key)[1]) or {}).get('sha')
+        batch["archivos"] += names
+        summary[key] = {"archivos": len(paths), "filas_delta": len(delta),
+                        "reemplazadas": len(replaced), "filas_total": len(merged)}
+
+    os.makedirs(os.path.join(inbox_dir, "procesados"), exist_ok=True)
+    for paths in pending.values():
+        for path in paths:
+            shutil.move(path, os.path.join(inbox_dir, "procesados", os.path.basename(path)))
+
+    # Bumping the version is the commit point: dashboards pick the batch up after this
+    log["version"] = version
+    log["batches"].append(batch)
+    _write_log(log)
+    return summary
+
+
+def read_batches(after_version, up_to_version):
+    """
+    Reads the delta rows of the batches in (after_version, up_to_version] and
+    returns them combined as {source key: DataFrame}. Raises FileNotFoundError
+    if a batch is missing, in which case callers should reload from scratch.
+    """
+    deltas = {}
+    for batch in read_log()["batches"]:
+        if after_version < batch["version"] <= up_to_version:
+            for key, name in batch["deltas"].items():
+                deltas.setdefault(key, []).append(pd.read_parquet(os.path.join(DELTA_DIR, name)))
+    return {key: concat_typed(frames).drop_duplicates(subset=DEDUP_KEYS[key], keep='last')
+            for key, frames in deltas.items()}
+
+
+def replayable_batches(key, sha):
+    """
+    Yields (delta rows, delta file names), in log order, of the ingested
+    batches of a source that were applied on top of the extract with content
+    hash sha. A snapshot rebuilt from that extract (warm_cache --force, a
+    schema change, an unreadable snapshot) replays them; a new extract
+    supersedes the batches ingested before it.
+    """
+    for batch in read_log()["batches"]:
+        name = batch["deltas"].get(key)
+        if name is None or batch.get("bases", {}).get(key) != sha:
+            continue
+        try:
+            delta = pd.read_parquet(os.path.join(DELTA_DIR, name))
+        except OSError as e:
+            print(f"Delta batch {batch['version']} of {key} cannot be replayed, its rows are missing "
+                  f"from the snapshot until the next full extract: {e}")
+            continue
+        yield delta, [name for name in batch["archivos"] if name.startswith(f"{key}_")]
+
+
+def replay_deltas(key, base, sha):
+    """
+    Re-applies to a freshly parsed extract the batches ingested on top of it
+    (replayable_batches). Returns (frame, names of the delta files it holds).
+    """
+    applied = []
+    for delta, names in replayable_batches(key, sha):
+        base, _ = merge_delta(key, base, delta)
+        applied += names
+    return base, applied
+
+
+def _periods(fechas):
+    fechas = fechas.dropna()
+    return set(zip(fechas.dt.year.tolist(), fechas.dt.month.tolist()))
+
+
+def apply_deltas(data, deltas):
+    """
+    Returns a new data model with the delta rows applied, leaving `data`
+    untouched. Only delta rows are cleaned, and only the cube periods
+    touched by new or replaced sales are re-aggregated. Datasets a
+    LazyData has not materialized yet are skipped: their snapshot already
+    holds the deltas, so they load up to date on first use.
+    """
+    lazy = isinstance(data, LazyData)
+    updates = {}
+    drop = []
+    model = data.get('modelo') if not lazy or data.is_loaded('modelo') else None
+    for key, delta in deltas.items():
+        if delta.empty:
+            continue
+        if lazy and not data.is_loaded(key):
+            if key == 'ventas' and data.is_loaded('cubo'):
+                # Cube built without the sales fact (SQL backend or partitions): rebuild it,
+                # from the updated snapshot
+                drop.append('cubo')
+            continue
+        delta = delta.copy()
+        if key == 'ventas':
+            delta = add_landed_cost(clean_ventas(delta), data.get('productos'), data.get('importaciones'))
+
+        merged, replaced = merge_delta(key, data.get(key), delta)
+        if key in SORTED_FACTS:
+            merged = sort_by_date(merged, SORTED_FACTS[key])
+        updates[key] = merged
+        if model is not None:
+            model = model.with_fact(key, merged)
+
+        cube = updates.get('cubo', data.get('cubo') if not lazy or data.is_loaded('cubo') else None)
+        if key == 'ventas' and cube is not None:
+            touched = _periods(delta['fecha']) | _periods(replaced['fecha'])
+            index = model.date_index(key) if model is not None else None
+            updates['cubo'] = refresh_periods(cube, merged, sorted(touched), index)
+
+    if model is not None:
+        updates['modelo'] = model
+    if lazy:
+        return data.derive(updates, drop)
+    return {**data, **updates}
@@ -0,0 +1,198 @@
+"""
+Timers and memory deltas around the load and compute stages, shared by every
+session of the server process.
+
+Stages are named '<group>.<name>' (e.g. 'carga.ventas', 'dataset.cubo',
+'vista.monthly_trend') and wrapped with ``timed(stage)``. Each
+run records its wall time and the change in the process' resident memory
+(RSS); the registry keeps per-stage aggregates that the Instrumentación page
+shows and exports as JSON or in the Prometheus text format. With
+ANDINA_METRICS_LOG set, every run is also appended to that file as a JSON
+line, so a regression can be traced back to the stage and the data size it
+appeared with.
+
+RSS is process-wide: with concurrent sessions, memory deltas of overlapping
+stages include each other's allocations. Treat them as an indication.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+METRICS_LOG = os.environ.get("ANDINA_METRICS_LOG")
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def rss_bytes():
+    """
+    Resident memory of the process, or None where /proc is not available.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class Metrics:
+    """
+    Per-stage aggregates: runs, errors, total/last/max seconds, last memory
+    delta and the free-form details of the last run (rows, status, ...).
+    """
+
+    def __init__(self, log_path=METRICS_LOG):
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        self._stages = {}
+        self.started = datetime.now().isoformat(timespec='seconds')
+
+    def record(self, stage, seconds, memory_delta=None, error=None, **details):
+        memory_mb = None if memory_delta is None else memory_delta / 1024 ** 2
+        with self._lock:
+            entry = self._stages.get(stage)
+            if entry is None:
+                entry = self._stages[stage] = {
+                    'ejecuciones': 0, 'errores': 0, 'segundos_total': 0.0,
+                    'segundos_max': 0.0, 'segundos_ultima': 0.0, 'memoria_delta_mb': None, 'detalle': {},
+                }
+            entry['ejecuciones'] += 1
+            entry['errores'] += error is not None
+            entry['segundos_total'] += seconds
+            entry['segundos_max'] = max(entry['segundos_max'], seconds)
+            entry['segundos_ultima'] = seconds
+            entry['memoria_delta_mb'] = memory_mb
+            entry['detalle'] = details
+        if self.log_path:
+            self._log({'etapa': stage, 'fecha': datetime.now().isoformat(timespec='milliseconds'),
+                       'segundos': seconds, 'memoria_delta_mb': memory_mb,
+                       'error': error, **details})
+
+    def _log(self, event):
+        try:
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(event, default=str) + "\n")
+        except OSError as e:
+            print(f"Could not write metrics log {self.log_path}: {e}")
+
+    @contextmanager
+    def timed(self, stage, **details):
+        """
+        Times the enclosed block as `stage`. Yields a dict the block can add
+        details to (rows, status, ...); they are recorded with the run. An
+        exception, or an 'error' set by a block that handled its own, counts
+        the run as failed.
+        """
+        rss = rss_bytes()
+        start = time.perf_counter()
+        error = None
+        try:
+            yield details
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            after = rss_bytes()
+            delta = after - rss if rss is not None and after is not None else None
+            error = details.pop('error', None) or error
+            self.record(stage, seconds, delta, error, **details)
+
+    def snapshot(self):
+        """
+        Copy of the aggregates: {stage: aggregate dict}.
+        """
+        with self._lock:
+            return {stage: {**entry, 'detalle': dict(entry['detalle'])} for stage, entry in self._stages.items()}
+
+    def frame(self):
+        """
+        One row per stage, slowest in total first, with times in ms.
+        """
+        rows = []
+        for stage, entry in self.snapshot().items():
+            runs = entry['ejecuciones']
+            rows.append({
+                'etapa': stage,
+                'grupo': stage.split('.', 1)[0],
+                'ejecuciones': runs,
+                'errores': entry['errores'],
+                'total_s': entry['segundos_total'],
+                'media_ms': entry['segundos_total'] / runs * 1000 if runs else 0.0,
+                'max_ms': entry['segundos_max'] * 1000,
+                'ultima_ms': entry['segundos_ultima'] * 1000,
+                'memoria_delta_mb': entry['memoria_delta_mb'],
+                'detalle': ", ".join(f"{k}={v}" for k, v in entry['detalle'].items() if v is not None),
+            })
+        columns = ['etapa', 'grupo', 'ejecuciones', 'errores', 'total_s', 'media_ms', 'max_ms', 'ultima_ms',
+                   'memoria_delta_mb', 'detalle']
+        return pd.DataFrame(rows, columns=columns).sort_values('total_s', ascending=False, ignore_index=True)
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self.started = datetime.now().isoformat(timespec='seconds')
+
+    def to_json(self, extra=None):
+        """
+        JSON document with every stage plus the process memory and any
+        extra sections (e.g. the result cache stats).
+        """
+        rss = rss_bytes()
+        document = {
+            'desde': self.started,
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'memoria_rss_mb': None if rss is None else rss / 1024 ** 2,
+            'etapas': self.snapshot(),
+        }
+        document.update(extra or {})
+        return json.dumps(document, indent=1, default=str, ensure_ascii=False)
+
+    def to_prometheus(self, extra_gauges=None):
+        """
+        Aggregates in the Prometheus text exposition format, one series per
+        stage (label etapa). extra_gauges: {metric name: value} appended as-is.
+        """
+        stages = self.snapshot()
+        families = [
+            ('andina_etapa_ejecuciones_total', 'counter', 'Runs of the stage', 'ejecuciones'),
+            ('andina_etapa_errores_total', 'counter', 'Runs of the stage that raised', 'errores'),
+            ('andina_etapa_segundos_total', 'counter', 'Wall time spent in the stage', 'segundos_total'),
+            ('andina_etapa_segundos_max', 'gauge', 'Slowest run of the stage', 'segundos_max'),
+            ('andina_etapa_segundos_ultima', 'gauge', 'Last run of the stage', 'segundos_ultima'),
+            ('andina_etapa_memoria_delta_bytes', 'gauge', 'RSS change during the last run', 'memoria_delta_mb'),
+        ]
+        lines = []
+        for name, kind, help_text, field in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for stage, entry in sorted(stages.items()):
+                value = entry[field]
+                if value is None:
+                    continue
+                if field == 'memoria_delta_mb':
+                    value *= 1024 ** 2
+                label = stage.replace('\\', '\\\\').replace('"', '\\"')
+                lines.append(f'{name}{{etapa="{label}"}} {value:g}')
+        rss = rss_bytes()
+        gauges = dict(extra_gauges or {})
+        if rss is not None:
+            gauges['andina_memoria_rss_bytes'] = rss
+        for name, value in gauges.items():
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+
+
+def timed(stage, **details):
+    """
+    Shortcut for METRICS.timed(stage).
+    """
+    return METRICS.timed(stage, **details)
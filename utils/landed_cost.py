@@ -0,0 +1,109 @@
+"""
+Landed cost of every sale at the TRM of the import that supplied it.
+
+Imports are indexed by (pais_origen, fecha_llegada), sorted. Each sale is
+matched as of its date to the last import from its product's country of
+origin (productos.origen) that had already arrived, or to the first one for
+sales before any arrival. That import gives the prevailing TRM and the
+landed COP per merchandise USD, freight, tariffs and other costs included:
+
+    cop_por_usd = ((costo_mercancia_usd + flete_usd) * trm + arancel_cop + otros_costos_cop)
+                  / costo_mercancia_usd
+
+and the real cost of the sale is cantidad * costo_usd_base * cop_por_usd.
+The columns are added to the sales fact once per data refresh (and to delta
+rows on ingestion), so the cube carries the real cost and margin as measures.
+"""
+import numpy as np
+import pandas as pd
+
+LANDED_COLUMNS = ['importacion_id', 'trm_importacion', 'cop_por_usd', 'costo_real_cop', 'margen_real_cop']
+
+# Composite sort key: origin code * _DAY_SPAN + days since epoch
+_DAY_SPAN = 1_000_000
+
+
+def _days(dates):
+    return dates.to_numpy(dtype='datetime64[D]').astype('int64')
+
+
+class ImportCostIndex:
+    """
+    Imports sorted by (country of origin, arrival date) for as-of lookups.
+    """
+
+    def __init__(self, importaciones):
+        imports = importaciones[(importaciones['fecha_llegada'].notna()
+                                 & (importaciones['costo_mercancia_usd'] > 0)).fillna(False).to_numpy()]
+        self.countries = pd.Index(imports['pais_origen'].astype(str).unique())
+        codes = self.countries.get_indexer(imports['pais_origen'].astype(str))
+        keys = codes.astype('int64') * _DAY_SPAN + _days(imports['fecha_llegada'])
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+
+        usd = imports['costo_mercancia_usd'].to_numpy(dtype='float64')
+        trm = imports['trm'].to_numpy(dtype='float64')
+        landed = ((usd + imports['flete_usd'].to_numpy(dtype='float64', na_value=0)) * trm
+                  + imports['arancel_cop'].to_numpy(dtype='float64', na_value=0)
+                  + imports['otros_costos_cop'].to_numpy(dtype='float64', na_value=0))
+        self.importacion_id = imports['importacion_id'].to_numpy()[order]
+        self.trm = trm[order]
+        self.cop_por_usd = (landed / usd)[order]
+
+    def lookup(self, countries, dates):
+        """
+        Position in the index of the import prevailing for each (country,
+        date), or -1 for countries never imported from and missing dates.
+        """
+        dates = pd.Series(dates)
+        codes = self.countries.get_indexer(pd.Series(countries).astype(str))
+        base = codes.astype('int64') * _DAY_SPAN
+        pos = np.searchsorted(self.keys, base + _days(dates), side='right') - 1
+        # Before the first arrival of its country: use that first arrival
+        first = np.searchsorted(self.keys, base, side='left')
+        pos = np.maximum(pos, first)
+        return np.where((codes >= 0) & dates.notna().to_numpy(), pos, -1)
+
+
+def landed_cost(ventas, productos, importaciones):
+    """
+    Landed-cost columns (LANDED_COLUMNS) for every sale, aligned with ventas.
+    Sales of products whose origin was never imported get missing values.
+    """
+    index = ImportCostIndex(importaciones)
+    productos = productos.drop_duplicates('producto_id')
+    prod_pos = pd.Index(productos['producto_id']).get_indexer(ventas['producto_id'])
+    origin = pd.api.extensions.take(productos['origen'].astype(str).to_numpy(dtype=object), prod_pos,
+                                    allow_fill=True, fill_value=None)
+    usd_base = pd.api.extensions.take(productos['costo_usd_base'].to_numpy(dtype='float64'), prod_pos,
+                                      allow_fill=True, fill_value=np.nan)
+
+    pos = index.lookup(origin, ventas['fecha'])
+    found = pos >= 0
+    safe = np.where(found, pos, 0)
+
+    def gather(values):
+        return np.where(found, values[safe], np.nan)
+
+    cop_por_usd = gather(index.cop_por_usd)
+    costo_real = ventas['cantidad'].to_numpy(dtype='float64', na_value=np.nan) * usd_base * cop_por_usd
+    return pd.DataFrame({
+        'importacion_id': pd.array(gather(index.importacion_id.astype('float64')), dtype='Int32'),
+        'trm_importacion': gather(index.trm),
+        'cop_por_usd': cop_por_usd,
+        'costo_real_cop': costo_real,
+        'margen_real_cop': ventas['subtotal_cop'].to_numpy(dtype='float64', na_value=np.nan) - costo_real,
+    }, index=ventas.index)
+
+
+def add_landed_cost(ventas, productos, importaciones):
+    """
+    Adds the landed-cost columns to a sales frame (in place) and returns it.
+    Leaves ventas untouched if products or imports are not available.
+    """
+    if productos is None or productos.empty or importaciones is None or importaciones.empty:
+        return ventas
+    costs = landed_cost(ventas, productos, importaciones)
+    for col in LANDED_COLUMNS:
+        ventas[col] = costs[col]
+    return ventas
@@ -0,0 +1,225 @@
+import copy
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Dimensions: name -> (source key, natural key column)
+DIMENSIONS = {
+    "cliente": ("clientes", "cliente_id"),
+    "producto": ("productos", "producto_id"),
+}
+
+# Facts, referencing the dimensions through their natural key columns
+FACTS = ("ventas", "cartera", "inventario")
+
+# Facts kept sorted by a date column, with a DateIndex over it: name -> column
+SORTED_FACTS = {
+    "ventas": "fecha",
+}
+
+
+def sort_by_date(df, column):
+    """
+    Returns df sorted by `column` (stable, missing dates last), or df itself
+    if it already is, so a sorted fact is never copied.
+    """
+    dates = df[column]
+    valid = int(dates.notna().sum())
+    head = dates.iloc[:valid]
+    if head.notna().all() and head.is_monotonic_increasing:
+        return df
+    return df.sort_values(column, kind='stable', na_position='last', ignore_index=True)
+
+
+class DateIndex:
+    """
+    Row offsets of every month of a fact sorted by date (sort_by_date). A
+    year or a month is then a contiguous block of rows: a slice, found in
+    O(1) and taken with iloc as a view, instead of a boolean mask over the
+    whole fact.
+    """
+
+    def __init__(self, dates):
+        values = dates.to_numpy()
+        self._dates = values[:int(dates.notna().sum())]
+        if len(self._dates):
+            first, last = self._dates[0].astype('datetime64[M]'), self._dates[-1].astype('datetime64[M]')
+            self.first_month = int(first.astype('int64'))
+            month_starts = np.arange(first, last + 2).astype(self._dates.dtype)
+            # _bounds[i]: first row of month first_month + i (and the end of the last month)
+            self._bounds = np.searchsorted(self._dates, month_starts, side='left')
+        else:
+            self.first_month = 0
+            self._bounds = np.zeros(1, dtype='int64')
+
+    def _month_offset(self, ordinal):
+        return self._bounds[min(max(ordinal - self.first_month, 0), len(self._bounds) - 1)]
+
+    def period(self, year=None, month=None):
+        """
+        Slice of the rows of a year, or of one month of a year. No year means
+        every row (undated ones included).
+        """
+        if year is None:
+            if month is not None:
+                raise ValueError("month needs a year")
+            return slice(None)
+        # Month ordinals as numpy's datetime64[M]: months since 1970-01
+        start = (int(year) - 1970) * 12 + (0 if month is None else int(month) - 1)
+        end = start + (12 if month is None else 1)
+        return slice(int(self._month_offset(start)), int(self._month_offset(end)))
+
+    @property
+    def nbytes(self):
+        return self._bounds.nbytes
+
+
+class StarModel:
+    """
+    Fact tables and the client and product dimensions they reference by
+    natural ID. Dimension attributes are never copied into the facts: the
+    views aggregate first and gather the attributes of the few IDs left
+    (lookup_ids), so a fact only costs its own columns and loading one does
+    not load the dimensions.
+
+    Facts in SORTED_FACTS are kept sorted by date with a DateIndex, which
+    utils.cube.refresh_periods uses to recompute only the months an ingest
+    touched.
+    """
+
+    def __init__(self, facts, dimensions, source=None):
+        # Optional callable(source key) -> DataFrame or None: facts and
+        # dimensions not passed in are pulled from it on first use
+        self._source = source
+        self._lock = threading.RLock()
+        self._dimensions = {}
+        self._indexes = {}
+        for name, df in dimensions.items():
+            self._add_dimension(name, df)
+
+        self._facts = {}
+        self._date_indexes = {}
+        for name, df in facts.items():
+            self._set_fact(name, df)
+
+    def _add_dimension(self, name, df):
+        id_col = DIMENSIONS[name][1]
+        df = df.drop_duplicates(subset=id_col).reset_index(drop=True)
+        self._indexes[name] = pd.Index(df[id_col])
+        self._dimensions[name] = df
+
+    def _pull(self, key):
+        df = self._source(key) if self._source is not None else None
+        return df if df is not None and not df.empty else None
+
+    # Sources are pulled without holding the lock (they may take locks of
+    # their own); only the registration is serialized.
+
+    def _resolve_dimension(self, name):
+        if name in self._dimensions or self._source is None or name not in DIMENSIONS:
+            return
+        df = self._pull(DIMENSIONS[name][0])
+        with self._lock:
+            if name not in self._dimensions:
+                if df is not None:
+                    self._add_dimension(name, df)
+                else:
+                    self._dimensions[name] = None
+
+    def _resolve_fact(self, name):
+        if name in self._facts or self._source is None or name not in FACTS:
+            return
+        df = self._pull(name)
+        with self._lock:
+            if name not in self._facts:
+                self._set_fact(name, df)
+
+    def _set_fact(self, name, df):
+        if df is not None and name in SORTED_FACTS:
+            df = sort_by_date(df, SORTED_FACTS[name])
+            self._date_indexes[name] = DateIndex(df[SORTED_FACTS[name]])
+        self._facts[name] = df
+
+    def with_fact(self, name, df):
+        """
+        Returns a new model that shares this model's dimensions but uses df
+        as fact `name`. For a sorted fact, df should already be sorted (it is
+        copied otherwise). The original model is left untouched.
+        """
+        model = self._copy()
+        model._set_fact(name, df)
+        return model
+
+    def rebind(self, source):
+        """
+        Returns a copy of this model that pulls its unresolved facts and
+        dimensions from `source` instead.
+        """
+        model = self._copy()
+        model._source = source
+        return model
+
+    def _copy(self):
+        model = copy.copy(self)
+        model._lock = threading.RLock()
+        model._facts = dict(self._facts)
+        model._dimensions = dict(self._dimensions)
+        model._indexes = dict(self._indexes)
+        model._date_indexes = dict(self._date_indexes)
+        return model
+
+    def keys_for(self, dimension, ids):
+        """
+        Maps natural IDs to int32 positions in the dimension (-1 if unknown).
+        """
+        self._resolve_dimension(dimension)
+        return self._indexes[dimension].get_indexer(ids).astype('int32')
+
+    def fact(self, name):
+        self._resolve_fact(name)
+        return self._facts.get(name)
+
+    def date_index(self, name):
+        """
+        DateIndex of a sorted fact (None if the fact is missing).
+        """
+        self._resolve_fact(name)
+        return self._date_indexes.get(name)
+
+    def dimension(self, name):
+        self._resolve_dimension(name)
+        return self._dimensions.get(name)
+
+    def lookup_ids(self, dimension, ids, attribute):
+        """
+        Gathers a dimension attribute for an array of natural IDs (missing
+        for unknown IDs).
+        """
+        values = self.dimension(dimension)[attribute].array
+        return pd.api.extensions.take(values, self.keys_for(dimension, ids), allow_fill=True)
+
+    def memory_mb(self):
+        """
+        Deep memory of the facts and dimensions resolved so far, in MB.
+        """
+        frames = [df for df in list(self._facts.values()) + list(self._dimensions.values()) if df is not None]
+        return sum(df.memory_usage(deep=True).sum() for df in frames) / 1024 ** 2
+
+
+def build_star_model(data):
+    """
+    Builds the StarModel from the loaded sources. Facts are the loaded frames
+    themselves, so nothing is duplicated.
+    """
+    dimensions = {}
+    for name, (source, _) in DIMENSIONS.items():
+        df = data.get(source)
+        if df is not None and not df.empty:
+            dimensions[name] = df
+    facts = {}
+    for name in FACTS:
+        df = data.get(name)
+        if df is not None and not df.empty:
+            facts[name] = df
+    return StarModel(facts, dimensions)
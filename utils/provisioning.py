@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.data_loader import REPO_DIR
+from utils.instrumentation import timed
+from utils.result_cache import RESULTS
+
+POLICY_PATH = os.environ.get("ANDINA_POLICY_PATH", os.path.join(REPO_DIR, "config", "politicas_provision.json"))
+
+
+class PolicyError(ValueError):
+    pass
+
+
+def validate_policy(name, policy):
+    """
+    Checks the shape of a policy definition and raises PolicyError if it is
+    inconsistent (e.g. a rate table that does not match the buckets).
+    """
+    cortes = policy.get('cortes_dias')
+    tasas = policy.get('tasas')
+    if not cortes or tasas is None:
+        raise PolicyError(f"{name}: se requieren 'cortes_dias' y 'tasas'")
+    if list(cortes) != sorted(cortes):
+        raise PolicyError(f"{name}: 'cortes_dias' debe estar en orden ascendente")
+    buckets = len(cortes) + 1
+    if len(tasas) != buckets:
+        raise PolicyError(f"{name}: {len(tasas)} tasas para {buckets} rangos")
+    if len(policy.get('etiquetas', [None] * buckets)) != buckets:
+        raise PolicyError(f"{name}: {len(policy['etiquetas'])} etiquetas para {buckets} rangos")
+    for group, group_rates in policy.get('tasas_por_grupo', {}).items():
+        if len(group_rates) != buckets:
+            raise PolicyError(f"{name}: {len(group_rates)} tasas para {buckets} rangos en el grupo {group}")
+    if policy.get('tasas_por_grupo') and not policy.get('agrupar_por'):
+        raise PolicyError(f"{name}: 'tasas_por_grupo' requiere 'agrupar_por'")
+
+
+def load_policies(path=None):
+    """
+    Loads and validates the provisioning policies (name -> definition).
+    """
+    with open(path or POLICY_PATH, encoding='utf-8') as f:
+        policies = json.load(f)
+    for name, policy in policies.items():
+        validate_policy(name, policy)
+    return policies
+
+
+def _policy_hash(policy):
+    payload = json.dumps(policy, sort_keys=True).encode('utf-8')
+    return hashlib.blake2b(payload, digest_size=8).hexdigest()
+
+
+def aging_bucket(dias_mora, cortes_dias):
+    """
+    Bucket index of every document: 0 for dias <= cortes[0], 1 for
+    (cortes[0], cortes[1]], ... and len(cortes) above the last cut.
+    """
+    days = pd.to_numeric(dias_mora, errors='coerce').to_numpy(dtype='float64', na_value=0)
+    return np.searchsorted(np.asarray(cortes_dias, dtype='float64'), days, side='left')
+
+
+def _group_values(cartera, column, model):
+    if column in cartera.columns:
+        return cartera[column]
+    if model is not None and model.dimension('cliente') is not None:
+        # e.g. segmento lives in the client dimension, not in cartera
+        return pd.Series(model.lookup_ids('cliente', cartera['cliente_id'], column), index=cartera.index)
+    raise PolicyError(f"No se encuentra la columna '{column}' para agrupar")
+
+
+def _provision(cartera, policy, model):
+    """
+    Provision of every document under one policy: a (group, bucket) rate
+    table indexed with two integer arrays.
+    """
+    buckets = aging_bucket(cartera['dias_mora'], policy['cortes_dias'])
+    groups = policy.get('tasas_por_grupo', {})
+    # Last row of the table holds the default rates (documents outside any group)
+    table = np.array(list(groups.values()) + [policy['tasas']], dtype='float64')
+    if groups:
+        values = _group_values(cartera, policy['agrupar_por'], model)
+        group_codes = pd.Categorical(values.astype(str), categories=list(groups)).codes.astype('int64')
+        group_codes[group_codes < 0] = len(groups)
+    else:
+        group_codes = np.zeros(len(cartera), dtype='int64')
+    rates = table[group_codes, buckets]
+    return cartera['saldo_cop'].to_numpy(dtype='float64', na_value=0) * rates
+
+
+def _cached_provision(cartera, name, policy, model):
+    """
+    _provision from the shared result cache, keyed by the policy definition
+    and the cartera/model versions like the page views.
+    """
+    def compute():
+        with timed("vista.provision", politica=name):
+            return _provision(cartera, policy, model)
+
+    return RESULTS.get_or_compute("utils.provisioning.provision", [cartera, model],
+                                  (name, _policy_hash(policy)), compute)
+
+
+def evaluate_policies(cartera, policies, model=None):
+    """
+    Provision of every document under each policy, as a DataFrame with one
+    column per policy (same index as cartera). Results are cached per
+    (policy definition, cartera frame): pass the shared cartera fact, not a
+    per-rerun copy, and switching scenarios costs nothing after the first run.
+    """
+    out = {name: _cached_provision(cartera, name, policy, model) for name, policy in policies.items()}
+    return pd.DataFrame(out, index=cartera.index)
+
+
+def policy_summary(cartera, policies, model=None):
+    """
+    Side-by-side totals per policy: provision, % of the portfolio and % of the
+    overdue portfolio.
+    """
+    provisions = evaluate_policies(cartera, policies, model)
+    total = cartera['saldo_cop'].sum()
+    overdue = cartera.loc[(cartera['dias_mora'] > 0).fillna(False).to_numpy(), 'saldo_cop'].sum()
+    rows = []
+    for name, policy in policies.items():
+        value = provisions[name].sum()
+        rows.append({
+            'politica': name,
+            'descripcion': policy.get('descripcion', ''),
+            'provision_cop': value,
+            'pct_cartera': (value / total) * 100 if total > 0 else 0,
+            'pct_mora': (value / overdue) * 100 if overdue > 0 else 0,
+        })
+    return pd.DataFrame(rows)
+
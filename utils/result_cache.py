@@ -0,0 +1,177 @@
+"""
+Process-wide cache of computed page results (DataFrames, dicts, Plotly
+figures), shared by every session.
+
+Entries are keyed by (namespace, dataset version, filter values). The dataset
+version is the identity of the published frames a result was computed from:
+they are held by weak reference and an entry is only served while the same
+frames are still the ones being passed in, so a refresh invalidates exactly
+the results that depend on the frames it replaced. Entries are evicted in LRU
+order once their estimated size exceeds the byte budget
+(ANDINA_RESULT_CACHE_MB, 256 MB by default). Concurrent requests for the
+same key wait for the first computation instead of repeating it.
+"""
+import os
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_BUDGET_MB = float(os.environ.get("ANDINA_RESULT_CACHE_MB", 256))
+
+
+def freeze(value):
+    """
+    Hashable form of a filter value (lists/dicts/sets become tuples).
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(freeze(v) for v in value))
+    if isinstance(value, np.ndarray):
+        return (value.dtype.str, value.shape, value.tobytes())
+    return value
+
+
+def estimate_size(value):
+    """
+    Approximate size in bytes of a cached result.
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if isinstance(usage, pd.Series) else int(usage)
+    if hasattr(value, 'nbytes'):
+        # numpy arrays and index structures that report their own size
+        return int(value.nbytes)
+    if hasattr(value, 'to_plotly_json'):
+        import plotly.io as pio
+        return len(pio.to_json(value, validate=False))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """
+    LRU cache with a byte budget and hit/miss counters per namespace.
+    """
+
+    def __init__(self, budget_mb=DEFAULT_BUDGET_MB):
+        self.budget_bytes = int(budget_mb * 1024 ** 2)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (weakrefs to the sources, value, size)
+        self._pending = {}  # key -> Event set when the first computation ends
+        self._counters = {}  # namespace -> [hits, misses]
+        self.bytes = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(namespace, sources, filters):
+        return (namespace, tuple(id(src) for src in sources), freeze(filters))
+
+    def _lookup(self, key, sources):
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        refs, value, _ = entry
+        if all(ref() is src for ref, src in zip(refs, sources)):
+            self._entries.move_to_end(key)
+            return True, value
+        self._drop(key)  # the id was reused by a newer frame
+        return False, None
+
+    def _drop(self, key):
+        _, _, size = self._entries.pop(key)
+        self.bytes -= size
+
+    def _count(self, namespace, hit):
+        counters = self._counters.setdefault(namespace, [0, 0])
+        counters[0 if hit else 1] += 1
+
+    def _store(self, key, sources, value, size):
+        if size > self.budget_bytes:
+            return
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = ([weakref.ref(src) for src in sources], value, size)
+        self.bytes += size
+        while self.bytes > self.budget_bytes:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def get_or_compute(self, namespace, sources, filters, compute):
+        """
+        Returns the cached result for (namespace, sources, filters) or computes,
+        stores and returns it. `sources` are the frames/models the result is
+        derived from; `filters` any hashable-ish description of the inputs.
+        """
+        sources = [src for src in sources if src is not None]
+        key = self.make_key(namespace, sources, filters)
+        while True:
+            with self._lock:
+                found, value = self._lookup(key, sources)
+                if found:
+                    self._count(namespace, True)
+                    return value
+                pending = self._pending.get(key)
+                if pending is None:
+                    pending = self._pending[key] = threading.Event()
+                    self._count(namespace, False)
+                    break
+            # Someone else is computing it: wait and look again (if that
+            # computation failed, the next waiter takes over)
+            pending.wait()
+        try:
+            value = compute()
+            size = estimate_size(value)
+            with self._lock:
+                self._store(key, sources, value, size)
+            return value
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+            pending.set()
+
+    def purge_stale(self):
+        """
+        Drops the entries whose source frames are gone (after a refresh).
+        """
+        with self._lock:
+            stale = [key for key, (refs, _, _) in self._entries.items() if any(ref() is None for ref in refs)]
+            for key in stale:
+                self._drop(key)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        """
+        Hit/miss counters per namespace plus the overall totals and usage.
+        """
+        with self._lock:
+            per_namespace = {ns: {'hits': h, 'misses': m} for ns, (h, m) in self._counters.items()}
+            hits = sum(h for h, _ in self._counters.values())
+            misses = sum(m for _, m in self._counters.values())
+            return {
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'budget_bytes': self.budget_bytes,
+                'evictions': self.evictions,
+                'namespaces': per_namespace,
+            }
+
+
+RESULTS = ResultCache()
@@ -0,0 +1,264 @@
+"""
+Inventory rotation engine.
+
+Inventory snapshots and the cost of sales are laid out once per data version
+as a dense (producto_id, centro_logistico) x month grid, rows sorted by
+product and center, with prefix sums along the months. The inventory value,
+number of snapshots and COGS of any window of months are then two lookups
+per row, so rotation, days of inventory and rolling averages for any period,
+center or category cost O(1) per product instead of a re-grouping of the
+whole inventory history.
+
+Sales carry no logistics center: each sale is assigned to the center that
+serves its region, from config/centros_por_region.json (CENTER_BY_REGION,
+DEFAULT_CENTER for any other region). Per-center figures are therefore an
+estimate that is only as good as that mapping.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.data_loader import REPO_DIR
+
+CENTERS_PATH = os.environ.get("ANDINA_CENTERS_PATH", os.path.join(REPO_DIR, "config", "centros_por_region.json"))
+
+
+class CenterMappingError(ValueError):
+    pass
+
+
+def validate_center_mapping(mapping):
+    """
+    Checks the region -> center mapping and raises CenterMappingError if a
+    region or center is not a non-empty string.
+    """
+    default = mapping.get('centro_por_defecto')
+    by_region = mapping.get('centro_por_region')
+    if not isinstance(default, str) or not default.strip():
+        raise CenterMappingError("se requiere 'centro_por_defecto'")
+    if not isinstance(by_region, dict) or not by_region:
+        raise CenterMappingError("se requiere 'centro_por_region' con al menos una región")
+    for region, center in by_region.items():
+        if not region.strip():
+            raise CenterMappingError("'centro_por_region' tiene una región vacía")
+        if not isinstance(center, str) or not center.strip():
+            raise CenterMappingError(f"la región {region} no tiene un centro válido")
+
+
+def load_center_mapping(path=None):
+    """
+    Loads and validates the region -> center mapping: (center_by_region,
+    default_center).
+    """
+    with open(path or CENTERS_PATH, encoding='utf-8') as f:
+        mapping = json.load(f)
+    validate_center_mapping(mapping)
+    return dict(mapping['centro_por_region']), mapping['centro_por_defecto']
+
+
+# Center that serves each sales region, validated once at import
+CENTER_BY_REGION, DEFAULT_CENTER = load_center_mapping()
+
+DAYS_PER_MONTH = 365 / 12
+
+
+def _month_ordinal(dates):
+    return (dates.dt.year * 12 + dates.dt.month - 1).to_numpy(dtype='int64')
+
+
+def _to_ordinal(value):
+    """
+    Month ordinal of 'YYYY-MM', a date, a Period or a year (as int).
+    """
+    if isinstance(value, (int, np.integer)):
+        return int(value) * 12
+    period = pd.Period(value, freq='M')
+    return period.year * 12 + period.month - 1
+
+
+def sales_centers(region, center_by_region=None):
+    """
+    Logistics center of every sale, from its region (see CENTER_BY_REGION).
+    """
+    center_by_region = CENTER_BY_REGION if center_by_region is None else center_by_region
+    region = pd.Series(region)
+    if not isinstance(region.dtype, pd.CategoricalDtype):
+        region = region.astype('category')
+    # Mapped once per region category, then applied to the codes
+    by_code = np.array([center_by_region.get(r, DEFAULT_CENTER) for r in region.cat.categories.astype(str)]
+                       + [DEFAULT_CENTER], dtype=object)
+    return by_code[region.cat.codes.to_numpy()]
+
+
+class RotationIndex:
+    """
+    Prefix sums of inventory value, snapshot count and COGS per
+    (producto_id, centro_logistico) and month.
+    """
+
+    def __init__(self, inventory, ventas, center_by_region=None):
+        center_by_region = CENTER_BY_REGION if center_by_region is None else center_by_region
+        # Rows without a date or a product cannot be placed on the grid
+        inventory = inventory[(inventory['fecha_corte'].notna() & inventory['producto_id'].notna()).to_numpy()]
+        ventas = ventas[(ventas['fecha'].notna() & ventas['producto_id'].notna()).to_numpy()]
+
+        inv_month = _month_ordinal(inventory['fecha_corte'])
+        sale_month = _month_ordinal(ventas['fecha'])
+        months = np.concatenate([inv_month, sale_month])
+        self.first_month = int(months.min()) if len(months) else 0
+        n_months = int(months.max()) - self.first_month + 1 if len(months) else 0
+        self.periods = pd.period_range(
+            pd.Period(year=self.first_month // 12, month=self.first_month % 12 + 1, freq='M'),
+            periods=n_months, freq='M',
+        )
+
+        inv_keys = pd.DataFrame({
+            'producto_id': inventory['producto_id'].to_numpy(),
+            'centro_logistico': inventory['centro_logistico'].astype(str).to_numpy(),
+            'categoria': inventory['categoria'].astype(str).to_numpy(),
+        })
+        sale_keys = pd.DataFrame({
+            'producto_id': ventas['producto_id'].to_numpy(),
+            'centro_logistico': sales_centers(ventas['region'], center_by_region),
+            'categoria': ventas['categoria'].astype(str).to_numpy(),
+        })
+        keys = pd.concat([inv_keys, sale_keys], ignore_index=True)
+        # One row per (product, center), sorted; categoria follows the product
+        keys = (keys.drop_duplicates(['producto_id', 'centro_logistico'])
+                .sort_values(['producto_id', 'centro_logistico']).reset_index(drop=True))
+        index = pd.MultiIndex.from_frame(keys[['producto_id', 'centro_logistico']])
+        self.keys = keys.astype({'centro_logistico': 'category', 'categoria': 'category'})
+
+        inv_rows = index.get_indexer(pd.MultiIndex.from_frame(inv_keys[['producto_id', 'centro_logistico']]))
+        sale_rows = index.get_indexer(pd.MultiIndex.from_frame(sale_keys[['producto_id', 'centro_logistico']]))
+        value = inventory['valor_inventario_cop'].to_numpy(dtype='float64', na_value=np.nan)
+        has_value = ~np.isnan(value)
+        cogs = (ventas['subtotal_cop'] - ventas['margen_total_cop']).to_numpy(dtype='float64', na_value=0)
+
+        shape = (len(self.keys), n_months)
+        self._value = self._prefix(inv_rows[has_value], inv_month[has_value] - self.first_month, value[has_value], shape)
+        self._count = self._prefix(inv_rows[has_value], inv_month[has_value] - self.first_month, None, shape)
+        self._cogs = self._prefix(sale_rows, sale_month - self.first_month, cogs, shape)
+
+    @staticmethod
+    def _prefix(rows, months, weights, shape):
+        """
+        Cumulative sums along the months of a (rows, months) grid, with a
+        leading zero column: sum of months [s, e] is cum[:, e + 1] - cum[:, s].
+        """
+        flat = np.bincount(rows * shape[1] + months, weights=weights, minlength=shape[0] * shape[1])
+        grid = flat.reshape(shape)
+        return np.concatenate([np.zeros((shape[0], 1)), np.cumsum(grid, axis=1)], axis=1)
+
+    @property
+    def nbytes(self):
+        return self._value.nbytes + self._count.nbytes + self._cogs.nbytes + int(self.keys.memory_usage(deep=True).sum())
+
+    def years(self):
+        """
+        Years with inventory snapshots, most recent first.
+        """
+        snapshots = np.diff(self._count.sum(axis=0)) > 0
+        return sorted(set(self.periods.year[snapshots]), reverse=True)
+
+    def centers(self):
+        return list(self.keys['centro_logistico'].cat.categories)
+
+    def categories(self):
+        return list(self.keys['categoria'].cat.categories)
+
+    def _bounds(self, start, end):
+        """
+        Grid columns [s, e] of a window; an int is a whole year, None an open end.
+        """
+        last = len(self.periods) - 1
+        s = 0 if start is None else _to_ordinal(start) - self.first_month
+        if end is None:
+            e = last
+        elif isinstance(end, (int, np.integer)):
+            e = (int(end) * 12 + 11) - self.first_month
+        else:
+            e = _to_ordinal(end) - self.first_month
+        return max(s, 0), min(e, last)
+
+    def _rows(self, center, categoria):
+        mask = np.ones(len(self.keys), dtype=bool)
+        if center is not None:
+            mask &= (self.keys['centro_logistico'] == center).to_numpy()
+        if categoria is not None:
+            mask &= (self.keys['categoria'] == categoria).to_numpy()
+        return np.flatnonzero(mask)
+
+    def _by_product(self, rows, *grids):
+        """
+        Sums the rows of each grid per product; `rows` come from _rows, so
+        the centers of a product are contiguous.
+        """
+        if not len(rows):
+            return grids
+        product = self.keys['producto_id'].to_numpy()[rows]
+        starts = np.flatnonzero(np.r_[True, product[1:] != product[:-1]])
+        return tuple(np.add.reduceat(grid, starts, axis=0) for grid in grids)
+
+    def rotation(self, start=None, end=None, center=None, categoria=None):
+        """
+        Rotation per product over the months [start, end] (a year, 'YYYY-MM',
+        a date or None for the whole history), optionally for one center
+        and/or category: COGS, average inventory value, rotation (times) and
+        days of inventory. With every center, the average inventory of a
+        product is taken over the snapshots of all its centers. Products without
+        inventory or without sales in the window are left out.
+        """
+        s, e = self._bounds(start, end)
+        columns = ['producto_id', 'categoria', 'cogs', 'avg_inventory_value', 'rotacion_veces', 'rotacion_dias']
+        if e < s:
+            return pd.DataFrame(columns=columns)
+        rows = self._rows(center, categoria)
+        frame = pd.DataFrame({
+            'producto_id': self.keys['producto_id'].to_numpy()[rows],
+            'categoria': self.keys['categoria'].to_numpy()[rows],
+            'cogs': self._cogs[rows, e + 1] - self._cogs[rows, s],
+            'value': self._value[rows, e + 1] - self._value[rows, s],
+            'count': self._count[rows, e + 1] - self._count[rows, s],
+        })
+        if center is None:
+            frame = frame.groupby(['producto_id', 'categoria'], observed=True, sort=False).sum().reset_index()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            frame['avg_inventory_value'] = np.where(frame['count'] > 0, frame['value'] / frame['count'], 0.0)
+        frame = frame[((frame['avg_inventory_value'] > 0) & (frame['cogs'] > 0)).to_numpy()].reset_index(drop=True)
+        frame['rotacion_veces'] = frame['cogs'] / frame['avg_inventory_value']
+        frame['rotacion_dias'] = (e - s + 1) * DAYS_PER_MONTH / frame['rotacion_veces']
+        return frame[columns]
+
+    def rolling(self, months=3, start=None, end=None, center=None, categoria=None):
+        """
+        Trailing `months`-month averages for the selected products, one row
+        per month of [start, end]: average inventory value, COGS and days of
+        inventory of the trailing window. As in rotation(), with every
+        center the average of a product is taken over all its centers.
+        """
+        s, e = self._bounds(start, end)
+        rows = self._rows(center, categoria)
+        ends = np.arange(max(s, months - 1), e + 1)
+        starts = ends - months + 1
+        count = self._count[rows][:, ends + 1] - self._count[rows][:, starts]
+        value = self._value[rows][:, ends + 1] - self._value[rows][:, starts]
+        if center is None:
+            count, value = self._by_product(rows, count, value)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            average = np.where(count > 0, value / count, 0.0).sum(axis=0)
+        cogs = (self._cogs[rows][:, ends + 1] - self._cogs[rows][:, starts]).sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            days = np.where(cogs > 0, months * DAYS_PER_MONTH * average / cogs, np.nan)
+        return pd.DataFrame({
+            'periodo': self.periods[ends].to_timestamp(),
+            'avg_inventory_value': average,
+            'cogs': cogs,
+            'rotacion_dias': days,
+        })
+
+
+def build_rotation_index(inventory, ventas, center_by_region=None):
+    return RotationIndex(inventory, ventas, center_by_region)
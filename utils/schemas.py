@@ -0,0 +1,230 @@
+import hashlib
+import json
+
+import pandas as pd
+
+# Declarative schema of every source: column -> kind.
+#   'category'  low-cardinality text (region, segmento, ...), stored as codes
+#   'string'    free text (names, descriptions, SKUs)
+#   'int32'     non-null integer (IDs, quantities)
+#   'Int32'     nullable integer
+#   'int64'     wide integer (NIT)
+#   'float32'   small-magnitude decimals (discounts, USD unit costs)
+#   'float64'   decimals that are summed into large totals (USD amounts, TRM)
+#   'currency'  COP amounts; may arrive as '$1,234' text, parsed to float64
+#   'date'      ISO dates, parsed to datetime64
+SCHEMAS = {
+    "ventas": {
+        "venta_id": "int32",
+        "fecha": "date",
+        "cliente_id": "int32",
+        "producto_id": "int32",
+        "region": "category",
+        "ciudad": "category",
+        "segmento": "category",
+        "categoria": "category",
+        "subcategoria": "category",
+        "cantidad": "int32",
+        "precio_unitario_cop": "currency",
+        "descuento_pct": "float32",
+        "subtotal_cop": "currency",
+        "costo_unitario_est_cop": "currency",
+        "margen_total_cop": "currency",
+        "tipo_venta": "category",
+        "ejecutivo": "category",
+    },
+    "clientes": {
+        "cliente_id": "int32",
+        "nombre_cliente": "string",
+        "nit": "int64",
+        "segmento": "category",
+        "region": "category",
+        "ciudad": "category",
+        "fecha_alta": "date",
+        "tamano_cliente": "category",
+        "estado": "category",
+    },
+    "productos": {
+        "producto_id": "int32",
+        "sku": "string",
+        "categoria": "category",
+        "subcategoria": "category",
+        "marca": "category",
+        "descripcion": "string",
+        "unidad_medida": "category",
+        "origen": "category",
+        "costo_usd_base": "float32",
+        "precio_lista_cop": "currency",
+    },
+    "cartera": {
+        "documento_id": "int32",
+        "cliente_id": "int32",
+        "fecha_factura": "date",
+        "fecha_vencimiento": "date",
+        "monto_factura_cop": "currency",
+        "saldo_cop": "currency",
+        "estado": "category",
+        "dias_mora": "Int32",
+        "region": "category",
+        "ciudad": "category",
+    },
+    "inventario": {
+        "fecha_corte": "date",
+        "centro_logistico": "category",
+        "producto_id": "int32",
+        "categoria": "category",
+        "subcategoria": "category",
+        "stock_unidades": "Int32",
+        "valor_inventario_cop": "currency",
+    },
+    "importaciones": {
+        "importacion_id": "int32",
+        "proveedor": "category",
+        "pais_origen": "category",
+        "fecha_orden": "date",
+        "fecha_llegada": "date",
+        "trm": "float64",
+        "costo_mercancia_usd": "float64",
+        "flete_usd": "float64",
+        "arancel_cop": "currency",
+        "otros_costos_cop": "currency",
+        "centro_logistico": "category",
+    },
+}
+
+# Kinds the parser can produce directly (everything else is converted after reading)
+_READ_DTYPES = {
+    "category": "category",
+    "string": "str",
+    "int32": "int32",
+    "Int32": "Int32",
+    "int64": "int64",
+    "float32": "float32",
+    "float64": "float64",
+}
+
+
+def schema_version():
+    """
+    Short hash of SCHEMAS. Stored with the cached snapshots so that editing a
+    schema invalidates them.
+    """
+    payload = json.dumps(SCHEMAS, sort_keys=True).encode('utf-8')
+    return hashlib.blake2b(payload, digest_size=8).hexdigest()
+
+
+def read_dtypes(name):
+    """
+    Returns the `dtype` mapping to pass to pd.read_csv / pd.read_excel for a
+    source, so categoricals and narrow numbers are built by the parser itself.
+    """
+    return {col: _READ_DTYPES[kind] for col, kind in SCHEMAS.get(name, {}).items() if kind in _READ_DTYPES}
+
+
+def _parse_currency(series):
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype('float64')
+    cleaned = series.astype(str).str.replace(r'[$,]', '', regex=True)
+    return pd.to_numeric(cleaned, errors='coerce').astype('float64')
+
+
+def _coerce(series, kind):
+    if kind == "date":
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return series
+        return pd.to_datetime(series, errors='coerce')
+    if kind == "currency":
+        return _parse_currency(series)
+    if kind == "category":
+        return series if isinstance(series.dtype, pd.CategoricalDtype) else series.astype('category')
+    if kind == "string":
+        return series.astype('str')
+    if kind in ("int32", "Int32", "int64"):
+        numbers = pd.to_numeric(series, errors='coerce')
+        if numbers.isna().any():
+            # Keep the rows; validate_schema reports the nulls on non-nullable keys
+            return numbers.astype('Int32' if kind != "int64" else 'Int64')
+        return numbers.astype(kind)
+    return pd.to_numeric(series, errors='coerce').astype(kind)
+
+
+def apply_schema(df, name):
+    """
+    Converts every declared column of df to its schema dtype. Idempotent, so it
+    can run on parser output, Excel sheets, cached snapshots and delta files.
+    Undeclared columns are left untouched.
+    """
+    schema = SCHEMAS.get(name)
+    if not schema or df.empty:
+        return df
+    for col, kind in schema.items():
+        if col in df.columns:
+            df[col] = _coerce(df[col], kind)
+    return df
+
+
+def _expected_dtype(kind):
+    return {
+        "date": "datetime64",
+        "currency": "float64",
+        "category": "category",
+        "string": "str",
+    }.get(kind, kind)
+
+
+def validate_schema(df, name):
+    """
+    Returns a list of human-readable problems (missing columns, wrong dtypes,
+    nulls in non-nullable columns). An empty list means df matches the schema.
+    """
+    problems = []
+    for col, kind in SCHEMAS.get(name, {}).items():
+        if col not in df.columns:
+            problems.append(f"{name}.{col}: columna faltante")
+            continue
+        dtype = df[col].dtype
+        expected = _expected_dtype(kind)
+        if expected == "datetime64":
+            ok = pd.api.types.is_datetime64_any_dtype(dtype)
+        elif expected == "category":
+            ok = isinstance(dtype, pd.CategoricalDtype)
+        elif expected == "str":
+            ok = pd.api.types.is_string_dtype(dtype)
+        else:
+            ok = str(dtype) == expected
+        if not ok:
+            problems.append(f"{name}.{col}: tipo {dtype}, se esperaba {expected}")
+        if kind in ("int32", "int64") and df[col].isna().any():
+            problems.append(f"{name}.{col}: {int(df[col].isna().sum())} valores nulos en columna no anulable")
+    return problems
+
+
+def frame_memory_mb(df):
+    """
+    Deep memory usage of a DataFrame in MB.
+    """
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+
+def concat_typed(frames):
+    """
+    Concatenates frames without losing categorical dtypes: categoricals whose
+    categories differ between frames are unioned first (plain pd.concat would
+    fall back to object).
+    """
+    frames = [df for df in frames if df is not None and not df.empty]
+    if not frames:
+        return pd.DataFrame()
+    if len(frames) == 1:
+        return frames[0]
+    frames = [df.copy(deep=False) for df in frames]
+    for col in frames[0].columns:
+        dtypes = [df[col].dtype for df in frames if col in df.columns]
+        if any(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes):
+            categories = pd.api.types.union_categoricals(
+                [pd.Categorical(df[col]) for df in frames if col in df.columns]
+            ).categories
+            for df in frames:
+                if col in df.columns:
+                    df[col] = pd.Categorical(df[col], categories=categories)
+    return pd.concat(frames, ignore_index=True)
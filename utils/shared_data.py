@@ -0,0 +1,102 @@
+import os
+import threading
+
+import streamlit as st
+
+from utils.data_loader import DATA_DIR, FILES, LazyData
+from utils.ingest import apply_deltas, ingest_version, read_batches
+from utils.instrumentation import timed
+from utils.result_cache import RESULTS
+
+
+def source_version():
+    """
+    Returns a cheap version stamp of the source files: (name, mtime_ns, size)
+    for each of them. Changes whenever an extract is replaced.
+    """
+    version = []
+    for filename in FILES.values():
+        try:
+            stat = os.stat(os.path.join(DATA_DIR, filename))
+            version.append((filename, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            version.append((filename, None, None))
+    return tuple(version)
+
+
+class _SharedData:
+    """
+    Holder of the published data model. Readers take `data` without locking;
+    a refresh builds the new model aside and swaps the reference at the end.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = None
+        self.sources = None
+        self.ingested = None
+
+
+@st.cache_resource
+def _shared_data():
+    return _SharedData()
+
+
+def _loading_spinner(name):
+    return st.spinner(f"Cargando {name}...")
+
+
+def _refresh(shared, sources, ingested):
+    """
+    Brings the shared model up to date. A replaced source file means a full
+    reload; new ingested delta batches are applied in memory on top of the
+    current model, so their cost follows the size of the delta.
+    """
+    if shared.data is not None and shared.sources == sources and ingested > shared.ingested:
+        try:
+            deltas = read_batches(shared.ingested, ingested)
+            with timed("ingesta.aplicar_deltas", filas=sum(len(delta) for delta in deltas.values())):
+                shared.data = apply_deltas(shared.data, deltas)
+            shared.ingested = ingested
+            RESULTS.purge_stale()
+            return
+        except FileNotFoundError:
+            pass  # batch files were cleaned up: reload from the snapshots
+
+    # Nothing is read here: each dataset loads on first access from a page
+    shared.data = LazyData(loading=_loading_spinner)
+    shared.sources = sources
+    shared.ingested = ingested
+    # Cached page results of the replaced frames can no longer be served
+    RESULTS.purge_stale()
+
+
+def get_data():
+    """
+    Returns the process-wide data model (a LazyData: each dataset is loaded
+    the first time any page reads it) and swaps it atomically when the
+    sources change or new delta files are ingested. The mapping and its
+    DataFrames are shared by every session: treat them as read-only and work
+    on copies or derived frames.
+    """
+    shared = _shared_data()
+    sources = source_version()
+    ingested = ingest_version()
+    if shared.sources != sources or shared.ingested != ingested:
+        with shared.lock:
+            if shared.sources != sources or shared.ingested != ingested:
+                _refresh(shared, sources, ingested)
+    # Sessions only keep a reference to the version they are looking at.
+    st.session_state['data_version'] = (sources, shared.ingested)
+    return shared.data
+
+
+def show_load_warnings(data):
+    """
+    One st.warning per loaded source that failed or loaded with warnings
+    (the `error` and `avisos` of its load report).
+    """
+    for key, entry in data.report.items():
+        problems = ([f"no se pudo cargar ({entry['error']})"] if entry['error'] else []) + entry.get('avisos', [])
+        if problems:
+            st.warning(f"Avisos de carga de {entry['archivo']}:\n" + "\n".join(f"- {p}" for p in problems))
@@ -0,0 +1,408 @@
+"""
+Optional DuckDB backend: the heavy scans run as SQL over the Parquet
+snapshots instead of over DataFrames held in memory.
+
+Enabled with ANDINA_BACKEND=duckdb (see utils.data_loader.sql_backend); needs
+the duckdb package, and falls back to pandas without it. The sources are
+registered as views over their snapshots in CACHE_DIR (ventas over its
+year/month partitions when warm_cache.py --particionar wrote current ones)
+in a file-backed database (ANDINA_DUCKDB_PATH, CACHE_DIR/andina.duckdb by
+default), so DuckDB
+reads only the columns and row groups a query needs and only the small
+result comes back into pandas:
+
+- the monthly sales cube, with the landed cost of every sale (as-of join on
+  the imports), so the sales fact is never loaded into pandas; the trend,
+  pivot and top-N views already answer from the cube;
+- inventory rotation per product and its trailing average per month;
+- outstanding / overdue portfolio and the aging of the overdue balance.
+
+Every query returns the same frame as its pandas counterpart in utils.views
+and utils.cube; benchmarks/sql_parity.py checks it.
+"""
+import os
+import threading
+
+import pandas as pd
+
+from utils.analytics import AGING_BINS, OVERDUE_LABELS
+from utils.cube import CUBE_KEYS, CUBE_MEASURES
+from utils.data_loader import CACHE_DIR, DATA_DIR, FILES, _snapshot_is_valid, _snapshot_paths, load_source
+from utils.rotation import CENTER_BY_REGION, DAYS_PER_MONTH, DEFAULT_CENTER
+from utils.streaming import PARTITION_DIR, partitions_are_current
+
+DUCKDB_PATH = os.environ.get("ANDINA_DUCKDB_PATH", os.path.join(CACHE_DIR, "andina.duckdb"))
+
+_CUBE_DTYPES = {'anio': 'int16', 'mes': 'int8', 'cliente_id': 'int32', 'producto_id': 'int32',
+                'cantidad': 'int64', 'num_ventas': 'int64'}
+
+
+def _literal(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _center_case(column):
+    """
+    SQL expression with the logistics center of a sales region (see
+    utils.rotation.sales_centers).
+    """
+    cases = " ".join(f"WHEN {_literal(region)} THEN {_literal(center)}" for region, center in CENTER_BY_REGION.items())
+    return f"CASE {column} {cases} ELSE {_literal(DEFAULT_CENTER)} END"
+
+
+def _aging_case(column):
+    """
+    SQL expression with the aging bucket of an overdue document (right-closed
+    bins, as utils.analytics.classify_aging).
+    """
+    edges = AGING_BINS[1:-1]
+    cases = " ".join(f"WHEN {column} <= {edge} THEN {_literal(label)}"
+                     for edge, label in zip(edges[1:], OVERDUE_LABELS))
+    return f"CASE {cases} ELSE {_literal(OVERDUE_LABELS[-1])} END"
+
+
+class SqlBackend:
+    """
+    DuckDB connection with one view per source over its Parquet snapshot.
+    Thread-safe: every statement runs on its own cursor, and a source's
+    snapshot is refreshed and its view re-created under that source's lock.
+    """
+
+    def __init__(self, db_path=DUCKDB_PATH):
+        import duckdb
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        self._con = duckdb.connect(db_path)
+        # One lock per source: a stale snapshot is rebuilt by one thread while
+        # the others wait for it, instead of all writing the same file
+        self._locks = {key: threading.Lock() for key in FILES}
+        self._views = {}  # source key -> FROM expression of its view
+        self.register()
+
+    def register(self):
+        """
+        (Re)creates one view per source (see _refresh).
+        """
+        for key in FILES:
+            with self._locks[key]:
+                self._refresh(key, force=True)
+
+    def _refresh(self, key, force=False):
+        """
+        Points the view of a source at the year/month partitions of ventas
+        while they are current (utils.streaming: the snapshot's rows minus
+        the undated sales, which no query uses), at its snapshot otherwise,
+        rebuilding the snapshot first if it is stale. The view is re-created
+        when the snapshot was rebuilt or it switches between the two. Call it
+        holding the source's lock.
+        """
+        partitioned = key == 'ventas' and partitions_are_current()
+        if partitioned:
+            files = os.path.join(PARTITION_DIR, '*', '*', '*.parquet')
+            source = f"read_parquet({_literal(files)}, file_row_number = true, hive_partitioning = false)"
+        else:
+            snapshot_path, _ = _snapshot_paths(key)
+            source = f"read_parquet({_literal(snapshot_path)}, file_row_number = true)"
+        rebuilt = not partitioned and self._refresh_snapshot(key)
+        if force or rebuilt or self._views.get(key) != source:
+            self._execute(f"CREATE OR REPLACE VIEW {key} AS SELECT * FROM {source}")
+            self._views[key] = source
+
+    @staticmethod
+    def _refresh_snapshot(key):
+        """
+        Rebuilds the snapshot of a source if it is stale or missing. Returns
+        True if it was rebuilt.
+        """
+        snapshot_path, fingerprint_path = _snapshot_paths(key)
+        if _snapshot_is_valid(os.path.join(DATA_DIR, FILES[key]), snapshot_path, fingerprint_path):
+            return False
+        load_source(key)
+        return True
+
+    def _refresh_sources(self, keys):
+        """
+        Brings the views of the given sources up to date (see _refresh), so
+        they always read the current extracts.
+        """
+        for key in keys:
+            with self._locks[key]:
+                self._refresh(key)
+
+    def _execute(self, sql, params=None):
+        cursor = self._con.cursor()
+        try:
+            return cursor.execute(sql, params or []).df()
+        finally:
+            cursor.close()
+
+    def query(self, sql, params=None, sources=()):
+        """
+        Runs sql and returns the result as a DataFrame. sources: the views
+        it reads, refreshed first if their extracts changed.
+        """
+        self._refresh_sources(sources)
+        return self._execute(sql, params)
+
+    # --- Sales cube ---------------------------------------------------------
+
+    _LANDED_SALES = f"""
+        WITH imports AS (
+            SELECT CAST(pais_origen AS VARCHAR) AS pais,
+                   CAST(fecha_llegada AS DATE) AS dia,
+                   file_row_number AS orden,
+                   ((costo_mercancia_usd + COALESCE(flete_usd, 0)) * trm
+                    + COALESCE(arancel_cop, 0) + COALESCE(otros_costos_cop, 0)) / costo_mercancia_usd AS cop_por_usd
+            FROM importaciones
+            WHERE fecha_llegada IS NOT NULL AND costo_mercancia_usd > 0
+        ),
+        -- Same-day arrivals: the last one in file order prevails (stable sort + searchsorted right)
+        arrivals AS (
+            SELECT pais, dia, arg_max(cop_por_usd, orden) AS cop_por_usd FROM imports GROUP BY pais, dia
+        ),
+        -- Sales before the first arrival of their country use that first arrival
+        first_import AS (
+            SELECT pais, arg_min(cop_por_usd, (dia, orden)) AS cop_por_usd FROM imports GROUP BY pais
+        ),
+        products AS (
+            SELECT producto_id,
+                   arg_min(CAST(origen AS VARCHAR), file_row_number) AS pais,
+                   arg_min(CAST(costo_usd_base AS DOUBLE), file_row_number) AS costo_usd_base
+            FROM productos GROUP BY producto_id
+        ),
+        sales AS (
+            SELECT v.*, CAST(v.fecha AS DATE) AS dia, p.pais, p.costo_usd_base
+            FROM ventas v LEFT JOIN products p USING (producto_id)
+            WHERE v.fecha IS NOT NULL
+        ),
+        landed AS (
+            SELECT s.*, COALESCE(i.cop_por_usd, f.cop_por_usd) AS cop_por_usd
+            FROM sales s
+            ASOF LEFT JOIN arrivals i ON s.pais = i.pais AND s.dia >= i.dia
+            LEFT JOIN first_import f ON s.pais = f.pais
+        )
+        SELECT *, cantidad * costo_usd_base * cop_por_usd AS costo_real_cop,
+               subtotal_cop - cantidad * costo_usd_base * cop_por_usd AS margen_real_cop
+        FROM landed
+    """
+
+    def cube(self):
+        """
+        Monthly sales cube (utils.cube.build_cube) aggregated in SQL straight
+        from the sales, products and imports snapshots.
+        """
+        cube = self.query(f"""
+            SELECT year(fecha) AS anio, month(fecha) AS mes,
+                   cliente_id, producto_id, categoria, region, segmento, tipo_venta, ejecutivo,
+                   COALESCE(SUM(subtotal_cop), 0) AS subtotal_cop,
+                   COALESCE(SUM(margen_total_cop), 0) AS margen_total_cop,
+                   COALESCE(SUM(subtotal_cop - margen_total_cop), 0) AS costo_cop,
+                   COALESCE(SUM(CAST(cantidad AS BIGINT)), 0) AS cantidad,
+                   COUNT(*) AS num_ventas,
+                   COALESCE(SUM(margen_total_cop / subtotal_cop * 100), 0) AS suma_margen_pct,
+                   COALESCE(SUM(costo_real_cop), 0) AS costo_real_cop,
+                   COALESCE(SUM(margen_real_cop), 0) AS margen_real_cop
+            FROM ({self._LANDED_SALES})
+            GROUP BY ALL
+            ORDER BY anio, mes
+        """, sources=('ventas', 'productos', 'importaciones'))
+        # Sales with a missing ID stay in the cube, under a nullable ID as in pandas
+        cube = cube.astype({col: 'Int32' if dtype == 'int32' and cube[col].isna().any() else dtype
+                            for col, dtype in _CUBE_DTYPES.items()})
+        for key in CUBE_KEYS[4:]:
+            cube[key] = cube[key].astype('category')
+        for measure in CUBE_MEASURES:
+            if measure not in _CUBE_DTYPES:
+                cube[measure] = cube[measure].astype('float64')
+        return cube[CUBE_KEYS + CUBE_MEASURES]
+
+    # --- Inventory rotation -------------------------------------------------
+
+    def _rotation_sources(self):
+        """
+        CTEs shared by the rotation queries: month ordinals of the inventory
+        snapshots and of the sales (by serving center), the grid bounds and
+        the (product, center) keys with their category.
+        """
+        return f"""
+            inv AS (
+                SELECT producto_id, CAST(centro_logistico AS VARCHAR) AS centro, CAST(categoria AS VARCHAR) AS categoria,
+                       year(fecha_corte) * 12 + month(fecha_corte) - 1 AS mes,
+                       CAST(valor_inventario_cop AS DOUBLE) AS valor, file_row_number AS orden
+                FROM inventario WHERE fecha_corte IS NOT NULL AND producto_id IS NOT NULL
+            ),
+            sal AS (
+                SELECT producto_id, {_center_case('CAST(region AS VARCHAR)')} AS centro,
+                       CAST(categoria AS VARCHAR) AS categoria,
+                       year(fecha) * 12 + month(fecha) - 1 AS mes,
+                       COALESCE(subtotal_cop - margen_total_cop, 0) AS cogs, file_row_number AS orden
+                FROM ventas WHERE fecha IS NOT NULL AND producto_id IS NOT NULL
+            ),
+            bounds AS (
+                SELECT MIN(mes) AS first_month, MAX(mes) AS last_month
+                FROM (SELECT mes FROM inv UNION ALL SELECT mes FROM sal)
+            ),
+            keys AS (
+                -- categoria of the first row of each (product, center), inventory first
+                SELECT producto_id, centro, arg_min(categoria, (fuente, orden)) AS categoria
+                FROM (SELECT producto_id, centro, categoria, 0 AS fuente, orden FROM inv
+                      UNION ALL SELECT producto_id, centro, categoria, 1 AS fuente, orden FROM sal)
+                GROUP BY producto_id, centro
+            ),
+            selected AS (
+                SELECT * FROM keys
+                WHERE ($center IS NULL OR centro = $center) AND ($categoria IS NULL OR categoria = $categoria)
+            )
+        """
+
+    def rotation_filters(self):
+        """
+        Years with inventory snapshots (most recent first), centers and
+        categories of the rotation keys, as RotationIndex.years/centers/categories.
+        """
+        params = {'center': None, 'categoria': None}
+        sources = ('inventario', 'ventas')
+        years = self.query(f"""
+            WITH {self._rotation_sources()}
+            SELECT DISTINCT CAST(mes // 12 AS INTEGER) AS anio FROM inv WHERE valor IS NOT NULL
+        """, params, sources)['anio']
+        keys = self.query(f"WITH {self._rotation_sources()} SELECT centro, categoria FROM keys", params, sources)
+        return {
+            'years': sorted(years.tolist(), reverse=True),
+            'centers': sorted(keys['centro'].dropna().unique().tolist()),
+            'categories': sorted(keys['categoria'].dropna().unique().tolist()),
+        }
+
+    def inventory_rotation(self, year, center=None, categoria=None):
+        """
+        Rotation per product over a year (utils.rotation.RotationIndex.rotation):
+        producto_id, categoria, cogs, avg_inventory_value, rotacion_veces and
+        rotacion_dias.
+        """
+        group_keys = "producto_id, categoria" if center is None else "producto_id, categoria, centro"
+        rotation = self.query(f"""
+            WITH {self._rotation_sources()},
+            window_bounds AS (
+                SELECT GREATEST($year * 12, first_month) AS s, LEAST($year * 12 + 11, last_month) AS e FROM bounds
+            ),
+            stock AS (
+                SELECT producto_id, centro, SUM(valor) AS valor, COUNT(valor) AS snapshots
+                FROM inv, window_bounds WHERE mes BETWEEN s AND e AND valor IS NOT NULL
+                GROUP BY producto_id, centro
+            ),
+            cost AS (
+                SELECT producto_id, centro, SUM(cogs) AS cogs
+                FROM sal, window_bounds WHERE mes BETWEEN s AND e
+                GROUP BY producto_id, centro
+            ),
+            per_key AS (
+                SELECT k.producto_id, k.centro, k.categoria,
+                       COALESCE(c.cogs, 0) AS cogs, st.valor, st.snapshots
+                FROM selected k
+                LEFT JOIN stock st USING (producto_id, centro)
+                LEFT JOIN cost c USING (producto_id, centro)
+            ),
+            grouped AS (
+                -- with every center, the average is over the snapshots of all centers
+                SELECT {group_keys}, SUM(cogs) AS cogs,
+                       COALESCE(SUM(valor) / NULLIF(SUM(snapshots), 0), 0) AS avg_inventory_value
+                FROM per_key GROUP BY {group_keys}
+            )
+            SELECT producto_id, categoria, cogs, avg_inventory_value,
+                   cogs / avg_inventory_value AS rotacion_veces,
+                   (SELECT e - s + 1 FROM window_bounds) * $days_per_month / (cogs / avg_inventory_value) AS rotacion_dias
+            FROM grouped
+            WHERE avg_inventory_value > 0 AND cogs > 0
+            ORDER BY producto_id
+        """, {'year': int(year), 'center': center, 'categoria': categoria, 'days_per_month': DAYS_PER_MONTH},
+            sources=('inventario', 'ventas'))
+        rotation['producto_id'] = rotation['producto_id'].astype('int32')
+        return rotation
+
+    def rotation_trend(self, year, center=None, categoria=None, months=3):
+        """
+        Trailing `months`-month average inventory value, COGS and days of
+        inventory per month of a year (utils.rotation.RotationIndex.rolling).
+        """
+        return self.query(f"""
+            WITH {self._rotation_sources()},
+            ends AS (
+                SELECT m FROM bounds, range(
+                    GREATEST($year * 12, first_month, first_month + $months - 1),
+                    LEAST($year * 12 + 11, last_month) + 1) AS t(m)
+            ),
+            stock AS (
+                -- per product: with every center, over the snapshots of all centers
+                SELECT ends.m, inv.producto_id, SUM(valor) / COUNT(valor) AS average
+                FROM ends JOIN inv ON inv.mes BETWEEN ends.m - $months + 1 AND ends.m
+                JOIN selected k ON inv.producto_id = k.producto_id AND inv.centro = k.centro
+                WHERE valor IS NOT NULL
+                GROUP BY ends.m, inv.producto_id
+            ),
+            cost AS (
+                SELECT ends.m, SUM(cogs) AS cogs
+                FROM ends JOIN sal ON sal.mes BETWEEN ends.m - $months + 1 AND ends.m
+                JOIN selected k ON sal.producto_id = k.producto_id AND sal.centro = k.centro
+                GROUP BY ends.m
+            ),
+            rolled AS (
+                SELECT ends.m,
+                       COALESCE((SELECT SUM(average) FROM stock WHERE stock.m = ends.m), 0) AS avg_inventory_value,
+                       COALESCE(cost.cogs, 0) AS cogs
+                FROM ends LEFT JOIN cost USING (m)
+            )
+            SELECT make_date(CAST(m // 12 AS INTEGER), CAST(m % 12 + 1 AS INTEGER), 1) AS periodo,
+                   avg_inventory_value, cogs,
+                   CASE WHEN cogs > 0 THEN $months * $days_per_month * avg_inventory_value / cogs END AS rotacion_dias
+            FROM rolled ORDER BY m
+        """, {'year': int(year), 'center': center, 'categoria': categoria, 'months': int(months),
+              'days_per_month': DAYS_PER_MONTH},
+            sources=('inventario', 'ventas')).astype({'periodo': 'datetime64[us]'})
+
+    # --- Credit risk --------------------------------------------------------
+
+    def portfolio_kpis(self):
+        """
+        Outstanding portfolio, overdue amount and overdue share in %.
+        """
+        row = self.query("""
+            SELECT COALESCE(SUM(saldo_cop), 0) AS total_cop,
+                   COALESCE(SUM(saldo_cop) FILTER (WHERE dias_mora > 0), 0) AS mora_cop
+            FROM cartera
+        """, sources=('cartera',)).iloc[0]
+        total, overdue = float(row['total_cop']), float(row['mora_cop'])
+        return {
+            'total_cop': total,
+            'mora_cop': overdue,
+            'pct_mora': (overdue / total) * 100 if total > 0 else 0,
+        }
+
+    def aging_distribution(self):
+        """
+        Overdue balance per aging bucket, buckets in OVERDUE_LABELS order.
+        """
+        aging = self.query(f"""
+            SELECT {_aging_case('dias_mora')} AS rango_mora, SUM(saldo_cop) AS saldo_cop
+            FROM cartera WHERE dias_mora > 0
+            GROUP BY rango_mora
+        """, sources=('cartera',))
+        aging['rango_mora'] = pd.Categorical(aging['rango_mora'], categories=OVERDUE_LABELS)
+        return aging.sort_values('rango_mora', ignore_index=True)
+
+    def top_overdue_clients(self, n=5):
+        """
+        The n clients with the highest overdue balance, with their names.
+        """
+        return self.query("""
+            WITH names AS (
+                SELECT cliente_id, arg_min(nombre_cliente, file_row_number) AS nombre_cliente
+                FROM clientes GROUP BY cliente_id
+            )
+            SELECT nombre_cliente, SUM(saldo_cop) AS saldo_cop
+            FROM cartera LEFT JOIN names USING (cliente_id)
+            WHERE dias_mora > 0
+            GROUP BY cliente_id, nombre_cliente
+            ORDER BY saldo_cop DESC
+            LIMIT $n
+        """, {'n': int(n)}, sources=('cartera', 'clientes'))
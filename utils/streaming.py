@@ -0,0 +1,309 @@
+import json
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils.cube import build_cube
+from utils.data_loader import (CACHE_DIR, DATA_DIR, FILES, _dump_json, _read_fingerprint, _snapshot_is_valid,
+                               _snapshot_paths, _source_fingerprint, _write_atomic, clean_ventas, sniff_csv)
+from utils.landed_cost import add_landed_cost
+from utils.schemas import SCHEMAS, apply_schema, concat_typed, read_dtypes
+
+# Sales partitioned as anio=YYYY/mes=MM/part-NNNNN.parquet
+PARTITION_DIR = os.environ.get("ANDINA_PARTITION_DIR", os.path.join(CACHE_DIR, "ventas_particionadas"))
+
+# Sales without a date, kept so the snapshot rebuilt from the partitions
+# holds every row. The leading underscore keeps it out of the year/month
+# dataset (pyarrow ignores it, and it does not match the */*/ glob).
+UNDATED_DIR = "_sin_fecha"
+
+# Stamp of the partitions: the ventas snapshot fingerprint they match
+STAMP_NAME = "_fuente.json"
+
+DEFAULT_MEMORY_BUDGET_MB = 256
+
+# Parsing and cleaning hold a few copies of a chunk at once (raw text, typed
+# frame, cleaned columns, per-month slices); size chunks with this headroom.
+_CHUNK_OVERHEAD = 4
+
+_SAMPLE_ROWS = 10_000
+
+
+def _chunk_dtypes():
+    """
+    Parser dtypes of the sales chunks. Unlike read_typed_source, a chunk that
+    does not fit cannot be parsed again untyped, so the numeric columns are
+    left to apply_schema, which coerces them (nullable if they hold nulls).
+    """
+    return {col: dtype for col, dtype in read_dtypes('ventas').items() if dtype == 'category'}
+
+
+def chunk_rows_for_budget(path, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """
+    Number of rows per chunk that keeps the parse + clean of one chunk within
+    memory_budget_mb, estimated from the typed size of a sample.
+    """
+    fmt = sniff_csv(path)
+    sample = pd.read_csv(path, encoding=fmt['encoding'], sep=fmt['sep'], nrows=_SAMPLE_ROWS, dtype=_chunk_dtypes())
+    sample = clean_ventas(apply_schema(sample, 'ventas'))
+    if sample.empty:
+        return _SAMPLE_ROWS
+    bytes_per_row = sample.memory_usage(deep=True).sum() / len(sample)
+    rows = int(memory_budget_mb * 1024 ** 2 / (bytes_per_row * _CHUNK_OVERHEAD))
+    return max(rows, 1_000)
+
+
+def _read_stamp(out_dir):
+    return _read_fingerprint(os.path.join(out_dir, STAMP_NAME))
+
+
+def _stamp(out_dir, fingerprint):
+    _write_atomic(os.path.join(out_dir, STAMP_NAME), lambda p: _dump_json(fingerprint, p))
+
+
+def partitions_are_current(path=None, out_dir=None):
+    """
+    True if out_dir holds the partitions of the current ventas snapshot: the
+    same extract, schema and ingested deltas (stream_ventas writes both from
+    the extract, ingest merges each delta into both).
+    """
+    path = path or os.path.join(DATA_DIR, FILES['ventas'])
+    out_dir = out_dir or PARTITION_DIR
+    stamp = _read_stamp(out_dir)
+    snapshot_path, fingerprint_path = _snapshot_paths('ventas')
+    if stamp is None or not _snapshot_is_valid(path, snapshot_path, fingerprint_path):
+        return False
+    fingerprint = _read_fingerprint(fingerprint_path) or {}
+    return all(stamp.get(field) == fingerprint.get(field) for field in ('path', 'sha', 'schema', 'deltas'))
+
+
+def _partition_dir(out_dir, anio=None, mes=None):
+    if anio is None:
+        return os.path.join(out_dir, UNDATED_DIR)
+    return os.path.join(out_dir, f"anio={anio}", f"mes={mes:02d}")
+
+
+def _partition_key(out_dir, part_dir):
+    relative = os.path.relpath(part_dir, out_dir)
+    if relative == UNDATED_DIR:
+        return None, None
+    year_dir, month_dir = relative.split(os.sep)
+    return int(year_dir[5:]), int(month_dir[4:])
+
+
+def _split_by_month(rows):
+    """
+    Yields (anio, mes, rows) for every month of a frame of cleaned sales, and
+    (None, None, rows) for the sales without a date.
+    """
+    dated = rows['fecha'].notna().to_numpy()
+    by_month = rows[dated]
+    for (anio, mes), part in by_month.groupby([by_month['fecha'].dt.year, by_month['fecha'].dt.month], sort=False):
+        yield int(anio), int(mes), part
+    if not dated.all():
+        yield None, None, rows[~dated]
+
+
+def _partition_files(part_dir):
+    return sorted(name for name in os.listdir(part_dir) if name.endswith('.parquet')) if os.path.isdir(part_dir) else []
+
+
+def _next_part(part_dir):
+    files = _partition_files(part_dir)
+    return int(files[-1][5:10]) + 1 if files else 0
+
+
+def _all_partition_dirs(out_dir):
+    """
+    Directory of every month, in order, then the undated sales.
+    """
+    dirs = [_partition_dir(out_dir, anio, mes) for anio, mes in list_partitions(out_dir)]
+    undated = _partition_dir(out_dir)
+    return dirs + [undated] if os.path.isdir(undated) else dirs
+
+
+def merge_into_partitions(delta, out_dir=None):
+    """
+    Merges ventas delta rows (schema-typed, as read from a delta file) into
+    the partitions, replacing the sales with the same venta_id as
+    ingest.merge_delta does for the snapshot. Only the months that gain rows
+    or hold a replaced sale are rewritten, one at a time.
+    """
+    out_dir = out_dir or PARTITION_DIR
+    delta = clean_ventas(delta.drop_duplicates(subset=['venta_id'], keep='last').copy())
+    ids = delta['venta_id']
+    additions = {(anio, mes): rows for anio, mes, rows in _split_by_month(delta)}
+    for part_dir in _all_partition_dirs(out_dir):
+        if pd.read_parquet(part_dir, columns=['venta_id'])['venta_id'].isin(ids).any():
+            additions.setdefault(_partition_key(out_dir, part_dir), delta.iloc[0:0])
+
+    for (anio, mes), rows in additions.items():
+        part_dir = _partition_dir(out_dir, anio, mes)
+        files = _partition_files(part_dir)
+        if files:
+            current = pd.read_parquet(part_dir)
+            rows = concat_typed([current[~current['venta_id'].isin(ids).to_numpy()], rows])
+        os.makedirs(part_dir, exist_ok=True)
+        if not rows.empty:
+            name = f"part-{_next_part(part_dir):05d}.parquet"
+            _write_atomic(os.path.join(part_dir, name), lambda p: rows.to_parquet(p, index=False))
+        for old in files:
+            os.remove(os.path.join(part_dir, old))
+
+
+def _snapshot_schema(files, columns):
+    """
+    Arrow schema of the ventas snapshot written from the partition files:
+    categoricals with int32 dictionary indices (every file has its own
+    dictionary) and the nullable Int32 dtype for the integer columns that
+    hold nulls in any file, as a single parse of the extract would give.
+    """
+    first = pq.read_table(files[0], columns=columns).slice(0, 0).to_pandas()
+    for col, kind in SCHEMAS['ventas'].items():
+        if kind in ('int32', 'Int32') and col in first.columns:
+            has_nulls = any(pq.read_table(f, columns=[col]).column(0).null_count for f in files)
+            first[col] = first[col].astype('Int32' if has_nulls else 'int32')
+    schema = pa.Schema.from_pandas(first, preserve_index=False)
+    for i, field in enumerate(schema):
+        if pa.types.is_dictionary(field.type):
+            schema = schema.set(i, field.with_type(pa.dictionary(pa.int32(), field.type.value_type)))
+    return schema
+
+
+def write_snapshot_from_partitions(fingerprint, out_dir=None):
+    """
+    Writes the ventas snapshot (utils.data_loader) from the partitions, one
+    file at a time, so it never holds the whole fact either. The rows come
+    out by month, in file order within a month; the date-sorted fact is the
+    same as from a parse of the extract.
+    """
+    out_dir = out_dir or PARTITION_DIR
+    files = [os.path.join(part_dir, name) for part_dir in _all_partition_dirs(out_dir)
+             for name in _partition_files(part_dir)]
+    snapshot_path, fingerprint_path = _snapshot_paths('ventas')
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    if not files:
+        _write_atomic(snapshot_path, lambda p: pd.DataFrame(columns=list(SCHEMAS['ventas'])).to_parquet(p, index=False))
+    else:
+        # margen_pct is derived by clean_ventas, not part of the extract
+        columns = [name for name in pq.read_schema(files[0]).names if name != 'margen_pct']
+        schema = _snapshot_schema(files, columns)
+
+        def write(path):
+            with pq.ParquetWriter(path, schema) as writer:
+                for f in files:
+                    writer.write_table(pq.read_table(f, columns=columns).cast(schema))
+        _write_atomic(snapshot_path, write)
+    _write_atomic(fingerprint_path, lambda p: _dump_json(fingerprint, p))
+
+
+def stream_ventas(path=None, out_dir=None, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """
+    Reads the sales CSV in bounded chunks, applies the schema and the same
+    cleaning as process_data (currency columns, dates, margen_pct) to each
+    chunk, and writes it partitioned by year/month. The ventas deltas already
+    ingested on top of this extract are merged in, and the ventas snapshot is
+    written from the partitions, so the whole file is never held in memory:
+    peak memory depends on memory_budget_mb, not on the file size. The new
+    partitions replace the old ones only once everything was written.
+    Returns (rows written, number of partitions).
+    """
+    # Imported here: utils.ingest builds on this module
+    from utils.ingest import replayable_batches
+
+    path = path or os.path.join(DATA_DIR, FILES['ventas'])
+    out_dir = out_dir or PARTITION_DIR
+    # Taken before reading, as load_source does
+    fingerprint = _source_fingerprint(path)
+    fmt = sniff_csv(path)
+    chunksize = chunk_rows_for_budget(path, memory_budget_mb)
+
+    parent = os.path.dirname(os.path.abspath(out_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent, prefix=f".{os.path.basename(out_dir)}.")
+    try:
+        rows = 0
+        reader = pd.read_csv(path, encoding=fmt['encoding'], sep=fmt['sep'], chunksize=chunksize,
+                             dtype=_chunk_dtypes())
+        for chunk_no, chunk in enumerate(reader):
+            chunk = clean_ventas(apply_schema(chunk, 'ventas'))
+            for anio, mes, part in _split_by_month(chunk):
+                part_dir = _partition_dir(tmp_dir, anio, mes)
+                os.makedirs(part_dir, exist_ok=True)
+                part.to_parquet(os.path.join(part_dir, f"part-{chunk_no:05d}.parquet"), index=False)
+            rows += len(chunk)
+
+        fingerprint['deltas'] = []
+        for delta, names in replayable_batches('ventas', fingerprint['sha']):
+            merge_into_partitions(delta, tmp_dir)
+            fingerprint['deltas'] += names
+
+        write_snapshot_from_partitions(fingerprint, tmp_dir)
+        _stamp(tmp_dir, fingerprint)
+        shutil.rmtree(out_dir, ignore_errors=True)
+        os.replace(tmp_dir, out_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return rows, len(list_partitions(out_dir))
+
+
+def stamp_partitions(out_dir=None):
+    """
+    Marks the partitions as matching the current ventas snapshot fingerprint
+    (after ingest merged the same delta into both).
+    """
+    _stamp(out_dir or PARTITION_DIR, _read_fingerprint(_snapshot_paths('ventas')[1]))
+
+
+def list_partitions(out_dir=None):
+    """
+    Returns the sorted list of (anio, mes) partitions available.
+    """
+    out_dir = out_dir or PARTITION_DIR
+    partitions = []
+    if not os.path.isdir(out_dir):
+        return partitions
+    for year_dir in os.listdir(out_dir):
+        if not year_dir.startswith('anio='):
+            continue
+        for month_dir in os.listdir(os.path.join(out_dir, year_dir)):
+            if month_dir.startswith('mes=') and _partition_files(os.path.join(out_dir, year_dir, month_dir)):
+                partitions.append((int(year_dir[5:]), int(month_dir[4:])))
+    return sorted(partitions)
+
+
+def read_partitions(years=None, months=None, columns=None, out_dir=None):
+    """
+    Reads the sales of the given years/months (None means all) from the
+    partitions. Only the matching directories are opened and, when columns is
+    given, only those columns are read.
+    """
+    out_dir = out_dir or PARTITION_DIR
+    filters = []
+    if years is not None:
+        filters.append(('anio', 'in', [int(y) for y in years]))
+    if months is not None:
+        filters.append(('mes', 'in', [int(m) for m in months]))
+    df = pd.read_parquet(out_dir, columns=columns, filters=filters or None)
+    for col, dtype in (('anio', 'int16'), ('mes', 'int8')):
+        if col in df.columns:
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+def cube_from_partitions(productos=None, importaciones=None, out_dir=None):
+    """
+    Builds the monthly cube one year of partitions at a time, so it never
+    needs the whole sales history in memory. The landed cost of each year's
+    sales (utils.landed_cost) is added on the way, as prepare_ventas does for
+    the full fact; without products or imports the real cost/margin stay empty.
+    """
+    years = sorted({anio for anio, _ in list_partitions(out_dir)})
+    cubes = [build_cube(add_landed_cost(read_partitions([anio], out_dir=out_dir), productos, importaciones))
+             for anio in years]
+    return concat_typed(cubes) if cubes else build_cube(None)
@@ -0,0 +1,483 @@
+"""
+Computations behind every dashboard page, without Streamlit.
+
+Each function takes the shared frames it reads (cube, facts, model) plus
+the page's filter values and returns DataFrames or plain values; the pages
+only render them. Results live in the shared result cache
+(utils.result_cache) for as long as the frames they were computed from are
+the published ones, so a widget interaction only recomputes the outputs that
+depend on it and every session asking for the same view reuses them. Results
+are shared: treat them as read-only. Every computation (not the cache hits)
+is timed in utils.instrumentation as 'vista.<function>' or 'figura.<builder>'.
+"""
+import functools
+
+import numpy as np
+import pandas as pd
+
+from utils.analytics import OVERDUE_LABELS, classify_aging, segment_by_value, simplify_channel
+from utils.cube import rollup, totals
+from utils.customers import build_customer_analytics
+from utils.data_loader import sql_backend
+from utils.downsample import downsample, points_for_width
+from utils.filters import FilterIndex, normalize_selection
+from utils.instrumentation import timed
+from utils.model import StarModel
+from utils.result_cache import RESULTS
+from utils.rotation import build_rotation_index
+
+MONTH_NAMES = ['Ene', 'Feb', 'Mar', 'Abr', 'May', 'Jun', 'Jul', 'Ago', 'Sep', 'Oct', 'Nov', 'Dic']
+
+
+def _is_source(value):
+    return value is None or isinstance(value, (pd.DataFrame, StarModel))
+
+
+def memoized(func):
+    """
+    Caches func's result in the shared result cache, keyed by the filter
+    arguments and the identity of the frame/model arguments (the dataset
+    version), so a data refresh invalidates it without keeping old data alive.
+    """
+    namespace = f"{func.__module__}.{func.__name__}"
+    stage = f"vista.{func.__name__}"
+
+    def compute(*args, **kwargs):
+        with timed(stage):
+            return func(*args, **kwargs)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        filters = (tuple(None if _is_source(a) else a for a in args), kwargs)
+        sources = [a for a in args if _is_source(a)]
+        return RESULTS.get_or_compute(namespace, sources, filters, lambda: compute(*args, **kwargs))
+
+    return wrapper
+
+
+def figure(build, frame=None, **kwargs):
+    """
+    Plotly figure build(frame, **kwargs) from the shared result cache. Use it
+    with frames returned by the functions below: while they are cached the
+    same object comes back and so does the figure. Streamlit only serializes
+    the figure, so sharing it between sessions is safe.
+    """
+    namespace = f"figure.{build.__module__}.{build.__name__}"
+    args = () if frame is None else (frame,)
+
+    def compute():
+        with timed(f"figura.{build.__name__}"):
+            return build(*args, **kwargs)
+
+    return RESULTS.get_or_compute(namespace, [frame], kwargs, compute)
+
+
+@memoized
+def downsampled(frame, x, y, points=None, start=None, end=None, by=None, method='lttb'):
+    """
+    `frame` reduced to the rows that draw its (x, y) line(s) with at most
+    `points` points per series (default: points_for_width()), within the
+    zoom range [start, end]. Cached per series and range, so the payload sent
+    to the browser stays bounded however long the history grows.
+    """
+    return downsample(frame, x, y, points or points_for_width(), start=start, end=end, by=by, method=method)
+
+
+# --- Filtros cruzados -------------------------------------------------------
+
+@memoized
+def filter_index(cube):
+    """
+    Boolean index arrays of the cross-filter dimensions over the cube rows
+    (built once per cube version, see utils.filters).
+    """
+    return FilterIndex(cube)
+
+
+@memoized
+def _filtered_cube(cube, selection):
+    return cube[filter_index(cube).mask(selection)]
+
+
+def filtered_cube(cube, selection=None):
+    """
+    The cube rows matching a cross-filter selection, still sorted by period,
+    for the views below. The cube itself when nothing is filtered, so results
+    cached for the whole cube keep being served; each filtered subset is
+    cached, so only the views fed by a changed selection are recomputed.
+    """
+    selection = normalize_selection(selection)
+    if cube is None or not selection:
+        return cube
+    return _filtered_cube(cube, selection)
+
+
+# --- Panorama General -------------------------------------------------------
+
+@memoized
+def sales_kpis(cube, year=None):
+    """
+    Total sales, gross margin and margin % of a year (None = all years).
+    """
+    return totals(cube, year=year)
+
+
+@memoized
+def monthly_trend(cube, year):
+    """
+    Sales and margin per month of one year, with a 'fecha' column for the axis.
+    """
+    monthly = rollup(cube, ['anio', 'mes'], year=year, measures=['subtotal_cop', 'margen_total_cop'])
+    monthly['fecha'] = pd.to_datetime(pd.DataFrame({'year': monthly['anio'], 'month': monthly['mes'], 'day': 1}))
+    return monthly.sort_values('fecha')
+
+
+@memoized
+def monthly_comparison(cube):
+    """
+    Sales and margin per (año, month), with Spanish month names, to compare
+    the same month across years.
+    """
+    monthly = rollup(cube, ['anio', 'mes'], measures=['subtotal_cop', 'margen_total_cop'])
+    monthly = monthly.rename(columns={'anio': 'año', 'mes': 'mes_num'})
+    monthly['año'] = monthly['año'].astype(int)
+    monthly['mes_nombre'] = np.array(MONTH_NAMES)[monthly['mes_num'].astype(int).to_numpy() - 1]
+    return monthly.sort_values(['año', 'mes_num'])
+
+
+# --- Rentabilidad Detallada -------------------------------------------------
+
+@memoized
+def margin_matrix(cube, year):
+    """
+    Mean per-sale margin % by categoria x region, rebuilt from its sum and count.
+    """
+    cells = rollup(cube, ['categoria', 'region'], year=year, measures=['suma_margen_pct', 'num_ventas'])
+    cells['margen_pct'] = cells['suma_margen_pct'] / cells['num_ventas']
+    return cells.pivot(index='categoria', columns='region', values='margen_pct')
+
+
+@memoized
+def margin_by_channel(cube, year):
+    """
+    Gross margin of 'Contado' vs 'Crédito' sales.
+    """
+    channel = rollup(cube, ['tipo_venta'], year=year, measures=['margen_total_cop'])
+    channel['canal_simplificado'] = simplify_channel(channel['tipo_venta'])
+    return channel.groupby('canal_simplificado', observed=True)['margen_total_cop'].sum().reset_index()
+
+
+@memoized
+def category_pareto(cube, year, threshold=0.80):
+    """
+    Categories by gross margin, with the cumulative share and a flag for the
+    ones inside the first `threshold` of the margin.
+    """
+    pareto = rollup(cube, ['categoria'], year=year, measures=['margen_total_cop'])
+    pareto = pareto.sort_values('margen_total_cop', ascending=False)
+    pareto['cumulative_margin'] = pareto['margen_total_cop'].cumsum()
+    pareto['cumulative_pct'] = pareto['cumulative_margin'] / pareto['margen_total_cop'].sum()
+    pareto['top_80'] = pareto['cumulative_pct'] <= threshold
+    return pareto
+
+
+# --- Gestión de Clientes ----------------------------------------------------
+
+@memoized
+def client_sales(cube, year):
+    """
+    Sales per client of a year, with the value segment of each client.
+    """
+    client_value = rollup(cube, ['cliente_id'], year=year, measures=['subtotal_cop'])
+    client_value['segmento_valor'] = segment_by_value(client_value['subtotal_cop'])
+    return client_value
+
+
+@memoized
+def top_clients(cube, model, year, n=10):
+    """
+    The n clients with the highest sales, with their names.
+    """
+    top = client_sales(cube, year).nlargest(n, 'subtotal_cop')
+    # Client names come from the dimension, only for the top rows
+    return pd.DataFrame({
+        'nombre_cliente': model.lookup_ids('cliente', top['cliente_id'], 'nombre_cliente'),
+        'subtotal_cop': top['subtotal_cop'].to_numpy(),
+    })
+
+
+@memoized
+def client_concentration(cube, model, year, n=10):
+    """
+    Sales of the top n clients, total sales and the top-n share in %.
+    """
+    total_sales = sales_kpis(cube, year)['subtotal_cop']
+    top_sales = top_clients(cube, model, year, n)['subtotal_cop'].sum()
+    return {
+        'top_cop': top_sales,
+        'total_cop': total_sales,
+        'pct': (top_sales / total_sales) * 100 if total_sales > 0 else 0,
+    }
+
+
+@memoized
+def value_segment_counts(cube, year):
+    """
+    Number of clients per value segment.
+    """
+    return client_sales(cube, year)['segmento_valor'].value_counts().reset_index()
+
+
+@memoized
+def customer_analytics(cube, model):
+    """
+    RFM scores, cohort retention, concentration and lifetime value of every
+    client across all years, built in one pass per cube (see utils.customers).
+    """
+    return build_customer_analytics(cube, model.dimension('cliente'))
+
+
+@memoized
+def rfm_segments(cube, model):
+    return customer_analytics(cube, model).segments()
+
+
+@memoized
+def top_lifetime_value(cube, model, n=10):
+    """
+    The n clients with the highest lifetime margin, with their names.
+    """
+    top = customer_analytics(cube, model).clients.nlargest(n, 'ltv_cop')
+    columns = ['ltv_cop', 'monetario_cop', 'frecuencia', 'meses_activos', 'recencia_meses', 'segmento_rfm']
+    # Client names come from the dimension, only for the top rows
+    result = top[columns].reset_index(drop=True)
+    result.insert(0, 'nombre_cliente', model.lookup_ids('cliente', top['cliente_id'], 'nombre_cliente'))
+    return result
+
+
+# --- Importaciones y Costos -------------------------------------------------
+
+@memoized
+def import_totals(imports):
+    return {'costo_mercancia_usd': imports['costo_mercancia_usd'].sum()}
+
+
+@memoized
+def trm_trend(imports):
+    """
+    Order date and TRM of every import, sorted by date.
+    """
+    return imports[['fecha_orden', 'trm']].sort_values('fecha_orden')
+
+
+@memoized
+def imports_by_country(imports):
+    return imports.groupby('pais_origen', observed=True)['costo_mercancia_usd'].sum().reset_index()
+
+
+def _margin_pcts(frame):
+    sales = frame['subtotal_cop']
+    frame['margen_estimado_pct'] = (frame['margen_total_cop'] / sales * 100).where(sales > 0, 0)
+    frame['margen_real_pct'] = (frame['margen_real_cop'] / sales * 100).where(sales > 0, 0)
+    return frame
+
+
+@memoized
+def landed_margin_kpis(cube, year=None):
+    """
+    Sales, margin at the ERP estimated cost and margin at the landed cost of
+    the supplying imports (actual TRM), with both margin %.
+    """
+    kpis = totals(cube, year=year)
+    sales = kpis['subtotal_cop']
+    return {
+        'subtotal_cop': sales,
+        'margen_estimado_cop': kpis['margen_total_cop'],
+        'margen_real_cop': kpis['margen_real_cop'],
+        'margen_estimado_pct': kpis['margen_pct'],
+        'margen_real_pct': (kpis['margen_real_cop'] / sales) * 100 if sales > 0 else 0,
+    }
+
+
+@memoized
+def landed_margin_trend(cube, year=None):
+    """
+    Estimated vs. real margin % per month, in long form (one row per month
+    and margin type) for a two-line chart.
+    """
+    monthly = rollup(cube, ['anio', 'mes'], year=year, measures=['subtotal_cop', 'margen_total_cop', 'margen_real_cop'])
+    monthly = _margin_pcts(monthly)
+    monthly['fecha'] = pd.to_datetime(pd.DataFrame({'year': monthly['anio'], 'month': monthly['mes'], 'day': 1}))
+    long = monthly.melt(id_vars='fecha', value_vars=['margen_estimado_pct', 'margen_real_pct'],
+                        var_name='tipo', value_name='margen_pct')
+    long['tipo'] = long['tipo'].map({'margen_estimado_pct': 'Costo estimado', 'margen_real_pct': 'TRM real'})
+    return long.sort_values(['tipo', 'fecha'])
+
+
+@memoized
+def landed_margin_by_category(cube, year=None):
+    """
+    Estimated vs. real margin per category, with the difference in COP.
+    """
+    by_category = rollup(cube, ['categoria'], year=year, measures=['subtotal_cop', 'margen_total_cop', 'margen_real_cop'])
+    by_category = _margin_pcts(by_category)
+    by_category['diferencia_cop'] = by_category['margen_real_cop'] - by_category['margen_total_cop']
+    return by_category.sort_values('diferencia_cop')[
+        ['categoria', 'margen_total_cop', 'margen_real_cop', 'diferencia_cop', 'margen_estimado_pct', 'margen_real_pct']]
+
+
+# --- Inventario y Operación -------------------------------------------------
+
+@memoized
+def current_inventory(inventory):
+    """
+    Latest inventory snapshot: cut-off date, total value and number of
+    stocked-out references.
+    """
+    latest_date = inventory['fecha_corte'].max()
+    current = inventory[(inventory['fecha_corte'] == latest_date).to_numpy()]
+    return {
+        'fecha_corte': latest_date,
+        'valor_cop': current['valor_inventario_cop'].sum(),
+        'referencias_sin_stock': int((current['stock_unidades'] <= 0).sum()),
+    }
+
+
+@memoized
+def rotation_index(model, inventory):
+    """
+    Prefix-sum rotation index of the published inventory and sales (built
+    once per data version, see utils.rotation).
+    """
+    return build_rotation_index(inventory, model.fact('ventas'))
+
+
+@memoized
+def rotation_filters(model, inventory):
+    """
+    Years with inventory snapshots (most recent first), logistics centers and
+    categories the rotation can be filtered by.
+    """
+    backend = sql_backend()
+    if backend is not None:
+        return backend.rotation_filters()
+    index = rotation_index(model, inventory)
+    return {'years': index.years(), 'centers': index.centers(), 'categories': index.categories()}
+
+
+@memoized
+def inventory_rotation(model, inventory, year, center=None, categoria=None):
+    """
+    Rotation per product over a year (optionally for one center/category):
+    COGS / average inventory value, in times and in days, with the product
+    description. Empty if there are no sales or no inventory that year.
+    """
+    backend = sql_backend()
+    if backend is not None:
+        rotation = backend.inventory_rotation(year, center=center, categoria=categoria)
+    else:
+        rotation = rotation_index(model, inventory).rotation(year, year, center=center, categoria=categoria)
+    # Product names for visualization, looked up in the dimension
+    if model.dimension('producto') is not None:
+        rotation['descripcion'] = model.lookup_ids('producto', rotation['producto_id'], 'descripcion')
+    return rotation
+
+
+@memoized
+def rotation_by_category(model, inventory, year, center=None, categoria=None):
+    rotation = inventory_rotation(model, inventory, year, center, categoria)
+    return rotation.groupby('categoria', observed=True)['rotacion_dias'].mean().reset_index()
+
+
+@memoized
+def rotation_extremes(model, inventory, year, center=None, categoria=None, n=10):
+    """
+    (fastest, slowest) n products by rotation days.
+    """
+    rotation = inventory_rotation(model, inventory, year, center, categoria)
+    columns = ['descripcion', 'rotacion_dias', 'avg_inventory_value']
+    return rotation.nsmallest(n, 'rotacion_dias')[columns], rotation.nlargest(n, 'rotacion_dias')[columns]
+
+
+@memoized
+def rotation_trend(model, inventory, year, center=None, categoria=None, months=3):
+    """
+    Trailing `months`-month average inventory value and days of inventory,
+    per month of the year.
+    """
+    backend = sql_backend()
+    if backend is not None:
+        return backend.rotation_trend(year, center=center, categoria=categoria, months=months)
+    return rotation_index(model, inventory).rolling(months, year, year, center=center, categoria=categoria)
+
+
+@memoized
+def stock_alerts(alerts, model):
+    """
+    Products and centers with an alert (stock-out, stock-out risk, overstock),
+    most urgent first and, within each alert, by inventory value, with the
+    product description.
+    """
+    flagged = alerts[(alerts['alerta'] != 'Normal').to_numpy()]
+    flagged = flagged.sort_values(['alerta', 'valor_inventario_cop'], ascending=[True, False])
+    columns = ['alerta', 'centro_logistico', 'producto_id', 'stock_unidades', 'venta_diaria', 'dias_cobertura',
+               'valor_inventario_cop']
+    flagged = flagged[columns].reset_index(drop=True)
+    if model is not None and model.dimension('producto') is not None:
+        flagged.insert(3, 'descripcion', model.lookup_ids('producto', flagged['producto_id'], 'descripcion'))
+    return flagged
+
+
+# --- Riesgo de Crédito ------------------------------------------------------
+
+def _overdue_mask(cartera):
+    return (cartera['dias_mora'] > 0).fillna(False).to_numpy()
+
+
+@memoized
+def portfolio_kpis(cartera):
+    """
+    Outstanding portfolio, overdue amount and overdue share in %.
+    """
+    backend = sql_backend()
+    if backend is not None:
+        return backend.portfolio_kpis()
+    total = cartera['saldo_cop'].sum()
+    overdue = cartera.loc[_overdue_mask(cartera), 'saldo_cop'].sum()
+    return {
+        'total_cop': total,
+        'mora_cop': overdue,
+        'pct_mora': (overdue / total) * 100 if total > 0 else 0,
+    }
+
+
+@memoized
+def aging_distribution(cartera):
+    """
+    Overdue balance per aging bucket (see utils.analytics.AGING_BINS).
+    """
+    backend = sql_backend()
+    if backend is not None:
+        return backend.aging_distribution()
+    overdue = cartera[_overdue_mask(cartera)]
+    rango = classify_aging(overdue['dias_mora'])
+    aging = overdue['saldo_cop'].groupby(rango.rename('rango_mora'), observed=True).sum().reset_index()
+    aging['rango_mora'] = aging['rango_mora'].cat.set_categories(OVERDUE_LABELS)
+    return aging
+
+
+@memoized
+def top_overdue_clients(cartera, model, n=5):
+    """
+    The n clients with the highest overdue balance, with their names.
+    """
+    backend = sql_backend()
+    if backend is not None:
+        return backend.top_overdue_clients(n)
+    overdue = cartera[_overdue_mask(cartera)]
+    by_client = overdue.groupby('cliente_id', observed=True)['saldo_cop'].sum().nlargest(n)
+    # Grouped by the integer id; names are looked up for the top rows only
+    return pd.DataFrame({
+        'nombre_cliente': model.lookup_ids('cliente', by_client.index, 'nombre_cliente'),
+        'saldo_cop': by_client.to_numpy(),
+    })
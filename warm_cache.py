@@ -0,0 +1,56 @@
+"""
+Pre-warms the columnar snapshot cache used by utils.data_loader.load_data.
+
+Run it at deploy time (or after dropping new extracts in the data directory)
+so the first dashboard session reads Parquet snapshots instead of parsing the
+raw CSV/Excel files:
+
+    python warm_cache.py            # rebuild only the sources that changed
+    python warm_cache.py --force    # rebuild every snapshot
+    python warm_cache.py --memoria  # also print memory per frame, inferred vs schema dtypes
+    python warm_cache.py --particionar --memoria-mb 512
+                                    # stream ventas into year/month Parquet partitions
+                                    # and build its snapshot from them, never holding the
+                                    # whole file; the cube and the duckdb view read them
+"""
+import argparse
+import time
+
+from utils.data_loader import CACHE_DIR, FILES, LOAD_WORKERS, format_load_report, load_sources, memory_report
+from utils.streaming import DEFAULT_MEMORY_BUDGET_MB, PARTITION_DIR, partitions_are_current, stream_ventas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-calienta la caché columnar de las fuentes de datos.")
+    parser.add_argument("--force", action="store_true", help="Reconstruye todos los snapshots aunque no hayan cambiado.")
+    parser.add_argument("--memoria", action="store_true", help="Muestra la memoria por tabla con tipos inferidos vs. esquema.")
+    parser.add_argument("--particionar", action="store_true", help="Particiona ventas por año/mes leyendo el CSV por bloques.")
+    parser.add_argument("--memoria-mb", type=int, default=DEFAULT_MEMORY_BUDGET_MB, help="Memoria máxima por bloque al particionar.")
+    parser.add_argument("--hilos", type=int, default=LOAD_WORKERS, help="Fuentes que se leen en paralelo (1 = secuencial).")
+    args = parser.parse_args()
+
+    # With --particionar, ventas is streamed below instead of being loaded whole
+    keys = [key for key in FILES if not (args.particionar and key == 'ventas')]
+    start = time.perf_counter()
+    _, report = load_sources(keys, force=args.force, workers=args.hilos)
+    elapsed = time.perf_counter() - start
+
+    print(format_load_report(report))
+    print(f"Caché en {CACHE_DIR} lista en {elapsed:.2f}s "
+          f"(archivo más lento: {max(entry['segundos'] for entry in report.values()):.2f}s)")
+
+    if args.particionar:
+        if args.force or not partitions_are_current():
+            start = time.perf_counter()
+            rows, partitions = stream_ventas(memory_budget_mb=args.memoria_mb)
+            print(f"ventas particionadas: {rows} filas en {partitions} particiones ({time.perf_counter() - start:.2f}s)")
+        print(f"Particiones en {PARTITION_DIR}")
+
+    if args.memoria:
+        print()
+        print(memory_report().to_string(index=False, float_format="{:.2f}".format))
+    return 1 if any(entry['error'] for entry in report.values()) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())